@@ -16,17 +16,18 @@ from fastapi import (
     File,
     HTTPException,
     Query,
+    Response,
     UploadFile,
     responses,
     status,
 )
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from lunarbase import LUNAR_CONTEXT
 from lunarbase.api.component import ComponentAPI
 from lunarbase.api.typings import CodeCompletionRequestBody, ComponentPublishingRequestBody
-from lunarbase.api.utils import HealthCheck, TimedLoggedRoute
+from lunarbase.api.utils import HealthCheck, TimedLoggedRoute, format_sse_event
 from lunarbase.api.workflow import WorkflowAPI
 from lunarbase.controllers.code_completion_controller import CodeCompletionController
 from lunarbase.controllers.component_controller.component_class_generator.component_class_generator import \
@@ -37,7 +38,12 @@ from lunarbase.controllers.file_controller import FileController
 from lunarbase.controllers.llm_controller import LLMController
 from lunarbase.controllers.report_controller import ReportController, ReportSchema
 from lunarbase.components.errors import ComponentError
+from lunarbase.components.instance_pool import get_instance_pool
+from lunarbase.components.result_cache import get_result_cache
 from lunarbase.modeling.data_models import ComponentModel, WorkflowModel
+from lunarbase.orchestration.executor import ExecutorKind
+from lunarbase.orchestration.worker_pool import shutdown_worker_pools
+from lunarbase.registry.watcher import RegistryWatcher
 from starlette.middleware.cors import CORSMiddleware
 
 from copy import deepcopy
@@ -89,6 +95,18 @@ def app_startup():
     )
 
     api_context.component_api.index_global()
+    # Controllers resolve components through LUNAR_CONTEXT, so that is the registry kept up to date
+    api_context.registry_watcher = RegistryWatcher(
+        LUNAR_CONTEXT.lunar_registry,
+        interval=api_context.lunar_config.REGISTRY_WATCH_INTERVAL,
+        on_change=api_context.component_api.update_global,
+    ).start()
+
+
+@app.on_event("shutdown")
+async def app_shutdown():
+    api_context.registry_watcher.stop()
+    await shutdown_worker_pools()
 
 
 @app.get("/")
@@ -204,13 +222,47 @@ def delete_workflow(workflow_id: str, user_id: str):
 
 
 @router.post("/workflow/run")
-async def execute_workflow_by_id(workflow: WorkflowModel, user_id: str):
+async def execute_workflow_by_id(
+    workflow: WorkflowModel,
+    response: Response,
+    user_id: str,
+    executor: Optional[ExecutorKind] = None,
+    targets: Optional[List[str]] = Query(None),
+    report: bool = False,
+):
+    """
+    Returns the results by component label. With report, they come under "results", next to the run id
+    and the labels of the reused and recomputed components.
+    """
     try:
-        return await api_context.workflow_api.run(workflow, user_id)
+        run_report = dict()
+        result = await api_context.workflow_api.run(
+            workflow, user_id, executor=executor, targets=targets, report=run_report
+        )
+        response.headers["X-Lunar-Run-Id"] = run_report.get("run_id", "")
+        if report:
+            return {**run_report, "results": result}
+        return result
     except Exception as e:
         raise HTTPException(status_code=422, detail=str(e))
 
 
+@router.post("/workflow/run/stream")
+async def stream_workflow_run(
+    workflow: WorkflowModel,
+    user_id: str,
+    executor: Optional[ExecutorKind] = None,
+    targets: Optional[List[str]] = Query(None),
+):
+    async def events():
+        async for event in api_context.workflow_api.run_stream(
+            workflow, user_id, executor=executor, targets=targets
+        ):
+            yield format_sse_event(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 # @router.get("/workflow/status", response_model=WorkflowReturnModel)
 # def get_workflow_runtime(user_id: str, workflow_id: str):
 #     pass
@@ -230,6 +282,14 @@ def cancel_workflow_by_id(user_id: str, workflow_id: str):
     return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content="")
 
 
+@router.post("/workflow/{workflow_id}/venv/refresh")
+async def refresh_workflow_venv(user_id: str, workflow_id: str):
+    try:
+        return await api_context.workflow_api.refresh_venv(workflow_id, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/workflow/{workflow_id}/inputs")
 async def get_workflow_inputs(user_id: str, workflow_id: str):
     return await api_context.workflow_api.get_workflow_component_inputs(workflow_id, user_id)
@@ -245,10 +305,30 @@ async def run_workflow_by_id(user_id: str, workflow_id: str, body: Dict = Body(.
     return await api_context.workflow_api.run_workflow_by_id(workflow_id, body["inputs"], user_id)
 
 
+@router.get("/cache/metrics")
+def get_result_cache_metrics():
+    result_cache = get_result_cache()
+    if result_cache is None:
+        raise HTTPException(status_code=404, detail="Result cache is disabled.")
+    return result_cache.metrics()
+
+
+@router.get("/instances/metrics")
+def get_instance_pool_metrics():
+    # Pool of the server process; worker processes report instance reuse per component in run reports
+    instance_pool = get_instance_pool()
+    if instance_pool is None:
+        raise HTTPException(status_code=404, detail="Instance pool is disabled.")
+    return instance_pool.metrics()
+
+
 @router.get("/component/list", response_model=List[ComponentModel])
 def list_components(user_id: str):
     try:
-        return api_context.component_api.list_all(user_id)
+        # Already serialized, so the response model is not validated again
+        return responses.ORJSONResponse(
+            content=api_context.component_api.list_all_serialized(user_id)
+        )
     except ComponentError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
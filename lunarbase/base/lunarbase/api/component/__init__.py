@@ -19,9 +19,15 @@ class ComponentAPI:
     def index_global(self):
         return self.component_controller.index_global_components()
 
+    def update_global(self, removed, added):
+        return self.component_controller.update_global_components(removed, added)
+
     def list_all(self, user_id):
         return self.component_controller.list_all_components(user_id)
 
+    def list_all_serialized(self, user_id):
+        return self.component_controller.list_all_components_serialized(user_id)
+
     def get_by_id(self, component_id: str, user_id: str):
         return self.component_controller.get_by_id(component_id, user_id)
 
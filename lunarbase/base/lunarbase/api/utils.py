@@ -2,12 +2,13 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 import time
-from typing import Callable
+from typing import Callable, Dict
 
 from fastapi import Request, Response
 from fastapi.routing import APIRoute
 from pydantic import BaseModel
 
+from lunarbase.modeling.component_encoder import component_json_dumps
 from lunarbase.utils import setup_logger
 
 API_LOGGER = setup_logger("lunarbase-api")
@@ -34,3 +35,7 @@ class TimedLoggedRoute(APIRoute):
             return response
 
         return timed_logged_route_handler
+
+
+def format_sse_event(payload: Dict):
+    return f"event: {payload.get('event', 'message')}\ndata: {component_json_dumps(payload)}\n\n"
@@ -7,6 +7,7 @@ from typing import Optional, Union, Dict, List
 from lunarbase.config import LunarConfig
 from lunarbase.controllers.workflow_controller import WorkflowController
 from lunarbase.modeling.data_models import WorkflowModel
+from lunarbase.orchestration.executor import ExecutorKind
 from lunarbase.auto_workflow import AutoWorkflow
 
 
@@ -52,8 +53,31 @@ class WorkflowAPI:
     def cancel(self, workflow_id: str, user_id: str):
         return self.workflow_controller.cancel(workflow_id, user_id)
 
-    async def run(self, workflow: WorkflowModel, user_id: str):
-        return await self.workflow_controller.run(workflow, user_id)
+    async def refresh_venv(self, workflow_id: str, user_id: str):
+        return await self.workflow_controller.refresh_venv(workflow_id, user_id)
+
+    async def run(
+        self,
+        workflow: WorkflowModel,
+        user_id: str,
+        executor: Optional[ExecutorKind] = None,
+        targets: Optional[List[str]] = None,
+        report: Optional[Dict] = None,
+    ):
+        return await self.workflow_controller.run(
+            workflow, user_id, executor=executor, targets=targets, report=report
+        )
+
+    def run_stream(
+        self,
+        workflow: WorkflowModel,
+        user_id: str,
+        executor: Optional[ExecutorKind] = None,
+        targets: Optional[List[str]] = None,
+    ):
+        return self.workflow_controller.run_stream(
+            workflow, user_id, executor=executor, targets=targets
+        )
 
     async def get_workflow_component_inputs(self, workflow_id: str, user_id: str):
         return await self.workflow_controller.get_workflow_component_inputs(workflow_id, user_id)
@@ -0,0 +1,70 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Per-item against batched throughput of mapped execution on a reference component that, like an
+embedding API or a bulk insert, pays a fixed cost per call on top of a small cost per item.
+
+    python -m lunarbase.benchmarks.batch_benchmark --items 2000 --batch-sizes 1 16 64 256
+"""
+
+import argparse
+import time
+from typing import Any
+
+from lunarbase.components.mapping import run_mapped
+from lunarcore.component.data_types import DataType
+from lunarcore.component.lunar_component import LunarComponent
+
+
+class ReferenceEmbedder(
+    LunarComponent,
+    component_name="Reference embedder",
+    input_types={"text": DataType.TEXT},
+    output_type=DataType.LIST,
+):
+    call_overhead = 0.001
+    item_cost = 0.00001
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(configuration=kwargs)
+
+    def embed(self, text: str):
+        return [float(len(text)), float(sum(map(ord, text)) % 997)]
+
+    def run(self, text: str):
+        time.sleep(self.call_overhead + self.item_cost)
+        return self.embed(text)
+
+    def run_batch(self, text):
+        time.sleep(self.call_overhead + self.item_cost * len(text))
+        return [self.embed(t) for t in text]
+
+
+def main(args):
+    items = [{"text": f"row {i}"} for i in range(args.items)]
+    component = ReferenceEmbedder()
+    print(f"{'mode':<10} {'batch':>6} {'workers':>7} {'items/s':>10}")
+    for workers in args.workers:
+        for batch_size in args.batch_sizes:
+            mode = "per-item" if batch_size <= 1 else "batched"
+            start = time.perf_counter()
+            results, errors = run_mapped(
+                component,
+                {},
+                items,
+                workers=workers,
+                batch_size=batch_size if batch_size > 1 else 0,
+            )
+            elapsed = time.perf_counter() - start
+            assert len(errors) == 0 and len(results) == len(items)
+            print(f"{mode:<10} {batch_size:>6} {workers:>7} {len(items) / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="batch_benchmark")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 16, 64, 256])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 4])
+    main(parser.parse_args())
@@ -0,0 +1,163 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Compares the Prefect flow against the local thread/process executors on the test workflows.
+Runs in the current environment, so the workflow requirements must be installed.
+
+    python -m lunarbase.benchmarks.executor_benchmark --repeat 5 [workflow.json ...]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from lunarbase.modeling.data_models import (
+    ComponentDependency,
+    ComponentInput,
+    ComponentModel,
+    ComponentOutput,
+    WorkflowModel,
+)
+from lunarbase.orchestration.engine import run_workflow_as_prefect_flow
+
+
+def text_input(wid: str, value: str):
+    return ComponentModel(
+        workflow_id=wid,
+        name="TextInput",
+        class_name="TextInput",
+        description="TextInput",
+        group="IO",
+        inputs=ComponentInput(key="input", data_type="TEMPLATE", value=value),
+        output=ComponentOutput(data_type="TEXT", value=None),
+    )
+
+
+def sleep(wid: str):
+    return ComponentModel(
+        workflow_id=wid,
+        name="Sleep",
+        class_name="Sleep",
+        description="Sleep",
+        group="Utils",
+        inputs=[
+            ComponentInput(key="input", data_type="ANY", value=None),
+            ComponentInput(key="timeout", data_type="INT", value=0),
+        ],
+        output=ComponentOutput(data_type="TEXT", value=None),
+    )
+
+
+def python_coder(wid: str):
+    return ComponentModel(
+        workflow_id=wid,
+        name="PythonCoder",
+        class_name="PythonCoder",
+        description="PythonCoder",
+        group="CODERS",
+        inputs=ComponentInput(
+            key="code",
+            data_type="Code",
+            value="""from sortedcontainers import SortedSet
+ss = SortedSet("{value}")
+ss = "".join(ss)
+result = ss""",
+            template_variables={"code.value": None},
+        ),
+        output=ComponentOutput(data_type="ANY", value=None),
+    )
+
+
+def sleeping_python_coder():
+    wid = str(uuid4())
+    components = [text_input(wid, "abracadabra"), sleep(wid), python_coder(wid)]
+    return WorkflowModel(
+        id=wid,
+        name="The Sleeping Python coder",
+        description="The Sleeping Python coder",
+        components=components,
+        dependencies=[
+            ComponentDependency(
+                component_input_key="input",
+                source_label=components[0].label,
+                target_label=components[1].label,
+                template_variable_key=None,
+            ),
+            ComponentDependency(
+                component_input_key="code",
+                source_label=components[1].label,
+                target_label=components[2].label,
+                template_variable_key="code.value",
+            ),
+        ],
+    )
+
+
+def fan_out(width: int = 8):
+    wid = str(uuid4())
+    source = text_input(wid, "lunar")
+    sleepers = [sleep(wid) for _ in range(width)]
+    return WorkflowModel(
+        id=wid,
+        name=f"Fan out {width}",
+        description=f"One input feeding {width} sleep components",
+        components=[source] + sleepers,
+        dependencies=[
+            ComponentDependency(
+                component_input_key="input",
+                source_label=source.label,
+                target_label=sleeper.label,
+                template_variable_key=None,
+            )
+            for sleeper in sleepers
+        ],
+    )
+
+
+async def time_runs(workflow_path: str, executor: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await run_workflow_as_prefect_flow(workflow_path, venv=None, executor=executor)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def main(workflow_paths, executors, repeat: int):
+    print(f"{'workflow':<32} {'executor':>8} {'median (s)':>11} {'min (s)':>9}")
+    for workflow_path in workflow_paths:
+        with open(workflow_path, "r") as w:
+            name = json.load(w).get("name", Path(workflow_path).stem)
+        for executor in executors:
+            timings = await time_runs(workflow_path, executor, repeat)
+            print(
+                f"{name[:32]:<32} {executor:>8} {statistics.median(timings):>11.4f} {min(timings):>9.4f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="executor_benchmark")
+    parser.add_argument("workflows", nargs="*", help="Workflow JSON files to benchmark.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--executors", nargs="+", default=["prefect", "thread", "process"]
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workflow_paths = list(args.workflows)
+        if len(workflow_paths) == 0:
+            for workflow in [sleeping_python_coder(), fan_out()]:
+                workflow_path = str(Path(tmp_dir, f"{workflow.id}.json"))
+                with open(workflow_path, "w") as w:
+                    w.write(workflow.model_dump_json(by_alias=True))
+                workflow_paths.append(workflow_path)
+
+        asyncio.run(main(workflow_paths, args.executors, args.repeat))
@@ -0,0 +1,92 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Registry startup time over a synthetic library of zipped component packages: parsing every package, as
+the registry did on each boot, against loading them from the registry snapshot.
+
+    python -m lunarbase.benchmarks.registry_benchmark --packages 200
+"""
+
+import argparse
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from lunarbase.registry.registry_models import RegisteredComponentModel
+from lunarbase.registry.snapshot import RegistrySnapshot
+
+COMPONENT_SOURCE = '''
+from typing import Any
+
+from lunarcore.component.component_group import ComponentGroup
+from lunarcore.component.data_types import DataType
+from lunarcore.component.lunar_component import LunarComponent
+
+
+class Reference{index}(
+    LunarComponent,
+    component_name="Reference {index}",
+    component_description="""Reference component {index}.""",
+    input_types={{"text": DataType.TEXT, "count": DataType.INT}},
+    output_type=DataType.TEXT,
+    component_group=ComponentGroup.DATA_TRANSFORMATION,
+    separator=" ",
+):
+    def __init__(self, **kwargs: Any):
+        super().__init__(configuration=kwargs)
+
+    def run(self, text: str, count: int):
+        return self.configuration["separator"].join([text] * count)
+'''
+
+
+def create_packages(root: Path, count: int):
+    packages = []
+    for index in range(count):
+        module_name = f"reference_{index}"
+        package_path = Path(root, f"{module_name}.zip")
+        with zipfile.ZipFile(package_path, "w") as package:
+            package.writestr(f"{module_name}/__init__.py", COMPONENT_SOURCE.format(index=index))
+            package.writestr("requirements.txt", "requests>=2\n")
+        packages.append((str(package_path), module_name))
+    return packages
+
+
+def parse_all(packages):
+    for package_path, module_name in packages:
+        registered_component = RegisteredComponentModel(
+            package_path=package_path, module_name=module_name
+        )
+        _ = registered_component.component_model
+        yield registered_component
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as root:
+        packages = create_packages(Path(root), args.packages)
+
+        start = time.perf_counter()
+        components = list(parse_all(packages))
+        parse_elapsed = time.perf_counter() - start
+
+        snapshot_path = str(Path(root, "registry_snapshot.json"))
+        RegistrySnapshot(snapshot_path).save(components)
+
+        start = time.perf_counter()
+        snapshot = RegistrySnapshot(snapshot_path).load()
+        loaded = [snapshot.get(package_path, module_name) for package_path, module_name in packages]
+        snapshot_elapsed = time.perf_counter() - start
+        assert all(component is not None for component in loaded)
+
+    print(f"{'mode':<10} {'packages':>8} {'seconds':>9} {'packages/s':>11}")
+    for mode, elapsed in [("parse", parse_elapsed), ("snapshot", snapshot_elapsed)]:
+        print(f"{mode:<10} {args.packages:>8} {elapsed:>9.3f} {args.packages / elapsed:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="registry_benchmark")
+    parser.add_argument("--packages", type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,72 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Compares the topological scheduler against the former requeue loop of create_flow_dag on synthetic DAGs.
+
+    python -m lunarbase.benchmarks.scheduler_benchmark --sizes 1000 5000 10000
+"""
+
+import argparse
+import random
+import time
+from collections import deque
+
+import networkx as nx
+
+from lunarbase.orchestration.scheduler import topological_order
+
+
+def synthetic_dag(size: int, max_parents: int = 3, seed: int = 0):
+    rng = random.Random(seed)
+    labels = [f"COMPONENT-{i}" for i in range(size)]
+    dag = nx.MultiDiGraph()
+    # Components are stored in arbitrary order in a workflow, not in dependency order
+    shuffled = labels.copy()
+    rng.shuffle(shuffled)
+    dag.add_nodes_from(shuffled)
+    for i in range(1, size):
+        for parent in rng.sample(range(i), min(i, rng.randint(1, max_parents))):
+            dag.add_edge(labels[parent], labels[i], data=("input", None))
+    return dag
+
+
+def requeue_order(dag: nx.MultiDiGraph):
+    running_queue = deque(list(dag.nodes))
+    submitted = dict()
+    order = []
+    while len(running_queue) > 0:
+        next_task = running_queue.popleft()
+        try:
+            for dep in dag.predecessors(next_task):
+                submitted[dep]
+        except KeyError:
+            running_queue.append(next_task)
+            continue
+        submitted[next_task] = True
+        order.append(next_task)
+    return order
+
+
+def timed(fn, dag):
+    start = time.perf_counter()
+    fn(dag)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="scheduler_benchmark")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 2500, 5000, 10000])
+    parser.add_argument("--skip-requeue", action="store_true", help="Only time the scheduler.")
+    args = parser.parse_args()
+
+    print(f"{'components':>10} {'edges':>8} {'scheduler (s)':>14} {'requeue (s)':>12}")
+    for size in args.sizes:
+        dag = synthetic_dag(size)
+        scheduler_time = timed(topological_order, dag)
+        requeue_time = None if args.skip_requeue else timed(requeue_order, dag)
+        print(
+            f"{size:>10} {dag.number_of_edges():>8} {scheduler_time:>14.4f} "
+            f"{'-' if requeue_time is None else f'{requeue_time:.4f}':>12}"
+        )
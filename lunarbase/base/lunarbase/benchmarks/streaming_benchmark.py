@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Throughput of a synthetic STREAM producer/consumer chain: the in-line generator the engine used to drive
+against the bounded-queue pipeline, and recomputing a stream per consumer against tee'ing it.
+
+    python -m lunarbase.benchmarks.streaming_benchmark --items 200 --consumers 3
+"""
+
+import argparse
+import threading
+import time
+
+from lunarbase.orchestration.streaming import tee
+
+
+def producer(items: int, delay: float):
+    def source():
+        for i in range(items):
+            # Stands in for I/O bound work (an API page, a file chunk)
+            time.sleep(delay)
+            yield i
+
+    return source
+
+
+def consume(stream, delay: float):
+    consumed = 0
+    for _ in stream:
+        time.sleep(delay)
+        consumed += 1
+    return consumed
+
+
+def inline(items: int, consumers: int, produce_delay: float, consume_delay: float, queue_size: int):
+    # Every consumer drives its own copy of the generator on the calling thread
+    return sum(
+        consume(producer(items, produce_delay)(), consume_delay) for _ in range(consumers)
+    )
+
+
+def pipelined(items: int, consumers: int, produce_delay: float, consume_delay: float, queue_size: int):
+    subscriptions = tee(producer(items, produce_delay), consumers, maxsize=queue_size)
+    counts = [0] * consumers
+
+    def run(index):
+        counts[index] = consume(subscriptions[index], consume_delay)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(consumers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts)
+
+
+def main(args):
+    print(f"{'mode':<10} {'consumers':>9} {'items/s':>10} {'seconds':>8}")
+    for consumers in sorted({1, args.consumers}):
+        for name, run in [("inline", inline), ("pipelined", pipelined)]:
+            start = time.perf_counter()
+            consumed = run(
+                args.items, consumers, args.produce_delay, args.consume_delay, args.queue_size
+            )
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10} {consumers:>9} {consumed / elapsed:>10.1f} {elapsed:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="streaming_benchmark")
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--consumers", type=int, default=3)
+    parser.add_argument("--produce-delay", type=float, default=0.002)
+    parser.add_argument("--consume-delay", type=float, default=0.002)
+    parser.add_argument("--queue-size", type=int, default=16)
+    main(parser.parse_args())
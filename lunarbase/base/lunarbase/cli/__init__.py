@@ -24,7 +24,7 @@ from prefect.client.schemas.filters import (
 from prefect.client.schemas.sorting import FlowRunSort
 from prefect.states import Cancelling
 
-from typing import Annotated, Optional
+from typing import Annotated, List, Optional
 import lunarbase
 import anyio
 import typer
@@ -33,10 +33,12 @@ from lunarbase.controllers.component_controller import (
     ComponentController,
 )
 from lunarbase.controllers.workflow_controller import WorkflowController
+from lunarbase.modeling.component_encoder import ComponentEncoder
 from lunarbase.modeling.data_models import (
     WorkflowModel,
     ComponentModel,
 )
+from lunarbase.orchestration.engine import serialize_component_result
 from lunarbase.persistence import PersistenceLayer
 from lunarbase.registry import LunarRegistry
 from lunarbase.utils import setup_logger
@@ -133,31 +135,39 @@ async def start(
     name="run",
     short_help="Initiate the run of a workflow.",
 )
-def run_workflow(
+async def run_workflow(
     user: Annotated[str, typer.Option(help="User id to run as.")],
     location: Annotated[
         str,
         typer.Argument(help="A path to a workflow or component to run as a JSON file."),
     ],
     show: Annotated[bool, typer.Option(help="Print the output to STDOUT")] = False,
+    executor: Annotated[
+        Optional[str],
+        typer.Option(help="Run with prefect (default) or the local thread/process executor."),
+    ] = None,
+    target: Annotated[
+        Optional[List[str]],
+        typer.Option(help="Only run this component and the ones it depends on. Can be repeated."),
+    ] = None,
 ):
     user = user or app_context.workflow_controller.config.DEFAULT_USER_PROFILE
     with open(location, "r") as file:
         obj = json.load(file)
     workflow = WorkflowModel.model_validate(obj)
-    workflow_result = app_context.workflow_controller.run(
-        workflow=workflow, user_id=user
+    workflow_result = await app_context.workflow_controller.run(
+        workflow=workflow, user_id=user, executor=executor, targets=target or None
     )
     if show:
         rprint(workflow_result)
-    return json.dumps(workflow_result)
+    return json.dumps(serialize_component_result(workflow_result), cls=ComponentEncoder)
 
 
 @component.command(
     name="run",
     short_help="Initiate the run of a component as a workflow.",
 )
-def run_component(
+async def run_component(
     user: Annotated[str, typer.Option(help="User id to run as.")],
     location: Annotated[
         str,
@@ -172,12 +182,12 @@ def run_component(
     with open(location, "r") as file:
         obj = json.load(file)
     component = ComponentModel.model_validate(obj)
-    component_result = app_context.component_controller.run(
+    component_result = await app_context.component_controller.run(
         component=component, user_id=user
     )
     if show:
         rprint(component_result)
-    return json.dumps(component_result)
+    return json.dumps(serialize_component_result(component_result), cls=ComponentEncoder)
 
 
 @component.command(
@@ -0,0 +1,183 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import contextlib
+import hashlib
+import mmap
+import os
+import shutil
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Optional
+from uuid import uuid4
+
+import numpy as np
+
+DIGEST_CHUNK_SIZE = 1 << 24
+
+
+def file_digest(path: Path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if path.stat().st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, len(mapped), DIGEST_CHUNK_SIZE):
+                digest.update(mapped[start: start + DIGEST_CHUNK_SIZE])
+    return digest.hexdigest()
+
+
+class ArtifactHandle:
+    """
+    Reference to a component output stored in the artifact store. Handles are what travels between
+    components, gets pickled and JSON encoded; the value is only mapped into memory by `load`.
+    """
+
+    def __init__(self, path: str, kind: str, size: int, digest: str):
+        self.path = path
+        self.kind = kind
+        self.size = size
+        self.digest = digest
+        self._value = None
+
+    def load(self):
+        if self._value is None:
+            if self.kind == "numpy":
+                # Memory-mapped copy-on-write: pages are read on access, and in-place changes stay in
+                # memory instead of failing or being written back to the shared artifact
+                self._value = np.load(self.path, mmap_mode="c", allow_pickle=False)
+            else:
+                import pyarrow as pa
+
+                table = pa.ipc.open_file(pa.memory_map(self.path, "r")).read_all()
+                self._value = table.to_pandas() if self.kind == "pandas" else table
+        return self._value
+
+    def describe(self):
+        # The digest, not the path, identifies the content, so result cache keys stay stable across runs
+        return {"artifact": self.digest, "kind": self.kind, "size": self.size}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_value"] = None
+        return state
+
+    def __repr__(self):
+        return f"ArtifactHandle({self.kind}, {self.size} bytes, {self.path})"
+
+
+def artifact_kind(value: Any):
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        return "numpy", value.nbytes
+    module = type(value).__module__.split(".")[0]
+    if module == "pyarrow" and type(value).__name__ == "Table":
+        return "arrow", value.nbytes
+    if module == "pandas" and type(value).__name__ == "DataFrame":
+        return "pandas", int(value.memory_usage(index=True, deep=False).sum())
+    return None, 0
+
+
+class ArtifactStore:
+    """
+    Writes component outputs above `min_size` bytes once, under one directory per run, and keeps the
+    directories of the last `retention` runs.
+    """
+
+    def __init__(self, path: str, min_size: int, retention: int):
+        self.path = Path(path)
+        self.min_size = min_size
+        self.retention = retention
+        self.run_path = Path(self.path, f"{time.time_ns()}-{uuid4().hex[:8]}")
+
+    def externalize(self, label: str, value: Any):
+        kind, size = artifact_kind(value)
+        if kind is None or size < self.min_size:
+            return value
+        if kind in ["arrow", "pandas"]:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return value
+
+        self.run_path.mkdir(parents=True, exist_ok=True)
+        name = label.replace("/", "_")
+        if kind == "numpy":
+            artifact_path = Path(self.run_path, f"{name}.npy")
+            np.save(artifact_path, np.ascontiguousarray(value), allow_pickle=False)
+        else:
+            import pyarrow as pa
+
+            table = pa.Table.from_pandas(value) if kind == "pandas" else value
+            artifact_path = Path(self.run_path, f"{name}.arrow")
+            with pa.OSFile(str(artifact_path), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+        return ArtifactHandle(
+            str(artifact_path), kind, artifact_path.stat().st_size, file_digest(artifact_path)
+        )
+
+    def adopt(self, label: str, handle: ArtifactHandle):
+        """
+        Links an artifact of an earlier run, e.g. a cached result, into this run, so that it is kept as
+        long as this run is.
+        """
+        source = Path(handle.path)
+        if source.parent == self.run_path:
+            return handle
+        self.run_path.mkdir(parents=True, exist_ok=True)
+        artifact_path = Path(self.run_path, f"{label.replace('/', '_')}{source.suffix}")
+        try:
+            os.link(source, artifact_path)
+        except OSError:
+            shutil.copyfile(source, artifact_path)
+        return ArtifactHandle(str(artifact_path), handle.kind, handle.size, handle.digest)
+
+    def collect_garbage(self):
+        if not self.path.is_dir() or self.retention <= 0:
+            return
+        runs = sorted(
+            (run for run in self.path.iterdir() if run.is_dir()),
+            key=lambda run: run.name,
+            reverse=True,
+        )
+        for run in runs[self.retention:]:
+            shutil.rmtree(run, ignore_errors=True)
+
+
+# Per run: concurrent in-process runs each see their own store, and threads started for a run with
+# its context (e.g. asyncio.to_thread, Prefect tasks) see it as well
+ARTIFACT_STORE: ContextVar[Optional[ArtifactStore]] = ContextVar("artifact_store", default=None)
+
+
+@contextlib.contextmanager
+def artifact_store(path: Optional[str], min_size: int, retention: int):
+    if path is None:
+        yield None
+        return
+
+    store = ArtifactStore(path, min_size=min_size, retention=retention)
+    token = ARTIFACT_STORE.set(store)
+    try:
+        yield store
+    finally:
+        ARTIFACT_STORE.reset(token)
+        # Outputs of this run are kept for the caller; older runs go past the retention
+        store.collect_garbage()
+
+
+def get_artifact_store():
+    return ARTIFACT_STORE.get()
+
+
+def artifact_available(value: Any):
+    # Artifacts of runs past the retention are deleted, handles to them cannot be loaded anymore
+    return not isinstance(value, ArtifactHandle) or Path(value.path).is_file()
+
+
+def resolve_artifact(value: Any):
+    if isinstance(value, ArtifactHandle):
+        return value.load()
+    return value
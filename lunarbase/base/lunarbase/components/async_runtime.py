@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import inspect
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from lunarbase import LUNAR_CONTEXT
+
+
+class AsyncRuntime:
+    """
+    One event loop on a daemon thread, shared by every async component in the process so that they can
+    share clients and connections. Runs are limited per component class by a semaphore.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.semaphores: Dict[str, asyncio.Semaphore] = dict()
+        self.thread = threading.Thread(
+            target=self._run_loop, name="lunar-async-components", daemon=True
+        )
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _limited(self, key: str, limit: int, awaitable: Awaitable):
+        # Only touched from the loop thread, so no lock is needed
+        semaphore = self.semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max(1, limit))
+            self.semaphores[key] = semaphore
+        async with semaphore:
+            return await awaitable
+
+    async def _gather(self, key: str, limit: int, calls: List[Callable[[], Awaitable]]):
+        async def outcome(call):
+            try:
+                return True, await self._limited(key, limit, call())
+            except Exception as e:
+                return False, e
+
+        return await asyncio.gather(*(outcome(call) for call in calls))
+
+    def run(self, awaitable: Awaitable, key: str, limit: int):
+        return asyncio.run_coroutine_threadsafe(
+            self._limited(key, limit, awaitable), self.loop
+        ).result()
+
+    def gather(self, calls: List[Callable[[], Awaitable]], key: str, limit: int):
+        """
+        Runs all calls concurrently, up to the class limit, and returns (succeeded, result or exception)
+        pairs in the order of the calls.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._gather(key, limit, calls), self.loop
+        ).result()
+
+
+ASYNC_RUNTIME: Optional[Tuple[int, AsyncRuntime]] = None
+ASYNC_RUNTIME_LOCK = threading.Lock()
+
+
+def get_async_runtime():
+    global ASYNC_RUNTIME
+    with ASYNC_RUNTIME_LOCK:
+        # The loop thread does not survive a fork, so forked workers start their own
+        if ASYNC_RUNTIME is None or ASYNC_RUNTIME[0] != os.getpid():
+            ASYNC_RUNTIME = (os.getpid(), AsyncRuntime())
+        return ASYNC_RUNTIME[1]
+
+
+def is_async_component(component_instance: Any):
+    return inspect.iscoroutinefunction(getattr(component_instance, "run", None))
+
+
+def concurrency_limit(component_instance: Any):
+    instance_class = component_instance.__class__
+    limit = getattr(instance_class, "max_concurrency", None)
+    if limit is None:
+        limit = LUNAR_CONTEXT.lunar_config.ASYNC_COMPONENT_CONCURRENCY
+    return f"{instance_class.__module__}.{instance_class.__qualname__}", limit
+
+
+def resolve_run_result(component_instance: Any, result: Any):
+    """
+    Awaits the result of an `async def run` (or `run_batch`) on the shared loop. Results of synchronous
+    components are returned as they are.
+    """
+    if not inspect.isawaitable(result):
+        return result
+    key, limit = concurrency_limit(component_instance)
+    return get_async_runtime().run(result, key, limit)
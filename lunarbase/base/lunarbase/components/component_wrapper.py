@@ -10,7 +10,16 @@ import os
 from distutils.util import strtobool
 from typing import Any, Dict, Optional
 
+from lunarbase.components.artifacts import (
+    ArtifactHandle,
+    get_artifact_store,
+    resolve_artifact,
+)
+from lunarbase.components.async_runtime import resolve_run_result
 from lunarbase.components.errors import ComponentError
+from lunarbase.components.instance_pool import get_instance_pool
+from lunarbase.components.mapping import run_mapped
+from lunarbase.components.result_cache import get_result_cache, package_fingerprint
 from lunarbase.config import ENVIRONMENT_PREFIX
 from lunarbase.modeling.data_models import (
     UNDEFINED,
@@ -28,6 +37,8 @@ import json
 logger = setup_logger("Lunarbase")
 
 BASE_CONFIGURATION = {"force_run": False}
+# Mapped execution settings, defaulting to the MAP_* values of the Lunar config
+MAP_CONFIGURATION = ["map_executor", "map_workers", "map_chunk_size", "map_batch_size"]
 
 
 class ComponentWrapper:
@@ -41,7 +52,13 @@ class ComponentWrapper:
                     f"Error encountered while trying to load {component.class_name}! "
                     f"Component not found in {LUNAR_CONTEXT.lunar_registry.get_component_names()}. "
                 )
-            component_model = ComponentModel(
+            # Both models are already validated, so the run model is assembled without validating again.
+            # Only what the ComponentModel validators derive from the combination is applied here.
+            inputs = [
+                inp.model_copy(deep=True, update={"component_id": component.id})
+                for inp in component.inputs
+            ]
+            component_model = ComponentModel.model_construct(
                 id=component.id,
                 workflow_id=registered_component.component_model.id,
                 name=registered_component.component_model.name,
@@ -49,27 +66,33 @@ class ComponentWrapper:
                 label=component.label,
                 description=registered_component.component_model.description,
                 group=registered_component.component_model.group,
-                inputs=registered_component.component_model.inputs,
-                output=registered_component.component_model.output,
+                inputs=inputs,
+                output=component.output.model_copy(deep=True, update={"component_id": component.id}),
                 is_terminal=component.is_terminal,
                 component_example_path=component.component_example_path,
-            )
-            component_model.configuration = self.update_configuration(
-                component.configuration
+                configuration=ComponentModel.validate_configuration(
+                    self.update_configuration(component.configuration)
+                ),
             )
             self.force_run = (
                 component_model.configuration.pop("force_run", None)
                 or BASE_CONFIGURATION["force_run"]
             )
+            self.map_configuration = {
+                key: component_model.configuration.pop(key)
+                for key in MAP_CONFIGURATION
+                if key in component_model.configuration
+            }
+            self.instance_configuration = dict(component_model.configuration)
+            self.package_fingerprint = package_fingerprint(registered_component)
+            self.cache_status = None
+            self.instance_status = None
+            self.map_errors = []
             component_module = importlib.import_module(registered_component.module_name)
-            instance_class = getattr(component_module, component_model.class_name)
-            self.component_instance = instance_class(
-                **component_model.configuration
-            )
-            # This will need to be rethought
+            self.instance_class = getattr(component_module, component_model.class_name)
+            # Borrowed by run_in_workflow only, so that queued tasks do not hold pooled instances
+            self._component_instance = None
             self.component_model = component_model
-            self.component_model.inputs = component.inputs
-            self.component_model.output = component.output
 
         except Exception as e:
             raise ComponentError(
@@ -88,6 +111,37 @@ class ComponentWrapper:
     def configuration(self):
         return self.component_model.configuration
 
+    @property
+    def component_instance(self):
+        if self._component_instance is None:
+            instance_pool = get_instance_pool()
+            if instance_pool is None:
+                self._component_instance = self.instance_class(**self.instance_configuration)
+                self.instance_status = None
+            else:
+                self._component_instance, reused = instance_pool.acquire(
+                    self.instance_class,
+                    self.instance_configuration,
+                    lambda: self.instance_class(**self.instance_configuration),
+                )
+                self.instance_status = "hit" if reused else "miss"
+        return self._component_instance
+
+    def acquire_instance(self):
+        try:
+            return self.component_instance
+        except Exception as e:
+            raise ComponentError(
+                f"Failed to instantiate component {self.component_model.label}: {str(e)}!"
+            )
+
+    def release_instance(self):
+        # Hands the instance back to the pool; the next access borrows one again
+        instance_pool = get_instance_pool()
+        if self._component_instance is not None and instance_pool is not None:
+            instance_pool.release(self._component_instance, self.instance_configuration)
+        self._component_instance = None
+
     @property
     def disable_cache(self):
         fr = self.__dict__.get("force_run", "false")
@@ -95,6 +149,36 @@ class ComponentWrapper:
             return fr
         return bool(strtobool(fr))
 
+    @property
+    def cacheable(self):
+        # Components opt in with a `cacheable = True` class attribute; streams are consumed lazily
+        return (
+            self.component_model.output.data_type != DataType.STREAM
+            and getattr(self.instance_class, "cacheable", False)
+        )
+
+    @property
+    def report_details(self):
+        details = {"cache": self.cache_status, "instance": self.instance_status}
+        if len(self.map_errors) > 0:
+            details["item_errors"] = self.map_errors
+        return details
+
+    def get_map_options(self):
+        config = LUNAR_CONTEXT.lunar_config
+        return {
+            "executor": self.map_configuration.get("map_executor") or config.MAP_EXECUTOR,
+            "workers": int(self.map_configuration.get("map_workers") or config.MAP_WORKERS),
+            "chunk_size": int(
+                self.map_configuration.get("map_chunk_size") or config.MAP_CHUNK_SIZE
+            ),
+            "batch_size": int(
+                self.map_configuration.get("map_batch_size")
+                or config.MAP_BATCH_SIZE
+                or getattr(self.instance_class, "default_batch_size", 0)
+            ),
+        }
+
     @staticmethod
     def get_from_env(data: Dict):
         env_data = dict()
@@ -153,12 +237,21 @@ class ComponentWrapper:
         return _class
 
     def run(self, **run_kwargs):
-        return self.component_instance.run(**run_kwargs)
+        return resolve_run_result(
+            self.component_instance, self.component_instance.run(**run_kwargs)
+        )
 
     def run_in_workflow(self):
         """
         Input are expected to come from Component model
         """
+        try:
+            self.acquire_instance()
+            return self._run_in_workflow()
+        finally:
+            self.release_instance()
+
+    def _run_in_workflow(self):
         user_context = LUNAR_CONTEXT.lunar_registry.get_user_context()
         original_inputs = deepcopy(self.component_model.inputs)
         inputs = []
@@ -179,42 +272,98 @@ class ComponentWrapper:
         # Replace environment
         inputs = ComponentWrapper.get_from_env(inputs)
 
+        result_cache, cache_key = get_result_cache(), None
+        if result_cache is not None and self.cacheable:
+            cache_key = result_cache.make_key(
+                self.component_model.class_name,
+                self.package_fingerprint,
+                self.component_model.configuration,
+                inputs,
+                user_id=os.environ.get("LUNAR_USERID"),
+            )
+        if cache_key is None:
+            self.cache_status = None
+        elif self.disable_cache:
+            self.cache_status = "bypass"
+        else:
+            hit, cached_result = result_cache.get(
+                cache_key, self.component_model.class_name
+            )
+            self.cache_status = "hit" if hit else "miss"
+            if hit:
+                store = get_artifact_store()
+                if store is None:
+                    cached_result = resolve_artifact(cached_result)
+                elif isinstance(cached_result, ArtifactHandle):
+                    cached_result = store.adopt(self.component_model.label, cached_result)
+                return self.finish_run(cached_result, original_inputs)
+
+        # Upstream outputs kept in the artifact store are mapped in only now, after keying on their digest
+        inputs = {key: resolve_artifact(value) for key, value in inputs.items()}
+
         # Type compatibility check & mapping (for loops)
         mappings, non_mappings = dict(), inputs.copy()
 
         for in_name, in_value in inputs.items():
             try:
                 if (
-                    self.component_instance.__class__.input_types[in_name]
+                    self.instance_class.input_types[in_name]
                     != DataType.LIST
                     and isinstance(in_value, list)
                     and len(in_value) > 0
-                    and self.component_instance.__class__.input_types[in_name].type()
+                    and self.instance_class.input_types[in_name].type()
                     == type(in_value[0])
                 ):
                     mappings[in_name] = in_value
                     non_mappings.pop(in_name)
             except KeyError as e:
                 raise ComponentError(f"Unexpected input. Full error message: {str(e)}!")
+        self.map_errors = []
         if len(mappings) == 0:
-            run_result = self.component_instance.run(**inputs)
+            run_result = self.run(**inputs)
         else:
-            run_result = []
-
             mapped_keys = list(mappings.keys())
+            items = []
             for mapped_ins in zip(*mappings.values()):
-                interation_inputs = dict(zip(mapped_keys, mapped_ins))
-                interation_inputs.update(non_mappings)
-                iteration_result = self.component_instance.run(**interation_inputs)
-                run_result.append(iteration_result)
+                iteration_inputs = dict(zip(mapped_keys, mapped_ins))
+                iteration_inputs.update(non_mappings)
+                items.append(iteration_inputs)
+
+            run_result, self.map_errors = run_mapped(
+                self.component_instance,
+                self.instance_configuration,
+                items,
+                **self.get_map_options(),
+            )
+            if len(self.map_errors) == len(items):
+                raise ComponentError(
+                    f"All {len(items)} mapped runs failed. First error: {self.map_errors[0]['error']}"
+                )
+            if len(self.map_errors) > 0:
+                logger.warning(
+                    f"{len(self.map_errors)} of {len(items)} mapped runs of "
+                    f"{self.component_model.label} failed."
+                )
 
         if self.component_model.output.data_type == DataType.ANY:
             run_result = json.loads(json.dumps(run_result))
 
+        store = get_artifact_store()
+        if store is not None:
+            run_result = store.externalize(self.component_model.label, run_result)
+
+        # Large outputs are cached as handles to their artifact, not pickled along
+        if cache_key is not None and len(self.map_errors) == 0:
+            result_cache.put(cache_key, self.component_model.class_name, run_result)
+
+        return self.finish_run(run_result, original_inputs)
+
+    def finish_run(self, run_result, original_inputs):
         self.set_output(run_result)
 
         # Restoring
         self.component_model.configuration["force_run"] = self.force_run
+        self.component_model.configuration.update(self.map_configuration)
         self.component_model.inputs = original_inputs
         return self.component_model
 
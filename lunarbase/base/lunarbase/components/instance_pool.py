@@ -0,0 +1,142 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from lunarbase.modeling.component_encoder import component_json_dumps
+from lunarbase.utils import setup_logger
+
+from lunarbase import LUNAR_CONTEXT
+
+logger = setup_logger("instance-pool")
+
+
+def configuration_hash(configuration: Dict):
+    try:
+        payload = component_json_dumps(configuration, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class InstancePool:
+    """
+    Process-level pool of idle component instances keyed by class and a hash of the resolved configuration.
+    An instance is lent to one run at a time and returned once the run is over. Components with a
+    `stateful = True` class attribute are always built anew.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._idle: "OrderedDict[Tuple[Any, str, int], Tuple[Any, float]]" = OrderedDict()
+        self._metrics: Dict[str, Dict[str, int]] = dict()
+        self._lock = threading.Lock()
+
+    def key(self, instance_class: type, configuration: Dict):
+        if getattr(instance_class, "stateful", False):
+            return None
+        digest = configuration_hash(configuration)
+        if digest is None:
+            return None
+        return instance_class, digest
+
+    def acquire(self, instance_class: type, configuration: Dict, factory: Callable[[], Any]):
+        """
+        Returns an instance and whether it came from the pool.
+        """
+        key = self.key(instance_class, configuration)
+        instance = None
+        if key is not None:
+            with self._lock:
+                self._expire()
+                for idle_key in self._idle:
+                    if idle_key[:2] == key:
+                        instance, _ = self._idle.pop(idle_key)
+                        break
+                self._record(instance_class.__name__, instance is not None)
+        if instance is not None:
+            return instance, True
+        return factory(), False
+
+    def release(self, instance: Any, configuration: Dict):
+        key = self.key(instance.__class__, configuration)
+        if key is None or self.max_size <= 0:
+            return
+        with self._lock:
+            self._idle[(*key, id(instance))] = (instance, time.monotonic())
+            self._expire()
+            while len(self._idle) > self.max_size:
+                self._idle.popitem(last=False)
+
+    def metrics(self):
+        with self._lock:
+            components = {
+                class_name: {
+                    **counts,
+                    "hit_ratio": round(counts["hits"] / (counts["hits"] + counts["misses"]), 4)
+                    if counts["hits"] + counts["misses"]
+                    else 0.0,
+                }
+                for class_name, counts in sorted(self._metrics.items())
+            }
+            return {
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "components": components,
+            }
+
+    def invalidate(self, module_names: Set[str]):
+        """
+        Drops the idle instances of components coming from the given packages, e.g. after an update.
+        """
+        with self._lock:
+            stale = [
+                idle_key
+                for idle_key in self._idle
+                if idle_key[0].__module__.split(".")[0] in module_names
+            ]
+            for idle_key in stale:
+                self._idle.pop(idle_key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+            self._metrics.clear()
+
+    def _expire(self):
+        if self.ttl <= 0:
+            return
+        deadline = time.monotonic() - self.ttl
+        # Oldest releases come first
+        while len(self._idle) > 0:
+            idle_key, (_, released) = next(iter(self._idle.items()))
+            if released >= deadline:
+                break
+            self._idle.pop(idle_key)
+
+    def _record(self, class_name: str, hit: bool):
+        counts = self._metrics.setdefault(class_name, {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+
+
+INSTANCE_POOL: Optional[InstancePool] = None
+
+
+def get_instance_pool():
+    global INSTANCE_POOL
+    config = LUNAR_CONTEXT.lunar_config
+    if not config.INSTANCE_POOL_ENABLED:
+        return None
+    if INSTANCE_POOL is None:
+        INSTANCE_POOL = InstancePool(
+            max_size=config.INSTANCE_POOL_MAX_SIZE, ttl=config.INSTANCE_POOL_TTL
+        )
+    return INSTANCE_POOL
@@ -0,0 +1,209 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import importlib
+import math
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from lunarbase.components.async_runtime import (
+    concurrency_limit,
+    get_async_runtime,
+    is_async_component,
+    resolve_run_result,
+)
+from lunarbase.components.errors import ComponentError
+from lunarbase.components.instance_pool import InstancePool, get_instance_pool
+
+MAP_EXECUTORS = ["thread", "process"]
+# Chunks per worker when no chunk size is given: small enough to balance, large enough to amortize dispatch
+CHUNKS_PER_WORKER = 4
+
+MAP_POOLS: Dict[Tuple[str, int], Executor] = dict()
+
+
+def get_map_pool(kind: str, workers: int):
+    pool = MAP_POOLS.get((kind, workers))
+    if pool is None:
+        if kind == "process":
+            pool = ProcessPoolExecutor(max_workers=workers)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lunar-map")
+        MAP_POOLS[(kind, workers)] = pool
+    return pool
+
+
+def describe_error(error: BaseException):
+    return f"{error.__class__.__name__}: {str(error)}"
+
+
+def run_chunk(component_instance: Any, chunk: List[Dict]):
+    outcomes = []
+    for kwargs in chunk:
+        try:
+            outcomes.append(
+                (True, resolve_run_result(component_instance, component_instance.run(**kwargs)))
+            )
+        except Exception as e:
+            outcomes.append((False, describe_error(e)))
+    return outcomes
+
+
+def run_async_items(component_instance: Any, items: List[Dict]):
+    # Async runs are not chunked: all items are awaited together on the shared loop, up to the class limit
+    key, limit = concurrency_limit(component_instance)
+    outcomes = get_async_runtime().gather(
+        [lambda kwargs=kwargs: component_instance.run(**kwargs) for kwargs in items],
+        key,
+        limit,
+    )
+    return [(ok, value if ok else describe_error(value)) for ok, value in outcomes]
+
+
+def run_batch_chunk(component_instance: Any, chunk: List[Dict]):
+    list_inputs = {key: [kwargs[key] for kwargs in chunk] for key in chunk[0]}
+    try:
+        results = list(
+            resolve_run_result(component_instance, component_instance.run_batch(**list_inputs))
+        )
+        if len(results) != len(chunk):
+            raise ComponentError(
+                f"run_batch returned {len(results)} results for {len(chunk)} inputs"
+            )
+    except Exception as e:
+        # Rerunning items can repeat side effects of the failed batch, so it is only done on request
+        if getattr(component_instance.__class__, "retry_batch_items", False):
+            return run_chunk(component_instance, chunk)
+        return [(False, describe_error(e))] * len(chunk)
+    return [(True, result) for result in results]
+
+
+def supports_batch(component_instance: Any):
+    supports = getattr(component_instance.__class__, "supports_batch", None)
+    return supports is not None and supports()
+
+
+def run_pooled_chunk(
+    instance_pool: InstancePool,
+    instance_class: type,
+    configuration: Dict,
+    chunk: List[Dict],
+    batched: bool = False,
+):
+    # The chunk gets an instance of its own for its duration, so instances are never run concurrently
+    component_instance, _ = instance_pool.acquire(
+        instance_class, configuration, lambda: instance_class(**configuration)
+    )
+    try:
+        if batched:
+            return run_batch_chunk(component_instance, chunk)
+        return run_chunk(component_instance, chunk)
+    finally:
+        instance_pool.release(component_instance, configuration)
+
+
+def run_chunk_in_process(
+    module_name: str,
+    class_name: str,
+    configuration: Dict,
+    chunk: List[Dict],
+    batched: bool = False,
+):
+    # Worker processes keep their own instance pool, so instances are only built once per process
+    instance_class = getattr(importlib.import_module(module_name), class_name)
+    instance_pool = get_instance_pool() or InstancePool(max_size=0, ttl=0)
+    return run_pooled_chunk(instance_pool, instance_class, configuration, chunk, batched)
+
+
+def run_mapped(
+    component_instance: Any,
+    configuration: Dict,
+    items: List[Dict],
+    executor: str = "thread",
+    workers: int = 1,
+    chunk_size: int = 0,
+    batch_size: int = 0,
+):
+    """
+    Runs `component_instance.run` once per item of a mapped input, or `run_batch` once per `batch_size`
+    items when the component supports it. Results keep the order of the items, and failed items are
+    returned as None with their error instead of aborting the whole map. A failed batch fails all of its
+    items, unless the component has a `retry_batch_items = True` class attribute to rerun them one by
+    one. Thread workers borrow an
+    instance per chunk from the instance pool, unless the component has a `thread_safe = True` class
+    attribute and can share `component_instance`.
+    """
+    if executor not in MAP_EXECUTORS:
+        raise ComponentError(
+            f"Unknown map executor {executor}. Accepted values are {MAP_EXECUTORS}."
+        )
+    workers = max(1, min(int(workers), len(items)))
+    batched = batch_size > 0 and supports_batch(component_instance)
+    if batched:
+        chunk_size = batch_size
+    elif chunk_size <= 0:
+        chunk_size = max(1, math.ceil(len(items) / (workers * CHUNKS_PER_WORKER)))
+    chunks = [items[i: i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    if is_async_component(component_instance) and not batched:
+        chunk_outcomes = [run_async_items(component_instance, items)]
+    elif workers == 1:
+        chunk_outcomes = [
+            run_batch_chunk(component_instance, chunk)
+            if batched
+            else run_chunk(component_instance, chunk)
+            for chunk in chunks
+        ]
+    else:
+        pool = get_map_pool(executor, workers)
+        if executor == "process":
+            instance_class = component_instance.__class__
+            futures = [
+                pool.submit(
+                    run_chunk_in_process,
+                    instance_class.__module__,
+                    instance_class.__name__,
+                    configuration,
+                    chunk,
+                    batched,
+                )
+                for chunk in chunks
+            ]
+        elif getattr(component_instance.__class__, "thread_safe", False):
+            run = run_batch_chunk if batched else run_chunk
+            futures = [pool.submit(run, component_instance, chunk) for chunk in chunks]
+        else:
+            # Without a pool, instances are still reused by the chunks of this map
+            instance_pool = get_instance_pool() or InstancePool(max_size=workers, ttl=0)
+            futures = [
+                pool.submit(
+                    run_pooled_chunk,
+                    instance_pool,
+                    component_instance.__class__,
+                    configuration,
+                    chunk,
+                    batched,
+                )
+                for chunk in chunks
+            ]
+
+        chunk_outcomes = []
+        for chunk, future in zip(chunks, futures):
+            try:
+                chunk_outcomes.append(future.result())
+            except Exception as e:
+                # The chunk never ran, e.g. its inputs could not be pickled
+                chunk_outcomes.append([(False, describe_error(e))] * len(chunk))
+
+    results, errors = [], []
+    index = 0
+    for outcomes in chunk_outcomes:
+        for ok, value in outcomes:
+            if ok:
+                results.append(value)
+            else:
+                results.append(None)
+                errors.append({"index": index, "error": value})
+            index += 1
+    return results, errors
@@ -0,0 +1,264 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import contextlib
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from lunarbase.components.artifacts import artifact_available
+from lunarbase.modeling.component_encoder import component_json_dumps
+from lunarbase.utils import setup_logger
+
+from lunarbase import LUNAR_CONTEXT
+
+logger = setup_logger("result-cache")
+
+RESULT_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    class_name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    class_name TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+@lru_cache(maxsize=1024)
+def _package_fingerprint(
+    package_path: str,
+    module_name: str,
+    version: Optional[str],
+    requirements: tuple,
+    stat_key: tuple,
+):
+    return hashlib.sha256(
+        component_json_dumps(
+            [package_path, module_name, version, list(requirements), list(stat_key)]
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def package_fingerprint(registered_component):
+    """
+    Identifies the installed version of a component package: its version, requirements and the
+    size/modification time of the package archive or module.
+    """
+    package_path = registered_component.package_path
+    stat_key = []
+    for path in [Path(package_path), Path(package_path, registered_component.module_name, "__init__.py")]:
+        try:
+            stat = path.stat()
+            stat_key.extend([stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            continue
+    return _package_fingerprint(
+        str(package_path),
+        registered_component.module_name,
+        registered_component.component_model.version,
+        tuple(str(req) for req in registered_component.component_requirements),
+        tuple(stat_key),
+    )
+
+
+class ResultCache:
+    """
+    On-disk cache of component results keyed by a content hash of the user, component class, package
+    fingerprint, resolved configuration and resolved inputs. Entries expire after `ttl` seconds and the
+    least recently used ones are evicted once the store grows over `max_size` bytes.
+    """
+
+    DB_NAME = "cache.sqlite"
+
+    def __init__(self, path: str, max_size: int, ttl: int):
+        self.path = str(path)
+        self.max_size = max_size
+        self.ttl = ttl
+        Path(self.path).mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(RESULT_CACHE_SCHEMA)
+
+    @staticmethod
+    def make_key(
+        class_name: str,
+        fingerprint: str,
+        configuration: Dict,
+        inputs: Dict,
+        user_id: Optional[str] = None,
+    ):
+        try:
+            payload = component_json_dumps(
+                {
+                    "user_id": user_id,
+                    "class_name": class_name,
+                    "package": fingerprint,
+                    "configuration": configuration,
+                    "inputs": inputs,
+                },
+                sort_keys=True,
+            )
+        except (TypeError, ValueError):
+            # Values without a stable serialization cannot be keyed
+            return None
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, class_name: str):
+        now = time.time()
+        with self._connect() as connection:
+            entry = connection.execute(
+                "SELECT created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            hit = entry is not None and (self.ttl <= 0 or now - entry[0] <= self.ttl)
+            value = None
+            if hit:
+                try:
+                    with open(self._blob_path(key), "rb") as blob:
+                        value = pickle.load(blob)
+                    if not artifact_available(value):
+                        raise FileNotFoundError(f"Artifact {value.path} is gone")
+                    connection.execute(
+                        "UPDATE entries SET last_used = ? WHERE key = ?", (now, key)
+                    )
+                except Exception as e:
+                    logger.warning(f"Dropping unreadable cache entry {key}: {str(e)}")
+                    hit = False
+            if not hit and entry is not None:
+                self._delete(connection, [key])
+            self._record(connection, class_name, hit)
+        return hit, value
+
+    def put(self, key: str, class_name: str, value: Any):
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f"Result of {class_name} cannot be cached: {str(e)}")
+            return False
+        if self.max_size > 0 and len(data) > self.max_size:
+            return False
+
+        blob_path = self._blob_path(key)
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = blob_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as blob:
+            blob.write(data)
+        os.replace(tmp_path, blob_path)
+
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, class_name, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, class_name, len(data), now, now),
+            )
+            self._evict(connection)
+        return True
+
+    def metrics(self):
+        with self._connect() as connection:
+            components = {
+                class_name: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                }
+                for class_name, hits, misses in connection.execute(
+                    "SELECT class_name, hits, misses FROM metrics ORDER BY class_name"
+                )
+            }
+            entries, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "size": size,
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "components": components,
+        }
+
+    def clear(self):
+        with self._connect() as connection:
+            keys = [row[0] for row in connection.execute("SELECT key FROM entries")]
+            self._delete(connection, keys)
+            connection.execute("DELETE FROM metrics")
+
+    def _record(self, connection: sqlite3.Connection, class_name: str, hit: bool):
+        connection.execute(
+            "INSERT INTO metrics (class_name, hits, misses) VALUES (?, ?, ?) "
+            "ON CONFLICT(class_name) DO UPDATE SET hits = hits + excluded.hits, "
+            "misses = misses + excluded.misses",
+            (class_name, int(hit), int(not hit)),
+        )
+
+    def _evict(self, connection: sqlite3.Connection):
+        if self.ttl > 0:
+            expired = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT key FROM entries WHERE created < ?", (time.time() - self.ttl,)
+                )
+            ]
+            self._delete(connection, expired)
+
+        if self.max_size <= 0:
+            return
+        (total,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        evicted = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_used ASC"
+        ).fetchall():
+            if total <= self.max_size:
+                break
+            evicted.append(key)
+            total -= size
+        self._delete(connection, evicted)
+
+    def _delete(self, connection: sqlite3.Connection, keys: List[str]):
+        for key in keys:
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._blob_path(key).unlink(missing_ok=True)
+
+    def _blob_path(self, key: str):
+        return Path(self.path, key[:2], f"{key}.pkl")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per operation; the cache is shared by forked workers
+        connection = sqlite3.connect(str(Path(self.path, self.DB_NAME)), timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+
+RESULT_CACHES: Dict[str, ResultCache] = dict()
+
+
+def get_result_cache():
+    config = LUNAR_CONTEXT.lunar_config
+    if not config.RESULT_CACHE_ENABLED:
+        return None
+    cache = RESULT_CACHES.get(config.RESULT_CACHE_PATH)
+    if cache is None:
+        cache = ResultCache(
+            config.RESULT_CACHE_PATH,
+            max_size=config.RESULT_CACHE_MAX_SIZE * 1024 * 1024,
+            ttl=config.RESULT_CACHE_TTL,
+        )
+        RESULT_CACHES[config.RESULT_CACHE_PATH] = cache
+    return cache
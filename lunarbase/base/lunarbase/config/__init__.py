@@ -59,6 +59,15 @@ class LunarConfig(BaseSettings):
 
     DEMO_STORAGE_PATH: str = Field(default="demos")
     BASE_VENV_PATH: str = Field(default="base_venv")
+    VENV_CACHE_PATH: str = Field(default="venvs")
+    VENV_CACHE_ENABLED: bool = Field(default=True)
+    VENV_CACHE_MAX_UNUSED: int = Field(default=10)
+    WHEELHOUSE_PATH: str = Field(default="wheelhouse")
+    WHEELHOUSE_ENABLED: bool = Field(default=True)
+    WHEELHOUSE_UNPINNED_TTL: int = Field(default=86400)  # seconds a wheel of an unpinned requirement is reused
+    PACKAGE_CACHE_PATH: str = Field(default="package_cache")  # extracted component archives
+    PACKAGE_CACHE_ENABLED: bool = Field(default=True)
+    INSTALL_CONCURRENCY: int = Field(default=4)
     INDEX_DIR_PATH: str = Field(default="indexes")
 
     WORKFLOW_INDEX_NAME: str = Field(default="workflow_index")
@@ -66,6 +75,7 @@ class LunarConfig(BaseSettings):
 
     REGISTRY_FILE: str = Field(default="../components.txt")
     REGISTRY_CACHE: str = Field(default="registry.json")
+    REGISTRY_SNAPSHOT: str = Field(default="registry_snapshot.json")  # parsed packages by signature
 
     LUNAR_S3_STORAGE_KEY: Optional[str] = Field(default=None)
     LUNAR_S3_STORAGE_SECRET: Optional[str] = Field(default=None)
@@ -77,6 +87,10 @@ class LunarConfig(BaseSettings):
 
     REGISTRY_GITHUB_TOKEN: Optional[str] = Field(default=None)
     REGISTRY_ALWAYS_UPDATE: bool = Field(default=False)
+    REGISTRY_DOWNLOAD_WORKERS: int = Field(default=8)  # concurrent package downloads
+    REGISTRY_PARSE_WORKERS: int = Field(default=4)  # concurrent package parses
+    REGISTRY_DOWNLOAD_TIMEOUT: int = Field(default=600)  # seconds per package
+    REGISTRY_WATCH_INTERVAL: int = Field(default=5)  # seconds between package checks, 0 to disable
 
     DEFAULT_USER_PROFILE: str = Field(default="admin")
 
@@ -92,6 +106,7 @@ class LunarConfig(BaseSettings):
     OUT_PATH: str = Field(default="output")
     REPORT_PATH: str = Field(default="reports")
     FILES_PATH: str = Field(default="files")
+    ARTIFACT_PATH: str = Field(default="artifacts")
 
     # USER SETTINGS
     USER_ENVIRONMENT_FILE: str = Field(default=".env")
@@ -106,6 +121,54 @@ class LunarConfig(BaseSettings):
     USER_SSL_CERT_ROOT: str = Field(default="ssl_certs")
     USER_CUSTOM_ROOT: str = Field(default="custom_components")
 
+    # WORKER POOL
+    WORKER_POOL_ENABLED: bool = Field(default=True)
+    WORKER_POOL_SIZE: int = Field(default=2)
+    WORKER_POOL_IDLE_TIMEOUT: int = Field(default=600)
+    WORKER_POOL_MAX_RUNS: int = Field(default=100)
+
+    # EXECUTION
+    WORKFLOW_EXECUTOR: str = Field(default="prefect")
+    LOCAL_EXECUTOR_MAX_WORKERS: int = Field(default=8)
+
+    # MAPPED EXECUTION
+    MAP_EXECUTOR: str = Field(default="thread")  # thread or process
+    MAP_WORKERS: int = Field(default=1)
+    MAP_CHUNK_SIZE: int = Field(default=0)  # 0 to size chunks from the number of workers
+    MAP_BATCH_SIZE: int = Field(default=0)  # run_batch size, 0 to use the component's default_batch_size
+
+    # ASYNC COMPONENTS
+    ASYNC_COMPONENT_CONCURRENCY: int = Field(default=32)  # concurrent runs per component class
+
+    # COMPONENT INSTANCE POOL
+    INSTANCE_POOL_ENABLED: bool = Field(default=True)
+    INSTANCE_POOL_MAX_SIZE: int = Field(default=64)  # idle instances kept per process
+    INSTANCE_POOL_TTL: int = Field(default=600)  # seconds an idle instance is kept, 0 to keep it
+
+    # ARTIFACT STORE
+    ARTIFACT_MIN_SIZE: int = Field(default=16)  # MB, smaller outputs are passed by value
+    ARTIFACT_RETENTION_RUNS: int = Field(default=3)  # runs kept per workflow
+
+    # RUNS
+    RUNS_PATH: str = Field(default="runs")  # under the user tmp directory
+    RUN_RETENTION: int = Field(default=50)  # run directories kept per user, 0 to keep all
+
+    # INCREMENTAL RUNS
+    INCREMENTAL_RUNS_ENABLED: bool = Field(default=True)  # reuse results of unchanged components
+
+    # RESULT CACHE
+    RESULT_CACHE_ENABLED: bool = Field(default=True)
+    RESULT_CACHE_PATH: str = Field(default="result_cache")
+    RESULT_CACHE_MAX_SIZE: int = Field(default=1024)  # MB
+    RESULT_CACHE_TTL: int = Field(default=86400)  # seconds, 0 to never expire
+
+    # RESULT CHANNEL
+    RESULT_CHANNEL_ENCODING: str = Field(default="json")
+    RESULT_POLL_INTERVAL: float = Field(default=0.1)
+
+    # STREAMING
+    STREAM_QUEUE_SIZE: int = Field(default=16)
+
     model_config = SettingsConfigDict(extra=Extra.ignore)
 
     @model_validator(mode="after")
@@ -118,8 +181,13 @@ class LunarConfig(BaseSettings):
         self.SYSTEM_TMP_PATH = str(Path(self.SYSTEM_DATA_PATH, self.SYSTEM_TMP_PATH))
         self.USER_DATA_PATH = str(Path(base_path, self.USER_DATA_PATH))
         self.BASE_VENV_PATH = str(Path(self.SYSTEM_DATA_PATH, self.BASE_VENV_PATH))
+        self.VENV_CACHE_PATH = str(Path(self.SYSTEM_DATA_PATH, self.VENV_CACHE_PATH))
+        self.WHEELHOUSE_PATH = str(Path(self.SYSTEM_DATA_PATH, self.WHEELHOUSE_PATH))
+        self.PACKAGE_CACHE_PATH = str(Path(self.SYSTEM_DATA_PATH, self.PACKAGE_CACHE_PATH))
+        self.RESULT_CACHE_PATH = str(Path(self.SYSTEM_DATA_PATH, self.RESULT_CACHE_PATH))
         self.INDEX_DIR_PATH = str(Path(self.SYSTEM_DATA_PATH, self.INDEX_DIR_PATH))
         self.REGISTRY_CACHE = str(Path(self.SYSTEM_DATA_PATH, self.REGISTRY_CACHE))
+        self.REGISTRY_SNAPSHOT = str(Path(self.SYSTEM_DATA_PATH, self.REGISTRY_SNAPSHOT))
         self.DEMO_STORAGE_PATH = str(
             Path(self.SYSTEM_DATA_PATH, self.DEMO_STORAGE_PATH)
         )
@@ -2,6 +2,7 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import asyncio
 import json
 from pathlib import Path
 from typing import Dict, List, Optional, Union
@@ -11,10 +12,19 @@ from lunarbase.config import LunarConfig
 from lunarbase.controllers.component_controller.component_publisher.component_publisher import ComponentPublisher
 from lunarbase.controllers.component_controller.github_publisher_service.github_publisher_service import \
     GithubPublisherService
+from lunarbase.components.instance_pool import get_instance_pool
 from lunarbase.indexing.component_search_index import ComponentSearchIndex
-from lunarbase.orchestration.engine import run_component_as_prefect_flow
+from lunarbase.orchestration.engine import (
+    gather_component_dependencies,
+    resolve_result_artifacts,
+    run_component_as_prefect_flow,
+)
+from lunarbase.orchestration.runs import RunDirectory, new_run_id, run_directory
+from lunarbase.orchestration.venv_cache import VenvCache
+from lunarbase.orchestration.worker_pool import recycle_worker_pools
 from lunarbase.persistence import PersistenceLayer
 from lunarbase.modeling.data_models import ComponentModel
+from lunarbase.registry.registry_models import RegisteredComponentModel
 
 from lunarbase import LUNAR_CONTEXT
 from lunarbase.utils import setup_logger
@@ -35,6 +45,7 @@ class ComponentController:
 
         self._persistence_layer = PersistenceLayer(config=self._config)
         self._component_search_index = ComponentSearchIndex(config=self._config)
+        self._venv_cache = VenvCache(config=self._config)
 
     @property
     def component_search_index(self):
@@ -52,19 +63,31 @@ class ComponentController:
         global_components = self.list_global_components()
         self._component_search_index.index_global_components(global_components)
 
-    def tmp_save(self, component: ComponentModel, user_id: str):
-        tmp_path = self._persistence_layer.get_user_tmp(user_id)
-        return self._persistence_layer.save_to_storage_as_json(
-            path=str(Path(tmp_path, f"{component.id}.json")),
-            data=json.loads(component.json(by_alias=True)),  # To allow aliasing
+    def update_global_components(
+        self,
+        removed: List[RegisteredComponentModel],
+        added: List[RegisteredComponentModel],
+    ):
+        """
+        Catches up with packages updated in the registry: their search documents, idle instances
+        and the workers that imported them.
+        """
+        self._component_search_index.update_global_components(
+            [registered_component.component_model for registered_component in removed],
+            [registered_component.component_model for registered_component in added],
         )
+        instance_pool = get_instance_pool()
+        if instance_pool is not None:
+            instance_pool.invalidate(
+                {registered_component.module_name for registered_component in removed + added}
+            )
+        recycle_worker_pools()
 
-    def tmp_delete(self, component_id: str, user_id: str):
-        tmp_path = self._persistence_layer.get_user_tmp(user_id)
-        self._persistence_layer.delete(
-            path=str(Path(tmp_path, f"{component_id}.json")),
+    def tmp_save(self, component: ComponentModel, run: RunDirectory):
+        return self._persistence_layer.save_to_storage_as_json(
+            path=str(Path(run.path, f"{component.id}.json")),
+            data=json.loads(component.json(by_alias=True)),  # To allow aliasing
         )
-        return tmp_path
 
     def save(self, custom_component: ComponentModel, user_id: str):
         existing_components = self._component_search_index.get_component(
@@ -112,14 +135,7 @@ class ComponentController:
 
     @staticmethod
     def list_global_components():
-        components = sorted(
-            [
-                registered_component.component_model
-                for registered_component in LUNAR_CONTEXT.lunar_registry.components
-            ],
-            key=lambda cmp: cmp.name,
-        )
-        return components
+        return list(LUNAR_CONTEXT.lunar_registry.sorted_component_models())
 
     def list_all_components(self, user_id: str = "*"):
         components = self.list_global_components()
@@ -131,6 +147,20 @@ class ComponentController:
         )
         return components
 
+    def list_all_components_serialized(self, user_id: str = "*"):
+        # Global components are serialized once by the registry, only custom ones are done per request
+        components = list(LUNAR_CONTEXT.lunar_registry.serialized_component_models())
+        custom_components = self._persistence_layer.get_all_as_dict(
+            path=str(Path(self._persistence_layer.get_user_custom_root(user_id), "*"))
+        )
+        components.extend(
+            [
+                ComponentModel.parse_obj(comp).model_dump(mode="json", by_alias=True)
+                for comp in custom_components
+            ]
+        )
+        return components
+
     def list_custom_components(self, user_id: str):
         components =  self._persistence_layer.get_all_as_dict(
             path=self._persistence_layer.get_user_custom_root(user_id)
@@ -141,12 +171,9 @@ class ComponentController:
         )
 
     def get_by_id(self, component_id: str, user_id: str):
-        core_component = next(
-            (comp for comp in self.list_global_components() if comp.id == component_id),
-            None,
-        )
+        core_component = LUNAR_CONTEXT.lunar_registry.get_by_component_id(component_id)
         if core_component is not None:
-            return core_component
+            return core_component.component_model
         custom_component =  self._persistence_layer.get_from_storage_as_dict(
             path=str(
                 Path(
@@ -167,9 +194,9 @@ class ComponentController:
             else:
                 pkg_comp = LUNAR_CONTEXT.lunar_registry.get_by_class_name(
                     result_mapping["type"]
-                ).component_model
+                )
                 if pkg_comp is not None:
-                    components.append(pkg_comp)
+                    components.append(pkg_comp.component_model)
         return components
 
     def get_example_workflow_by_label(self, label: str, user_id: Optional[str]):
@@ -191,7 +218,17 @@ class ComponentController:
                 user_id=user_id, workflow_id=component.workflow_id
             )
 
-        if venv_dir is None or not Path(venv_dir).is_dir():
+        # Held for the run only, so that the venv is not collected under it
+        venv_reference = None
+        if self._config.VENV_CACHE_ENABLED:
+            venv_reference = new_run_id()
+            # Index updates and garbage collection of unused venvs block
+            venv_dir = await asyncio.to_thread(
+                self._venv_cache.acquire,
+                gather_component_dependencies([component]),
+                run=venv_reference,
+            )
+        elif venv_dir is None or not Path(venv_dir).is_dir():
             venv_dir = self._persistence_layer.get_user_component_venv(user_id)
 
         env_path = self._persistence_layer.get_user_environment_path(user_id)
@@ -199,15 +236,24 @@ class ComponentController:
         if Path(env_path).is_file():
             environment.update(dotenv_values(env_path))
 
-        component_path = self.tmp_save(component=component, user_id=user_id)
-        result = await run_component_as_prefect_flow(
-            component_path=component_path, venv=venv_dir, environment=environment
-        )
-
-        # TODO: A potential sanity check for this cleanup (e.g., tmp_component_path == the result of the below)
-        _ = self.tmp_delete(component_id=component.id, user_id=user_id)
+        try:
+            with run_directory(
+                self._persistence_layer.get_user_runs_path(user_id),
+                retention=self._config.RUN_RETENTION,
+            ) as run:
+                run.log(f"Component {component.id} ({component.class_name}), user {user_id}")
+                component_path = self.tmp_save(component=component, run=run)
+                result = await run_component_as_prefect_flow(
+                    component_path=component_path,
+                    venv=venv_dir,
+                    environment=environment,
+                    run_path=str(run.path),
+                )
+        finally:
+            if venv_reference is not None:
+                await asyncio.to_thread(self._venv_cache.release_run, venv_reference)
 
-        return result
+        return {label: resolve_result_artifacts(value) for label, value in result.items()}
 
     def publish_component(
             self,
@@ -2,11 +2,12 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import asyncio
 import json
 import warnings
 from pathlib import Path
 from time import sleep
-from typing import Dict, Optional, Union, List
+from typing import Any, Callable, Dict, Optional, Union, List
 
 from dotenv import dotenv_values
 from langchain_core.vectorstores import InMemoryVectorStore
@@ -17,7 +18,22 @@ from lunarbase import LUNAR_CONTEXT
 from lunarbase.agent_copilot import AgentCopilot
 from lunarbase.config import LunarConfig
 from lunarbase.indexing.workflow_search_index import WorkflowSearchIndex
-from lunarbase.orchestration.engine import run_workflow_as_prefect_flow
+from lunarbase.orchestration.engine import (
+    gather_component_dependencies,
+    resolve_result_artifacts,
+    run_workflow_as_prefect_flow,
+    serialize_component_output,
+)
+from lunarbase.orchestration.executor import ExecutorKind, validate_executor
+from lunarbase.orchestration.incremental import (
+    RunState,
+    inline_reused,
+    workflow_fingerprints,
+)
+from lunarbase.orchestration.planner import prune_to_targets
+from lunarbase.orchestration.process import get_venv_lock, provision_venv
+from lunarbase.orchestration.runs import RunDirectory, new_run_id, run_directory
+from lunarbase.orchestration.venv_cache import VenvCache
 from lunarbase.persistence import PersistenceLayer
 from lunarbase.utils import setup_logger
 from lunarbase.modeling.data_models import WorkflowModel
@@ -44,6 +60,7 @@ class WorkflowController:
             self._config = LunarConfig.parse_obj(config)
         self._persistence_layer = PersistenceLayer(config=self._config)
         self._workflow_search_index = WorkflowSearchIndex(config=self._config)
+        self._venv_cache = VenvCache(config=self._config)
         self.__logger = setup_logger("workflow-controller")
         llm = AzureChatOpenAI(
             openai_api_version=config.AZURE_OPENAI_API_VERSION,
@@ -68,19 +85,12 @@ class WorkflowController:
     def persistence_layer(self):
         return self._persistence_layer
 
-    def tmp_save(self, workflow: WorkflowModel, user_id: str):
-        tmp_path = self._persistence_layer.get_user_tmp(user_id)
+    def tmp_save(self, workflow: WorkflowModel, run: RunDirectory):
         return self._persistence_layer.save_to_storage_as_json(
-            path=str(Path(tmp_path, f"{workflow.id}.json")),
+            path=str(Path(run.path, f"{workflow.id}.json")),
             data=json.loads(workflow.json(by_alias=True)),
         )
 
-    def tmp_delete(self, workflow_id: str, user_id: str):
-        tmp_path = self._persistence_layer.get_user_tmp(user_id)
-        return self._persistence_layer.delete(
-            path=str(Path(tmp_path, f"{workflow_id}.json"))
-        )
-
     def save(self, workflow: Optional[WorkflowModel], user_id: str):
         if workflow is None:
             workflow = WorkflowModel(
@@ -171,8 +181,13 @@ class WorkflowController:
         )
         return WorkflowModel.model_validate(flow)
 
+    @staticmethod
+    def venv_owner(workflow_id: str, user_id: str):
+        return f"{user_id}/{workflow_id}"
+
     def delete(self, workflow_id: str, user_id: str):
         self._workflow_search_index.remove_document(workflow_id, user_id)
+        self._venv_cache.release(self.venv_owner(workflow_id, user_id))
         return self._persistence_layer.delete(
             path=str(
                 Path(
@@ -260,6 +275,23 @@ class WorkflowController:
                 f"was successfully scheduled for cancellation with status: {result.status}"
             )
 
+    async def refresh_venv(self, workflow_id: str, user_id: str):
+        # Shared venvs are not recreated in place, the workflow moves to a new one
+        venv_dir = await asyncio.to_thread(
+            self._venv_cache.refresh, self.venv_owner(workflow_id, user_id)
+        )
+        refresh = venv_dir is None
+        if venv_dir is None:
+            venv_dir = self._persistence_layer.get_workflow_venv(
+                user_id=user_id, workflow_id=workflow_id
+            )
+            if not Path(venv_dir).is_dir():
+                raise FileNotFoundError(
+                    f"No virtual environment found for workflow {workflow_id}!"
+                )
+        async with get_venv_lock(venv_dir):
+            return await asyncio.to_thread(provision_venv, venv_dir, refresh)
+
     async def get_workflow_component_inputs(self, workflow_id: str, user_id: str):
         workflow = self.get_by_id(workflow_id, user_id)
 
@@ -315,8 +347,60 @@ class WorkflowController:
 
         return await self.run(workflow, user_id)
 
-    async def run(self, workflow: WorkflowModel, user_id: Optional[str] = None):
+    async def run_stream(
+        self,
+        workflow: WorkflowModel,
+        user_id: Optional[str] = None,
+        executor: Optional[ExecutorKind] = None,
+        targets: Optional[List[str]] = None,
+    ):
+        """
+        Runs the workflow yielding one event per finished component (and per streamed item).
+        """
+        events = asyncio.Queue()
+        running = asyncio.ensure_future(
+            self.run(
+                workflow,
+                user_id,
+                on_event=events.put_nowait,
+                executor=executor,
+                targets=targets,
+            )
+        )
+        running.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+
+            try:
+                running.result()
+                yield {"event": "done"}
+            except Exception as e:
+                yield {"event": "error", "message": str(e)}
+        finally:
+            if not running.done():
+                running.cancel()
+
+    async def run(
+        self,
+        workflow: WorkflowModel,
+        user_id: Optional[str] = None,
+        on_event: Optional[Callable[[Dict], Any]] = None,
+        executor: Optional[ExecutorKind] = None,
+        targets: Optional[List[str]] = None,
+        report: Optional[Dict] = None,
+    ):
+        """
+        With targets, only those components and the components they depend on are run.
+        The run id and the labels of the components reused from the previous run and of the
+        recomputed ones are added to report.
+        """
         workflow = WorkflowModel.model_validate(workflow)
+        # Fails here rather than as an argument error of the venv process
+        validate_executor(executor)
 
         user_id = user_id or self._config.DEFAULT_USER_PROFILE
 
@@ -338,20 +422,95 @@ class WorkflowController:
                     workflow_id = input.value
                     input.value = self.get_by_id(workflow_id, user_id).dict()
 
-        if not Path(venv_dir).is_dir():
-            workflow_path = self.save(workflow, user_id=user_id)
-            result = await run_workflow_as_prefect_flow(
-                workflow_path=workflow_path, venv=venv_dir, environment=environment
+        run_venv = venv_dir
+        # Held for the run only, a refresh of the workflow venv must not collect it under the run
+        venv_reference = None
+        if self._config.VENV_CACHE_ENABLED:
+            venv_reference = new_run_id()
+            # Index updates and garbage collection of unused venvs block
+            run_venv = await asyncio.to_thread(
+                self._venv_cache.acquire,
+                gather_component_dependencies(workflow.components),
+                owner=self.venv_owner(workflow.id, user_id),
+                run=venv_reference,
             )
 
-        else:
-            workflow_path = self.tmp_save(workflow=workflow, user_id=user_id)
-
-            result = await run_workflow_as_prefect_flow(
-                workflow_path=workflow_path, venv=venv_dir, environment=environment
+        try:
+            artifact_path = self._persistence_layer.get_user_workflow_artifact_path(
+                user_id=user_id, workflow_id=workflow.id
             )
 
-            self.tmp_delete(workflow_id=workflow.id, user_id=user_id)
+            with run_directory(
+                self._persistence_layer.get_user_runs_path(user_id),
+                retention=self._config.RUN_RETENTION,
+            ) as run:
+                run.log(f"Workflow {workflow.id} ({workflow.name}), user {user_id}")
+
+                def on_run_event(event: Dict):
+                    if event.get("event") == "component":
+                        run.log(f"Component {event.get('label')}: {event.get('status')}")
+                    if on_event is not None:
+                        if "result" in event:
+                            event = {**event, "result": resolve_result_artifacts(event["result"])}
+                        on_event(event)
+
+                run_state, fingerprints, reused = None, dict(), dict()
+                run_workflow = workflow
+                if self._config.INCREMENTAL_RUNS_ENABLED:
+                    run_state = RunState(
+                        self._persistence_layer.get_user_workflow_path(workflow.id, user_id)
+                    )
+                    fingerprints = workflow_fingerprints(workflow)
+                    scope = prune_to_targets(workflow, targets)
+                    reused = run_state.reusable(scope, fingerprints)
+                    if len(reused) > 0:
+                        run_workflow = inline_reused(scope, reused)
+                        targets = [target for target in targets or [] if target not in reused] or None
+                    for label, reused_result in reused.items():
+                        on_run_event(
+                            {
+                                "event": "component",
+                                "label": label,
+                                "status": "reused",
+                                "result": serialize_component_output(reused_result),
+                            }
+                        )
+
+                if not Path(venv_dir).is_dir():
+                    self.save(workflow, user_id=user_id)
+                # Runs only read their own copy, so concurrent runs of a workflow never share files
+                workflow_path = self.tmp_save(workflow=run_workflow, run=run)
+
+                result = dict()
+                if len(run_workflow.components) > 0:
+                    result = await run_workflow_as_prefect_flow(
+                        workflow_path=workflow_path,
+                        venv=run_venv,
+                        environment=environment,
+                        on_event=on_run_event,
+                        executor=executor,
+                        artifact_path=artifact_path,
+                        targets=targets,
+                        run_path=str(run.path),
+                    )
+
+                if run_state is not None:
+                    run_state.save(workflow, fingerprints, result)
+                if report is not None:
+                    report["run_id"] = run.run_id
+                    report["reused"] = list(reused.keys())
+                    report["recomputed"] = list(result.keys())
+                # Handles are kept in the run state, clients get the values
+                result = {
+                    component.label: resolve_result_artifacts(
+                        reused.get(component.label, result.get(component.label))
+                    )
+                    for component in workflow.components
+                    if component.label in reused or component.label in result
+                }
+        finally:
+            if venv_reference is not None:
+                await asyncio.to_thread(self._venv_cache.release_run, venv_reference)
 
         LUNAR_CONTEXT.lunar_registry.remove_workflow_runtime(workflow_id=workflow.id)
 
@@ -58,6 +58,29 @@ class ComponentSearchIndex:
             )
         writer.commit()
 
+    def update_global_components(
+        self, removed: List[ComponentModel], added: List[ComponentModel]
+    ):
+        """
+        Replaces the documents of changed global components, leaving the rest of the index as it is.
+        """
+        ix = self.get_or_create_index(self._config.get_component_index())
+        writer = ix.writer()
+        for component in removed:
+            writer.delete_by_term("id", component.id)
+        for component in added:
+            writer.add_document(
+                id=component.id,
+                string=component.name
+                + " "
+                + component.description
+                + " "
+                + component.class_name,
+                type=component.class_name,
+                is_custom=component.is_custom,
+            )
+        writer.commit()
+
     def index(self, components: List[ComponentModel], user_id: str):
         path = self._persistence_layer.get_user_component_index(user_id)
         ix = self.get_or_create_index(path)
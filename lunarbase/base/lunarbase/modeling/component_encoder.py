@@ -9,6 +9,7 @@ from typing import Any
 import numpy as np
 from lunarcore.component.component_group import ComponentGroup
 from lunarcore.component.data_types import DataType
+from lunarbase.components.artifacts import ArtifactHandle
 from lunarbase.components.errors import ComponentError
 from pydantic import BaseModel
 
@@ -35,6 +36,9 @@ class ComponentEncoder(json.JSONEncoder):
         elif isinstance(obj, ComponentError):
             return str(obj)
 
+        elif isinstance(obj, ArtifactHandle):
+            return obj.describe()
+
         elif isinstance(
             obj,
             (
@@ -0,0 +1,183 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import json
+import pickle
+import struct
+import threading
+from typing import BinaryIO, Dict, List, Optional
+
+from lunarbase.components.artifacts import ArtifactHandle
+from lunarbase.modeling.component_encoder import ComponentEncoder
+
+FRAME_HEADER = struct.Struct(">I")
+
+# Result frames carry their codec so that large payloads can be sent as pickle instead of JSON
+RESULT_FRAME_HEADER = struct.Struct(">cI")
+RESULT_CODECS = {"json": b"j", "pickle": b"p"}
+
+
+# Key of the JSON object standing for an artifact handle
+ARTIFACT_KEY = "lunar_artifact"
+
+
+class ResultEncoder(ComponentEncoder):
+    """
+    Sends artifacts by reference: the receiving process gets a handle back, values are only loaded
+    where they are needed.
+    """
+
+    def default(self, obj):
+        if isinstance(obj, ArtifactHandle):
+            return {
+                ARTIFACT_KEY: {
+                    "path": obj.path,
+                    "kind": obj.kind,
+                    "size": obj.size,
+                    "digest": obj.digest,
+                }
+            }
+        return super().default(obj)
+
+
+def decode_artifact(obj: Dict):
+    if len(obj) == 1 and isinstance(obj.get(ARTIFACT_KEY), dict):
+        return ArtifactHandle(**obj[ARTIFACT_KEY])
+    return obj
+
+
+def encode_frame(payload: Dict) -> bytes:
+    body = json.dumps(payload, cls=ComponentEncoder).encode("utf-8")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+def decode_frame(body: bytes) -> Dict:
+    return json.loads(body.decode("utf-8"))
+
+
+def write_frame(stream: BinaryIO, payload: Dict):
+    stream.write(encode_frame(payload))
+    stream.flush()
+
+
+def read_exactly(stream: BinaryIO, size: int) -> Optional[bytes]:
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_frame(stream: BinaryIO) -> Optional[Dict]:
+    header = read_exactly(stream, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    body = read_exactly(stream, size)
+    if body is None:
+        return None
+    return decode_frame(body)
+
+
+async def read_frame_async(reader: asyncio.StreamReader) -> Optional[Dict]:
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+        (size,) = FRAME_HEADER.unpack(header)
+        body = await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        return None
+    return decode_frame(body)
+
+
+def encode_result_frame(payload: Dict, encoding: str = "json") -> bytes:
+    codec = RESULT_CODECS.get(encoding)
+    if codec is None:
+        raise ValueError(
+            f"Unknown result encoding {encoding}. Accepted encodings are {list(RESULT_CODECS)}."
+        )
+    if codec == RESULT_CODECS["pickle"]:
+        body = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    else:
+        body = json.dumps(payload, cls=ResultEncoder).encode("utf-8")
+    return RESULT_FRAME_HEADER.pack(codec, len(body)) + body
+
+
+def decode_result_frame(codec: bytes, body: bytes) -> Dict:
+    if codec == RESULT_CODECS["pickle"]:
+        return pickle.loads(body)
+    return json.loads(body.decode("utf-8"), object_hook=decode_artifact)
+
+
+class ResultWriter:
+    """
+    Appends length-prefixed result frames to a file as components finish.
+    Safe to use from the task runner threads.
+    """
+
+    def __init__(self, path: str, encoding: str = "json"):
+        self.path = path
+        self.encoding = encoding
+        self.emitted = set()
+        self._lock = threading.Lock()
+        self._stream = open(path, "ab")
+
+    def write(self, payload: Dict):
+        frame = encode_result_frame(payload, self.encoding)
+        with self._lock:
+            self._stream.write(frame)
+            self._stream.flush()
+
+    def emit(self, label: str, result, status: str = "completed", **details):
+        with self._lock:
+            if label in self.emitted:
+                return
+            self.emitted.add(label)
+        self.write(
+            {
+                "event": "component",
+                "label": label,
+                "status": status,
+                **details,
+                "result": result,
+            }
+        )
+
+    def close(self):
+        with self._lock:
+            self._stream.close()
+
+
+class ResultReader:
+    """
+    Reads the complete frames appended to a result file since the last read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+
+    def read_available(self) -> List[Dict]:
+        frames = []
+        try:
+            stream = open(self.path, "rb")
+        except FileNotFoundError:
+            return frames
+        with stream:
+            stream.seek(self.offset)
+            while True:
+                header = stream.read(RESULT_FRAME_HEADER.size)
+                if len(header) < RESULT_FRAME_HEADER.size:
+                    break
+                codec, size = RESULT_FRAME_HEADER.unpack(header)
+                body = stream.read(size)
+                if len(body) < size:
+                    break
+                frames.append(decode_result_frame(codec, body))
+                self.offset = stream.tell()
+        return frames
@@ -3,22 +3,34 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import argparse
+import asyncio
+import contextlib
 import json
-import re
-from collections import deque
-from datetime import timedelta
+import os
+import tempfile
+import time
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
+from lunarbase.components.artifacts import ArtifactHandle, artifact_store
 from lunarbase.components.component_wrapper import ComponentWrapper
 from lunarbase.components.subworkflow import Subworkflow
 from lunarbase.orchestration.callbacks import cancelled_flow_handler
+from lunarbase.orchestration.channel import ResultReader, ResultWriter
 from lunarbase.orchestration.process import (
-    OutputCatcher,
     PythonProcess,
     create_base_command,
 )
+from lunarbase.orchestration.planner import WorkflowPlan, plan_workflow, prune_to_targets
+from lunarbase.orchestration.runs import RunDirectory
+from lunarbase.orchestration.scheduler import topological_order
+from lunarbase.orchestration.streaming import close_subscriptions
 from lunarbase.orchestration.task_promise import TaskPromise
+from lunarbase.orchestration.worker_pool import (
+    get_worker_pool,
+    recycle_worker_pool,
+)
 from lunarbase.utils import setup_logger
 from lunarcore.component.data_types import DataType
 from lunarbase.components.errors import ComponentError
@@ -26,6 +38,7 @@ from lunarbase.modeling.component_encoder import ComponentEncoder
 from lunarbase.modeling.data_models import ComponentModel, WorkflowModel
 from prefect import Flow, get_client, task
 from prefect.client.schemas.filters import FlowRunFilter, FlowRunFilterId
+from prefect.exceptions import UnfinishedRun
 from prefect.futures import PrefectFuture
 from prefect.task_runners import ConcurrentTaskRunner
 
@@ -34,30 +47,174 @@ from lunarbase import LUNAR_CONTEXT
 MAX_RESULT_DICT_LEN = 10
 MAX_RESULT_DICT_DEPTH = 2
 
-RUN_OUTPUT_START = "<OUTPUT RESULT>"
-RUN_OUTPUT_END = "<OUTPUT RESULT END>"
+UPSTREAM_FAILURE_MESSAGE = (
+    "Run upstream components first or see their return errors for details!"
+)
 
 logger = setup_logger("orchestration-engine")
 
+RESULT_SINK: Optional[ResultWriter] = None
+
+
+@contextlib.contextmanager
+def result_sink(result_path: Optional[str], encoding: Optional[str] = None):
+    global RESULT_SINK
+    if result_path is None:
+        yield None
+        return
+
+    writer = ResultWriter(
+        result_path,
+        encoding=encoding or LUNAR_CONTEXT.lunar_config.RESULT_CHANNEL_ENCODING,
+    )
+    previous, RESULT_SINK = RESULT_SINK, writer
+    try:
+        yield writer
+    finally:
+        RESULT_SINK = previous
+        writer.close()
+
+
+def run_artifact_store(artifact_path: Optional[str]):
+    config = LUNAR_CONTEXT.lunar_config
+    return artifact_store(
+        artifact_path,
+        min_size=config.ARTIFACT_MIN_SIZE * 1024 * 1024,
+        retention=config.ARTIFACT_RETENTION_RUNS,
+    )
+
 
-def generate_prefect_cache_key(context, arguments):
-    component = arguments.get("component_wrapper").component_model
-    _key = f"{context.task.task_key}-{context.task.fn.__code__.co_code.hex()[:15]}-{component.label}-{'_'.join([str(hash(c_input)) for c_input in component.inputs])}"
-    return _key
+def emit_component_result(
+    label: str, result, elapsed: Optional[float] = None, **details
+):
+    if RESULT_SINK is None:
+        return
+    if elapsed is not None:
+        details["elapsed"] = round(elapsed, 6)
+    if isinstance(result, BaseException):
+        RESULT_SINK.emit(label, str(result), status="error", **details)
+    else:
+        RESULT_SINK.emit(label, serialize_component_output(result), **details)
+
+
+def emit_stream_item(index: int, elapsed: float, result: ComponentModel):
+    if RESULT_SINK is None:
+        return
+    RESULT_SINK.write(
+        {
+            "event": "item",
+            "label": result.label,
+            "index": index,
+            "elapsed": round(elapsed, 6),
+            "result": serialize_component_output(result),
+        }
+    )
+
+
+def flush_component_results(results: Dict):
+    # Results that were not emitted by their task (e.g., cached, failed upstream or promised)
+    for label, result in results.items():
+        emit_component_result(label, result)
+    if RESULT_SINK is not None:
+        RESULT_SINK.write({"event": "done"})
+
+
+def wire_upstream_inputs(
+    component_wrapper: ComponentWrapper,
+    upstream: Optional[Dict[str, ComponentModel]] = None,
+    links: Optional[List[Tuple[str, str, Optional[str]]]] = None,
+):
+    for upstream_label, input_key, template_key in links or []:
+        component_wrapper.component_model = update_inputs(
+            current_task=component_wrapper.component_model,
+            upstream_task=upstream[upstream_label],
+            upstream_label=upstream_label,
+            input_key=input_key,
+            template_key=template_key,
+        )
 
 
-@task(cache_key_fn=generate_prefect_cache_key, cache_expiration=timedelta(minutes=10))
+@task()
 def run_prefect_task(
     component_wrapper: ComponentWrapper,
+    upstream: Optional[Dict[str, ComponentModel]] = None,
+    links: Optional[List[Tuple[str, str, Optional[str]]]] = None,
+    report: bool = True,
 ):
+    """
+    Upstream futures are resolved by Prefect before the task starts and wired into the inputs following links.
+    """
+    label = component_wrapper.component_model.label
+    start = time.perf_counter()
     try:
+        wire_upstream_inputs(component_wrapper, upstream, links)
         result = component_wrapper.run_in_workflow()
     except Exception as e:
+        if report:
+            emit_component_result(
+                label,
+                ComponentError(str(e)),
+                elapsed=time.perf_counter() - start,
+                **component_wrapper.report_details,
+            )
         raise ComponentError(str(e))
 
+    if report:
+        emit_component_result(
+            label,
+            result,
+            elapsed=time.perf_counter() - start,
+            **component_wrapper.report_details,
+        )
     return result
 
 
+@task()
+def run_subworkflow_task(
+    component_wrapper: ComponentWrapper,
+    upstream: Optional[Dict[str, ComponentModel]] = None,
+    links: Optional[List[Tuple[str, str, Optional[str]]]] = None,
+    report: bool = True,
+):
+    """
+    Runs a subworkflow whose workflow is only known once its upstream resolves. Prefect tasks cannot
+    submit tasks, so its components run on the local thread executor within this task.
+    """
+    # Imported here since the executor builds on the task helpers of this module
+    from lunarbase.orchestration.executor import LocalExecutor
+
+    label = component_wrapper.component_model.label
+    start = time.perf_counter()
+    try:
+        wire_upstream_inputs(component_wrapper, upstream, links)
+        executor = LocalExecutor(
+            kind="thread", max_workers=LUNAR_CONTEXT.lunar_config.LOCAL_EXECUTOR_MAX_WORKERS
+        )
+        result = asyncio.run(executor._run_subworkflow(component_wrapper))
+        if isinstance(result, ComponentError):
+            raise result
+    except Exception as e:
+        if report:
+            emit_component_result(label, ComponentError(str(e)), elapsed=time.perf_counter() - start)
+        raise ComponentError(str(e))
+
+    if report and result is not None:
+        emit_component_result(label, result, elapsed=time.perf_counter() - start)
+    return result
+
+
+def wire_resolved_inputs(
+    component_wrapper: ComponentWrapper,
+    upstream: Dict[str, Union[PrefectFuture, ComponentError]],
+    links: List[Tuple[str, str, Optional[str]]],
+):
+    # Stream producers are not Prefect tasks, so they resolve their upstream futures on their own thread
+    resolved = {pred: run_step(step) for pred, step in upstream.items()}
+    if any(isinstance(result, ComponentError) for result in resolved.values()):
+        raise ComponentError(UPSTREAM_FAILURE_MESSAGE)
+    wire_upstream_inputs(component_wrapper, resolved, links)
+
+
 async def gather_partial_flow_results(flow_run_id: str):
     with get_client() as client:
         current_task_runs = await client.read_task_runs(
@@ -75,40 +232,68 @@ async def gather_partial_flow_results(flow_run_id: str):
     return current_task_results
 
 
+@task()
+def collect_subworkflow_output(
+    component: ComponentModel, output: ComponentModel, report: bool = True
+):
+    component.output = output.output
+    if report:
+        emit_component_result(component.label, component)
+    return component
+
+
 @task(refresh_cache=True, persist_result=False)
 def stream_prefect_task(
     component: ComponentWrapper,
     promises: Dict,
+    upstream: Optional[Dict[str, ComponentModel]] = None,
+    links: Optional[List[Tuple[str, str, Optional[str]]]] = None,
+    report: bool = True,
 ):
     streams = []
-    links = []
-    for link, _promise in promises.items():
+    stream_links = []
+    for link, subscription in promises.items():
         link = link.split(".", 1)
         link_key, link_template = link[0], None
-        if len(link_key) > 1:
+        if len(link) > 1:
             link_template = link[1]
 
-        promise_results = _promise.run()
-        links.append((link_key, link_template))
-        streams.append(promise_results)
+        stream_links.append((link_key, link_template))
+        streams.append(iter(subscription))
 
     result = None
-    for results in zip(*streams):
-        current_model = component.component_model
-        for (link_key, link_template), promised_model in zip(links, results):
-            current_model = update_inputs(
-                current_task=current_model,
-                upstream_task=promised_model,
-                upstream_label=promised_model.label,
-                input_key=link_key,
-                template_key=link_template,
-            )
-        component.component_model = current_model
-        try:
+    start = time.perf_counter()
+    try:
+        # Each subscription is fed by its producer thread through a bounded queue,
+        # so producing the next item overlaps with running this component on the current one
+        wire_upstream_inputs(component, upstream, links)
+        for results in zip(*streams):
+            current_model = component.component_model
+            for (link_key, link_template), promised_model in zip(stream_links, results):
+                current_model = update_inputs(
+                    current_task=current_model,
+                    upstream_task=promised_model,
+                    upstream_label=promised_model.label,
+                    input_key=link_key,
+                    template_key=link_template,
+                )
+            component.component_model = current_model
             result = component.run_in_workflow()
-        except Exception as e:
-            raise ComponentError(str(e))
+    except Exception as e:
+        if report:
+            emit_component_result(
+                component.component_model.label,
+                ComponentError(str(e)),
+                elapsed=time.perf_counter() - start,
+            )
+        raise ComponentError(str(e))
+    finally:
+        close_subscriptions(promises)
 
+    if report and result is not None:
+        emit_component_result(
+            component.component_model.label, result, elapsed=time.perf_counter() - start
+        )
     return result
 
 
@@ -148,113 +333,115 @@ def update_inputs(
 
 def create_flow_dag(
     workflow: WorkflowModel,
+    report: bool = True,
+    plan: Optional[WorkflowPlan] = None,
 ):
+    # Subworkflows are inlined, so their components are scheduled alongside the parent's
+    plan = plan or plan_workflow(workflow)
+    workflow = plan.workflow
+    inner_labels = plan.inner_labels
     tasks = {comp.label: comp for comp in workflow.components}
     promises = {comp.label: dict() for comp in workflow.components}
     dag = workflow.get_dag()
-    running_queue = deque(list(dag.nodes))
     real_tasks = dict()
-    while len(running_queue) > 0:
-        next_task = running_queue.popleft()
+    # Every node is visited exactly once, after all of its predecessors have been submitted
+    for next_task in topological_order(dag, known=tasks.keys()):
         upstream = []
-        try:
-            for dep in dag.predecessors(next_task):
-                if not isinstance(real_tasks[dep], TaskPromise):
-                    upstream.append(real_tasks[dep])
-                else:
-                    for _, data in dag[dep][next_task].items():
-                        link_input_key, link_template_key = data.get(
-                            "data", (None, None)
-                        )
-                        link_key = (
-                            link_input_key
-                            if link_template_key is None
-                            else f"{link_input_key}.{link_template_key}"
-                        )
-
-                        # Only one STREAM per input allowed. Multiple streams would require zip
-                        promises[next_task][link_key] = real_tasks[dep]
-
-        except KeyError:
-            running_queue.append(next_task)
-            continue
-
-        previously_failed = None
-        for pred, _, (input_key, template_key) in dag.in_edges(next_task, data="data"):
-            if isinstance(real_tasks[pred], TaskPromise):
-                continue
+        for dep in dag.predecessors(next_task):
+            if not isinstance(real_tasks[dep], TaskPromise):
+                upstream.append(real_tasks[dep])
+            else:
+                for _, data in dag[dep][next_task].items():
+                    link_input_key, link_template_key = data.get(
+                        "data", (None, None)
+                    )
+                    link_key = (
+                        link_input_key
+                        if link_template_key is None
+                        else f"{link_input_key}.{link_template_key}"
+                    )
 
-            upstream_result = run_step(real_tasks[pred])
-            if isinstance(upstream_result, ComponentError):
-                previously_failed = upstream_result
-                break
-
-            tasks[next_task] = update_inputs(
-                current_task=tasks[next_task],
-                upstream_task=upstream_result,
-                upstream_label=pred,
-                input_key=input_key,
-                template_key=template_key,
-            )
+                    # Only one STREAM per input allowed. Multiple streams would require zip
+                    promises[next_task][link_key] = real_tasks[dep].subscribe()
+
+        links = [
+            (pred, input_key, template_key)
+            for pred, _, (input_key, template_key) in dag.in_edges(next_task, data="data")
+            if not isinstance(real_tasks[pred], TaskPromise)
+        ]
+        if any(isinstance(real_tasks[pred], ComponentError) for pred, _, _ in links):
+            close_subscriptions(promises[next_task])
+            real_tasks[next_task] = ComponentError(UPSTREAM_FAILURE_MESSAGE)
+            continue
 
-        if previously_failed is not None:
-            real_tasks[next_task] = ComponentError(
-                "Run upstream components first or see their return errors for details!"
-            )
+        # Inlined components report through their subworkflow
+        node_report = report and next_task not in inner_labels
+        if next_task in plan.subworkflows:
+            close_subscriptions(promises[next_task])
+            output = real_tasks[plan.subworkflows[next_task]]
+            if isinstance(output, TaskPromise):
+                output = output.component.component_model
+            real_tasks[next_task] = collect_subworkflow_output.with_options(
+                name=next_task
+            ).submit(component=tasks[next_task], output=output, report=node_report)
             continue
 
+        is_stream_producer = (
+            tasks[next_task].output.data_type == DataType.STREAM
+            and len(promises[next_task]) == 0
+            and dag.out_degree(next_task) > 0
+        )
+        # Every task is handed the upstream futures and wires its inputs once they resolve
+        upstream_results = {pred: real_tasks[pred] for pred, _, _ in links}
+
         try:
             obj = ComponentWrapper(component=tasks[next_task])
         except ComponentError as e:
+            close_subscriptions(promises[next_task])
             real_tasks[next_task] = e
             logger.error(f"Error running {tasks[next_task].label}: {str(e)}", exc_info=True)
             continue
         if obj.component_model.class_name == Subworkflow.__name__:
-            @task()
-            def assign_output(model, output):
-                model.output = output
-                return model
-            subworkflow = Subworkflow.subworkflow_validation(obj.component_model)
-            _tasks = create_flow_dag(subworkflow)
-            error = None
-            for subsid, substate in _tasks.items():
-                subresult = run_step(substate)
-
-                if isinstance(subresult, ComponentError):
-                    #Only show the first subworkflow error
-                    if error is None:
-                        error = subresult
-                        real_tasks[next_task] = subresult
-                    continue
-
-                if subresult.is_terminal:
-                    real_tasks[next_task] = assign_output.submit(
-                        model=tasks[next_task], output=subresult.output
-                    )
-                    break
+            close_subscriptions(promises[next_task])
+            real_tasks[next_task] = run_subworkflow_task.with_options(
+                name=obj.component_model.label
+            ).submit(
+                component_wrapper=obj,
+                upstream=upstream_results,
+                links=links,
+                report=node_report,
+                wait_for=upstream,
+            )
         elif len(promises[next_task]) > 0:
             real_tasks[next_task] = stream_prefect_task.with_options(
                 name=f"Task {obj.component_model.name}"
             ).submit(
-                component_instance=obj,
+                component=obj,
                 promises=promises[next_task],
+                upstream=upstream_results,
+                links=links,
+                report=node_report,
                 wait_for=upstream,
             )
         else:
-            if obj.component_model.output.data_type == DataType.STREAM:
-                try:
-                    next(dag.successors(next_task))
-                    real_tasks[next_task] = TaskPromise(obj)
-                    continue
-                except StopIteration:
-                    pass
+            if is_stream_producer:
+                real_tasks[next_task] = TaskPromise(
+                    obj,
+                    on_item=emit_stream_item if node_report else None,
+                    consumers=dag.out_degree(next_task),
+                    maxsize=LUNAR_CONTEXT.lunar_config.STREAM_QUEUE_SIZE,
+                    prepare=partial(wire_resolved_inputs, obj, upstream_results, links),
+                )
+                continue
 
             real_tasks[next_task] = run_prefect_task.with_options(
                 name=obj.component_model.label,
-                refresh_cache=obj.disable_cache,
                 persist_result=True,
             ).submit(
                 component_wrapper=obj,
+                upstream=upstream_results,
+                links=links,
+                report=node_report,
                 wait_for=upstream,
             )
     return real_tasks
@@ -265,6 +452,9 @@ def run_step(step: Union[PrefectFuture, ComponentError]):
         return step
     try:
         result = step.result(raise_on_failure=True)
+    except UnfinishedRun:
+        # Prefect leaves a task NotReady when one of its upstream futures failed
+        result = ComponentError(UPSTREAM_FAILURE_MESSAGE)
     except Exception as e:
         e = ComponentError(str(e))
         result = e
@@ -272,21 +462,35 @@ def run_step(step: Union[PrefectFuture, ComponentError]):
     return result
 
 
-def create_flow(workflow_path: str):
+def create_flow(workflow_path: str, targets: Optional[List[str]] = None):
     with open(workflow_path, "r") as w:
         workflow = json.load(w)
-    workflow = WorkflowModel.model_validate(workflow)
-    tasks = create_flow_dag(workflow)
-    states_id = list(tasks.keys())
+    workflow = prune_to_targets(WorkflowModel.model_validate(workflow), targets)
+    plan = plan_workflow(workflow)
+    tasks = create_flow_dag(workflow, plan=plan)
     results = {}
-    for sid in states_id:
+    for sid in [comp.label for comp in workflow.components]:
         if isinstance(tasks[sid], TaskPromise):
             results[sid] = tasks[sid].component.component_model
             continue
         results[sid] = run_step(tasks[sid])
+        if sid in plan.subworkflows and isinstance(results[sid], ComponentError):
+            results[sid] = first_subworkflow_error(plan, sid, tasks) or results[sid]
     return results
 
 
+def first_subworkflow_error(plan: WorkflowPlan, label: str, tasks: Dict):
+    # Tasks are submitted in topological order, so the first error is the one that caused the others
+    members = set(plan.members[label])
+    for member, step in tasks.items():
+        if member not in members or isinstance(step, TaskPromise):
+            continue
+        result = run_step(step)
+        if isinstance(result, ComponentError):
+            return result
+    return None
+
+
 def create_task_flow(
     component_path: str,
 ):
@@ -308,7 +512,6 @@ def create_task_flow(
         else:
             prefect_task = run_prefect_task.with_options(
                 name=obj.component_model.label,
-                refresh_cache=obj.disable_cache,
             ).submit(
                 component_wrapper=obj,
                 wait_for=None,
@@ -389,7 +592,11 @@ def gather_component_dependencies(components: List[ComponentModel]):
 
 
 async def run_component_as_prefect_flow(
-    component_path: str, venv: Optional[str] = None, environment: Optional[Dict] = None
+    component_path: str,
+    venv: Optional[str] = None,
+    environment: Optional[Dict] = None,
+    on_event: Optional[Callable[[Dict], Any]] = None,
+    run_path: Optional[str] = None,
 ):
 
     if venv is None:
@@ -410,35 +617,69 @@ async def run_component_as_prefect_flow(
 
     deps = gather_component_dependencies([component])
 
+    result_path = create_result_path(run_path)
     process = await PythonProcess.create(
         venv_path=venv,
-        command=create_base_command() + ["--component", component_path],
+        command=create_base_command()
+        + ["--component", "--result-path", result_path, component_path],
         expected_packages=deps,
         stream_output=True,
         env=environment,
     )
 
-    with OutputCatcher() as output:
-        _ = await process.run()
+    if LUNAR_CONTEXT.lunar_config.WORKER_POOL_ENABLED:
+        return await run_in_worker_pool(
+            process,
+            component_path,
+            result_path,
+            component=True,
+            environment=environment,
+            on_event=on_event,
+        )
 
-    return parse_component_result(output)
+    return await collect_component_results(result_path, process.run(), on_event)
 
 
 async def run_workflow_as_prefect_flow(
-    workflow_path: str, venv: Optional[str] = None, environment: Optional[Dict] = {}
+    workflow_path: str,
+    venv: Optional[str] = None,
+    environment: Optional[Dict] = {},
+    on_event: Optional[Callable[[Dict], Any]] = None,
+    executor: Optional[str] = None,
+    artifact_path: Optional[str] = None,
+    targets: Optional[List[str]] = None,
+    run_path: Optional[str] = None,
 ):
+    """
+    With targets, only those components and their ancestors run. Result files go to run_path, when given.
+    """
     if not Path(workflow_path).is_file():
         raise RuntimeError(f"Workflow file {workflow_path} not found!")
 
+    executor = executor or LUNAR_CONTEXT.lunar_config.WORKFLOW_EXECUTOR
+    if venv is None and executor != "prefect":
+        # Imported here since the executor builds on the task helpers of this module
+        from lunarbase.orchestration.executor import LocalExecutor
+
+        with open(workflow_path, "r") as w:
+            workflow = WorkflowModel.model_validate(json.load(w))
+        workflow = prune_to_targets(workflow, targets)
+        with run_artifact_store(artifact_path):
+            return await LocalExecutor(
+                kind=executor,
+                max_workers=LUNAR_CONTEXT.lunar_config.LOCAL_EXECUTOR_MAX_WORKERS,
+            ).run_workflow(workflow)
+
     if venv is None:
         flow = workflow_to_prefect_flow(workflow_path)
-        flow_result = flow(workflow_path, return_state=True)
-        if flow_result.is_cancelled():
-            flow_result = await gather_partial_flow_results(
-                str(flow_result.state_details.flow_run_id)
-            )
-        else:
-            flow_result = await flow_result.data.get()
+        with run_artifact_store(artifact_path):
+            flow_result = flow(workflow_path, targets, return_state=True)
+            if flow_result.is_cancelled():
+                flow_result = await gather_partial_flow_results(
+                    str(flow_result.state_details.flow_run_id)
+                )
+            else:
+                flow_result = await flow_result.data.get()
 
         return flow_result
 
@@ -447,9 +688,16 @@ async def run_workflow_as_prefect_flow(
     workflow = WorkflowModel.model_validate(workflow)
     deps = gather_component_dependencies(workflow.components)
 
+    result_path = create_result_path(run_path)
+    artifact_args = [] if artifact_path is None else ["--artifact-path", artifact_path]
+    for target in targets or []:
+        artifact_args.extend(["--target", target])
     process = await PythonProcess.create(
         venv_path=venv,
-        command=create_base_command() + [workflow_path],
+        command=create_base_command()
+        + ["--result-path", result_path, "--executor", executor]
+        + artifact_args
+        + [workflow_path],
         expected_packages=deps,
         stream_output=True,
         env=environment,
@@ -457,50 +705,149 @@ async def run_workflow_as_prefect_flow(
 
     # LUNAR_CONTEXT.lunar_registry.update_workflow_runtime(workflow_id=workflow.id, workflow_pid=process)
 
-    with OutputCatcher() as output:
-        _ = await process.run()
+    if LUNAR_CONTEXT.lunar_config.WORKER_POOL_ENABLED:
+        return await run_in_worker_pool(
+            process,
+            workflow_path,
+            result_path,
+            component=False,
+            environment=environment,
+            on_event=on_event,
+            executor=executor,
+            artifact_path=artifact_path,
+            targets=targets,
+        )
 
-    return parse_component_result(output)
+    return await collect_component_results(result_path, process.run(), on_event)
 
 
-def compose_component_result(result: Dict):
-    try:
-        for cmp, cmp_out in result.items():
-            if isinstance(cmp_out, ComponentModel):
-                result[cmp] = cmp_out.model_dump(by_alias=True)
-    except Exception as e:
-        raise ComponentError(f"Failed to parse component output: {result}: {str(e)}")
-    json_out = f"{RUN_OUTPUT_START}"
-    json_out += json.dumps(result, cls=ComponentEncoder)
-    json_out += f"{RUN_OUTPUT_END}"
-
-    return json_out
+def create_result_path(run_path: Optional[str] = None):
+    if run_path is not None:
+        return str(Path(run_path, RunDirectory.RESULT_NAME))
+    tmp_path = LUNAR_CONTEXT.lunar_config.SYSTEM_TMP_PATH
+    Path(tmp_path).mkdir(parents=True, exist_ok=True)
+    result_fd, result_path = tempfile.mkstemp(
+        prefix="result_", suffix=".lunar", dir=tmp_path
+    )
+    os.close(result_fd)
+    return result_path
 
 
-def parse_component_result(result: List):
-    expected_output = None
-    for out in result:
-        if RUN_OUTPUT_START in out and RUN_OUTPUT_END in out:
-            pattern = re.compile(
-                f"{RUN_OUTPUT_START}(.*){RUN_OUTPUT_END}", re.MULTILINE
-            )
-            match = re.search(pattern, out)
-            try:
-                expected_output = match.group(1)
-            except IndexError:
+async def collect_component_results(
+    result_path: str,
+    running: Awaitable,
+    on_event: Optional[Callable[[Dict], Any]] = None,
+):
+    """
+    Gathers the per-component result frames written to result_path while the run is going on.
+    Component and stream item frames are also handed to on_event as soon as they are read.
+    """
+    reader = ResultReader(result_path)
+    results = dict()
+    done = False
+
+    def consume():
+        nonlocal done
+        for frame in reader.read_available():
+            if frame.get("event") == "component":
+                results[frame["label"]] = frame.get("result")
+            elif frame.get("event") == "done":
+                done = True
                 continue
-            break
+            if on_event is not None:
+                on_event(frame)
 
-    if expected_output is None:
+    running = asyncio.ensure_future(running)
+    try:
+        while not running.done():
+            await asyncio.wait(
+                {running}, timeout=LUNAR_CONTEXT.lunar_config.RESULT_POLL_INTERVAL
+            )
+            consume()
+        running.result()
+        consume()
+    finally:
+        if not running.done():
+            running.cancel()
+        Path(result_path).unlink(missing_ok=True)
+
+    if not done:
         raise ComponentError(
             f"Something went wrong while running flow. See server logs for details."
         )
 
-    try:
-        result = json.loads(expected_output)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Failed to parse result as JSON! Details: {str(e)}")
+    return deserialize_component_result(results)
+
 
+async def run_in_worker_pool(
+    process: PythonProcess,
+    json_path: str,
+    result_path: str,
+    component: bool = False,
+    environment: Optional[Dict] = None,
+    on_event: Optional[Callable[[Dict], Any]] = None,
+    executor: Optional[str] = None,
+    artifact_path: Optional[str] = None,
+    targets: Optional[List[str]] = None,
+):
+    if len(process.installed_packages) > 0:
+        # Workers may have imported older versions of the updated packages
+        await recycle_worker_pool(process.venv_path)
+
+    pool = get_worker_pool(
+        venv_path=process.venv_path,
+        python_executable=process.command[0],
+        env=process.env,
+        working_dir=process.working_dir,
+    )
+
+    async def request():
+        response = await pool.run(
+            {
+                "json_path": json_path,
+                "component": component,
+                "result_path": result_path,
+                "executor": executor,
+                "artifact_path": artifact_path,
+                "targets": targets,
+                "env": environment or {},
+            }
+        )
+        if response.get("event") == "error":
+            raise ComponentError(response.get("message"))
+
+    return await collect_component_results(result_path, request(), on_event)
+
+
+def serialize_component_output(result):
+    if isinstance(result, ComponentModel):
+        try:
+            return result.model_dump(by_alias=True)
+        except Exception as e:
+            raise ComponentError(f"Failed to parse component output: {result}: {str(e)}")
+    return result
+
+
+def resolve_result_artifacts(result):
+    """
+    A component result, as a model or its dump, with an output kept in the artifact store replaced by
+    its value, as clients expect.
+    """
+    if isinstance(result, ComponentModel) and isinstance(result.output.value, ArtifactHandle):
+        result = result.model_copy()
+        result.output = result.output.model_copy(update={"value": result.output.value.load()})
+    elif isinstance(result, dict) and isinstance(result.get("output"), dict):
+        value = result["output"].get("value")
+        if isinstance(value, ArtifactHandle):
+            result = {**result, "output": {**result["output"], "value": value.load()}}
+    return result
+
+
+def serialize_component_result(result: Dict):
+    return {cmp: serialize_component_output(cmp_out) for cmp, cmp_out in result.items()}
+
+
+def deserialize_component_result(result: Dict):
     for sid, component_result in result.items():
         try:
             component_result = ComponentModel.parse_raw(component_result)
@@ -524,6 +871,36 @@ parser.add_argument(
     "--component", required=False, action="store_true", help="Expect a component"
 )
 
+parser.add_argument(
+    "--result-path",
+    required=False,
+    action="store",
+    help="Write length-prefixed result frames to this file instead of stdout.",
+)
+
+parser.add_argument(
+    "--executor",
+    required=False,
+    action="store",
+    choices=["prefect", "thread", "process"],
+    help="Run the workflow with Prefect or with the local thread/process pool executor.",
+)
+
+parser.add_argument(
+    "--artifact-path",
+    required=False,
+    action="store",
+    help="Store large component outputs of this run under this directory.",
+)
+
+parser.add_argument(
+    "--target",
+    required=False,
+    action="append",
+    dest="targets",
+    help="Only run this component and its ancestors. Can be repeated.",
+)
+
 parser.add_argument(
     "json_path", help="The workflow/component json or its filesystem location."
 )
@@ -545,16 +922,25 @@ if __name__ == "__main__":
     # if len(LUNAR_CONTEXT.lunar_registry.components) == 0:
     #     LUNAR_CONTEXT.lunar_registry.load_components()
 
-    if args.component:
-        result = loop.run_until_complete(
-            run_component_as_prefect_flow(args.json_path, venv=args.venv)
-        )
-    else:
-        # st = time.time()
-        result = loop.run_until_complete(
-            run_workflow_as_prefect_flow(args.json_path, venv=args.venv)
-        )
-        # et = time.time() - st
-        # print(f"Runtime: {et} seconds.")
-    result_out = compose_component_result(result)
-    print(result_out)  # This is to have a return
+    with result_sink(args.result_path):
+        if args.component:
+            result = loop.run_until_complete(
+                run_component_as_prefect_flow(args.json_path, venv=args.venv)
+            )
+        else:
+            # st = time.time()
+            result = loop.run_until_complete(
+                run_workflow_as_prefect_flow(
+                    args.json_path,
+                    venv=args.venv,
+                    executor=args.executor,
+                    artifact_path=args.artifact_path,
+                    targets=args.targets,
+                )
+            )
+            # et = time.time() - st
+            # print(f"Runtime: {et} seconds.")
+        flush_component_results(result)
+
+    if args.result_path is None:
+        print(json.dumps(serialize_component_result(result), cls=ComponentEncoder))
@@ -0,0 +1,256 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Literal, Optional, Tuple, get_args
+
+from lunarbase.components.component_wrapper import ComponentWrapper
+from lunarbase.components.errors import ComponentError
+from lunarbase.components.subworkflow import Subworkflow
+from lunarbase.modeling.data_models import ComponentModel, WorkflowModel
+from lunarbase.orchestration.engine import (
+    UPSTREAM_FAILURE_MESSAGE,
+    emit_component_result,
+    emit_stream_item,
+    stream_prefect_task,
+    update_inputs,
+    wire_upstream_inputs,
+)
+from lunarbase.orchestration.planner import WorkflowPlan, plan_workflow
+from lunarbase.orchestration.scheduler import topological_order
+from lunarbase.orchestration.streaming import close_subscriptions
+from lunarbase.orchestration.task_promise import TaskPromise
+from lunarcore.component.data_types import DataType
+
+from lunarbase import LUNAR_CONTEXT
+
+ExecutorKind = Literal["prefect", "thread", "process"]
+EXECUTOR_KINDS = list(get_args(ExecutorKind))
+
+LOCAL_POOLS: Dict[Tuple[str, int], Executor] = dict()
+
+
+def validate_executor(executor: Optional[str]):
+    if executor is not None and executor not in EXECUTOR_KINDS:
+        raise ValueError(f"Unknown executor {executor}. Accepted executors are {EXECUTOR_KINDS}.")
+    return executor
+
+
+def get_local_pool(kind: str, max_workers: int):
+    pool = LOCAL_POOLS.get((kind, max_workers))
+    if pool is None:
+        if kind == "process":
+            pool = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            pool = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="lunar-executor"
+            )
+        LOCAL_POOLS[(kind, max_workers)] = pool
+    return pool
+
+
+def run_component(
+    component: ComponentModel,
+    upstream: Dict[str, ComponentModel],
+    links: List[Tuple[str, str, Optional[str]]],
+):
+    # Module level so that it can be sent to a process pool; the wrapper is built where it runs
+    component_wrapper = ComponentWrapper(component=component)
+    wire_upstream_inputs(component_wrapper, upstream, links)
+    try:
+        return component_wrapper.run_in_workflow()
+    except Exception as e:
+        raise ComponentError(str(e))
+
+
+def run_stream_consumer(
+    component_wrapper: ComponentWrapper,
+    promises: Dict,
+    upstream: Dict[str, ComponentModel],
+    links: List[Tuple[str, str, Optional[str]]],
+):
+    return stream_prefect_task.fn(
+        component=component_wrapper,
+        promises=promises,
+        upstream=upstream,
+        links=links,
+        report=False,
+    )
+
+
+class LocalExecutor:
+    """
+    Runs a workflow DAG straight on a thread or process pool, without Prefect's task bookkeeping.
+    Returns the same {label: ComponentModel | ComponentError} dict as create_flow.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 8):
+        if kind not in EXECUTOR_KINDS[1:]:
+            raise ValueError(
+                f"Unknown executor {kind}. Accepted local executors are {EXECUTOR_KINDS[1:]}."
+            )
+        self.kind = kind
+        self.pool = get_local_pool(kind, max_workers)
+        # Stream consumers drive generators, which cannot cross process boundaries
+        self.stream_pool = get_local_pool("thread", max_workers)
+
+    async def run_workflow(self, workflow: WorkflowModel, report: bool = True):
+        plan = plan_workflow(workflow)
+        inner_labels = plan.inner_labels
+        tasks = {comp.label: comp for comp in plan.workflow.components}
+        dag = plan.workflow.get_dag()
+        nodes = dict()
+        for label in topological_order(dag, known=tasks.keys()):
+            node_report = report and label not in inner_labels
+            if label in plan.subworkflows:
+                node = self._collect_subworkflow(label, tasks[label], plan, nodes, node_report)
+            else:
+                node = self._run_node(label, tasks[label], dag, nodes, node_report)
+            nodes[label] = asyncio.ensure_future(node)
+
+        results = dict()
+        for label, node in nodes.items():
+            result = await node
+            if label in inner_labels:
+                continue
+            if isinstance(result, TaskPromise):
+                result = result.component.component_model
+            results[label] = result
+        return results
+
+    def _run_in_pool(self, pool: Executor, func, *args):
+        # Threads do not inherit the context of the run (e.g. its artifact store) by themselves
+        if isinstance(pool, ThreadPoolExecutor):
+            func, args = contextvars.copy_context().run, (func, *args)
+        return asyncio.get_running_loop().run_in_executor(pool, func, *args)
+
+    async def _run_node(self, label: str, component: ComponentModel, dag, nodes: Dict, report: bool):
+        promises, links, upstream = dict(), [], dict()
+        edges = list(dag.in_edges(label, data="data"))
+        pred_results = {pred: await nodes[pred] for pred, _, _ in edges}
+        failed = False
+        for pred, _, (input_key, template_key) in edges:
+            pred_result = pred_results[pred]
+            if isinstance(pred_result, ComponentError):
+                failed = True
+                continue
+            if isinstance(pred_result, TaskPromise):
+                # Every consumer edge subscribes, even on failure, so the producer knows when to start
+                link_key = (
+                    input_key if template_key is None else f"{input_key}.{template_key}"
+                )
+                promises[link_key] = pred_result.subscribe()
+                continue
+            upstream[pred] = pred_result
+            links.append((pred, input_key, template_key))
+        if failed:
+            close_subscriptions(promises)
+            return ComponentError(UPSTREAM_FAILURE_MESSAGE)
+
+        is_stream_producer = (
+            component.output.data_type == DataType.STREAM
+            and len(promises) == 0
+            and dag.out_degree(label) > 0
+        )
+        if component.class_name == Subworkflow.__name__ or is_stream_producer:
+            for pred, input_key, template_key in links:
+                component = update_inputs(
+                    current_task=component,
+                    upstream_task=upstream[pred],
+                    upstream_label=pred,
+                    input_key=input_key,
+                    template_key=template_key,
+                )
+            links = []
+
+        start = time.perf_counter()
+        component_wrapper = None
+        try:
+            if self.kind == "process" and len(promises) == 0 and not is_stream_producer \
+                    and component.class_name != Subworkflow.__name__:
+                result = await self._run_in_pool(
+                    self.pool, run_component, component, upstream, links
+                )
+            else:
+                component_wrapper = ComponentWrapper(component=component)
+                if component.class_name == Subworkflow.__name__:
+                    close_subscriptions(promises)
+                    result = await self._run_subworkflow(component_wrapper)
+                elif is_stream_producer:
+                    return TaskPromise(
+                        component_wrapper,
+                        on_item=emit_stream_item if report else None,
+                        consumers=dag.out_degree(label),
+                        maxsize=LUNAR_CONTEXT.lunar_config.STREAM_QUEUE_SIZE,
+                    )
+                elif len(promises) > 0:
+                    result = await self._run_in_pool(
+                        self.stream_pool,
+                        run_stream_consumer,
+                        component_wrapper,
+                        promises,
+                        upstream,
+                        links,
+                    )
+                else:
+                    wire_upstream_inputs(component_wrapper, upstream, links)
+                    result = await self._run_in_pool(
+                        self.pool, component_wrapper.run_in_workflow
+                    )
+        except Exception as e:
+            close_subscriptions(promises)
+            result = ComponentError(str(e))
+
+        if report and result is not None:
+            emit_component_result(
+                label,
+                result,
+                elapsed=time.perf_counter() - start,
+                **getattr(component_wrapper, "report_details", {}),
+            )
+        return result
+
+    async def _collect_subworkflow(
+        self, label: str, component: ComponentModel, plan: WorkflowPlan, nodes: Dict, report: bool
+    ):
+        output = await nodes[plan.subworkflows[label]]
+        if isinstance(output, TaskPromise):
+            # The producer counts this edge as a consumer
+            output.subscribe().close()
+            output = output.component.component_model
+
+        if isinstance(output, ComponentError):
+            # Nodes are created in topological order, so the first error is the one that caused the others
+            members = set(plan.members[label])
+            result = output
+            for member, node in nodes.items():
+                member_result = await node if member in members else None
+                if isinstance(member_result, ComponentError):
+                    result = member_result
+                    break
+        else:
+            component.output = output.output
+            result = component
+
+        if report:
+            emit_component_result(label, result)
+        return result
+
+    async def _run_subworkflow(self, component_wrapper: ComponentWrapper):
+        subworkflow = Subworkflow.subworkflow_validation(component_wrapper.component_model)
+        subresults = await self.run_workflow(subworkflow, report=False)
+        error = None
+        for subresult in subresults.values():
+            if isinstance(subresult, ComponentError):
+                # Only show the first subworkflow error
+                if error is None:
+                    error = subresult
+                continue
+            if subresult.is_terminal:
+                component_wrapper.component_model.output = subresult.output
+                return component_wrapper.component_model
+        return error
@@ -0,0 +1,207 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from lunarbase.components.artifacts import ArtifactHandle
+from lunarbase.modeling.component_encoder import component_json_dumps
+from lunarbase.modeling.data_models import ComponentModel, WorkflowModel
+from lunarbase.orchestration.engine import update_inputs
+from lunarbase.orchestration.scheduler import topological_order
+from lunarbase.utils import setup_logger
+from lunarcore.component.data_types import DataType
+
+logger = setup_logger("incremental-runs")
+
+
+def fed_inputs(workflow: WorkflowModel):
+    """
+    Input keys and template variables of each component that are set by upstream outputs at run time.
+    """
+    fed: Dict[str, Set[str]] = dict()
+    for dep in workflow.dependencies:
+        key = dep.component_input_key
+        if dep.template_variable_key is not None:
+            template_factors = dep.template_variable_key.split(".", maxsplit=1)
+            key = (
+                f"{key}.{dep.template_variable_key}"
+                if len(template_factors) < 2
+                else dep.template_variable_key
+            )
+        fed.setdefault(dep.target_label, set()).add(key)
+    return fed
+
+
+def component_fingerprint(
+    component: ComponentModel, upstream: List[List], fed: Optional[Set[str]] = None
+):
+    """
+    Hashes what a component run depends on: its class, configuration, static inputs and the fingerprints
+    of the components feeding it. Values set by upstream outputs are left out, as the upstream
+    fingerprints already account for them.
+    """
+    fed = fed or set()
+    inputs = []
+    for component_input in component.inputs:
+        inputs.append(
+            [
+                component_input.key,
+                str(component_input.data_type),
+                None if component_input.key in fed else component_input.value,
+                {
+                    key: value
+                    for key, value in component_input.template_variables.items()
+                    if key not in fed
+                },
+            ]
+        )
+    try:
+        payload = component_json_dumps(
+            {
+                "class_name": component.class_name,
+                "version": component.version,
+                "configuration": component.configuration,
+                "inputs": inputs,
+                "upstream": sorted(upstream, key=str),
+            },
+            sort_keys=True,
+        )
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def workflow_fingerprints(workflow: WorkflowModel):
+    """
+    Merkle fingerprints of all components: a change to a component also changes the fingerprint of
+    every component downstream of it. Components that cannot be fingerprinted, and their descendants,
+    get None.
+    """
+    dag = workflow.get_dag()
+    fed = fed_inputs(workflow)
+    components = {component.label: component for component in workflow.components}
+    fingerprints: Dict[str, Optional[str]] = dict()
+    for label in topological_order(dag):
+        upstream = [
+            [fingerprints.get(pred), input_key, template_key]
+            for pred, _, (input_key, template_key) in dag.in_edges(label, data="data")
+        ]
+        if any(fingerprint is None for fingerprint, _, _ in upstream):
+            fingerprints[label] = None
+            continue
+        fingerprints[label] = component_fingerprint(components[label], upstream, fed.get(label))
+    return fingerprints
+
+
+def reusable_output(component: ComponentModel):
+    if str(component.configuration.get("force_run", "false")).lower() in ["true", "1"]:
+        return False
+    if component.output.data_type == DataType.STREAM:
+        return False
+    value = component.output.value
+    # Artifacts older than the retention are gone
+    return not isinstance(value, ArtifactHandle) or Path(value.path).is_file()
+
+
+class RunState:
+    """
+    Fingerprints and results of the last successful run of each component of a workflow, kept in one
+    pickle file.
+    """
+
+    FILE_NAME = "run_state.pkl"
+
+    def __init__(self, path: str):
+        self.path = Path(path, self.FILE_NAME)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.is_file():
+            return dict()
+        try:
+            with open(self.path, "rb") as state_file:
+                return pickle.load(state_file)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable run state {self.path}: {str(e)}")
+            return dict()
+
+    def reusable(self, workflow: WorkflowModel, fingerprints: Dict[str, Optional[str]]):
+        """
+        Results of the previous run for the components whose fingerprint did not change.
+        """
+        state = self.load()
+        reused = dict()
+        for component in workflow.components:
+            fingerprint, entry = fingerprints.get(component.label), state.get(component.label)
+            if fingerprint is None or entry is None or entry["fingerprint"] != fingerprint:
+                continue
+            if reusable_output(component) and reusable_output(entry["result"]):
+                reused[component.label] = entry["result"]
+        return reused
+
+    def save(
+        self,
+        workflow: WorkflowModel,
+        fingerprints: Dict[str, Optional[str]],
+        results: Dict[str, Any],
+    ):
+        state = self.load()
+        labels = {component.label for component in workflow.components}
+        # Entries of components that did not run this time (e.g. not targeted) are kept
+        state = {label: entry for label, entry in state.items() if label in labels}
+        for label, result in results.items():
+            if isinstance(result, dict):
+                try:
+                    result = ComponentModel.model_validate(result)
+                except Exception:
+                    result = None
+            if not isinstance(result, ComponentModel) or fingerprints.get(label) is None:
+                state.pop(label, None)
+                continue
+            state[label] = {"fingerprint": fingerprints[label], "result": result}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as state_file:
+                pickle.dump(state, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # Results that cannot be pickled only cost a recomputation next time
+            logger.warning(f"Failed to save run state {self.path}: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        os.replace(tmp_path, self.path)
+
+
+def inline_reused(workflow: WorkflowModel, reused: Dict[str, ComponentModel]):
+    """
+    Removes the reused components from the workflow and sets their outputs on the inputs they feed.
+    """
+    if len(reused) == 0:
+        return workflow
+    components = {
+        component.label: component.model_copy(deep=True)
+        for component in workflow.components
+        if component.label not in reused
+    }
+    dependencies = []
+    for dep in workflow.dependencies:
+        if dep.target_label in reused:
+            continue
+        if dep.source_label not in reused:
+            dependencies.append(dep)
+            continue
+        components[dep.target_label] = update_inputs(
+            current_task=components[dep.target_label],
+            upstream_task=reused[dep.source_label],
+            upstream_label=dep.source_label,
+            input_key=dep.component_input_key,
+            template_key=dep.template_variable_key,
+        )
+    return workflow.model_copy(
+        update={"components": list(components.values()), "dependencies": dependencies}
+    )
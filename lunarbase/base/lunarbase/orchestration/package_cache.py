@@ -0,0 +1,124 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import compileall
+import hashlib
+import os
+import shutil
+import threading
+import zipfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from lunarbase.registry.registry_models import get_class_path_candidates
+from lunarbase.utils import anyinzip, setup_logger
+
+logger = setup_logger("package-cache")
+
+# Written last, holds the import root of the package relative to its cache directory
+COMPLETE_MARKER = ".complete"
+PTH_PREFIX = "lunar_component_"
+HASH_CHUNK_SIZE = 1 << 20
+
+PACKAGE_CACHES: Dict[str, "PackageCache"] = dict()
+
+
+def component_archive(requirement: str) -> Optional[Tuple[str, str]]:
+    """
+    Module name and archive path of a `<module> @ file://<zip>` component requirement, None for anything else.
+    """
+    module_name, separator, url = requirement.partition(" @ ")
+    url = url.strip()
+    if len(separator) == 0 or not url.startswith("file://"):
+        return None
+    archive_path = url[len("file://"):]
+    if not zipfile.is_zipfile(archive_path):
+        return None
+    return module_name.strip(), archive_path
+
+
+class PackageCache:
+    """
+    Component archives extracted and byte-compiled once per content hash. Venvs import a package through
+    a `.pth` file pointing into the cache instead of having the archive pip-installed.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        # Archive hashes by path, valid while size and modification time do not change
+        self._hashes: Dict[str, Tuple[Tuple[int, int], str]] = dict()
+        self._lock = threading.Lock()
+        Path(self.path).mkdir(parents=True, exist_ok=True)
+
+    def archive_hash(self, archive_path: str):
+        stat = Path(archive_path).stat()
+        key = (stat.st_size, stat.st_mtime_ns)
+        cached = self._hashes.get(archive_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(archive_path, "rb") as archive:
+            for chunk in iter(lambda: archive.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        self._hashes[archive_path] = (key, digest.hexdigest()[:32])
+        return self._hashes[archive_path][1]
+
+    def extract(self, archive_path: str, module_name: str):
+        """
+        Returns the directory to put on sys.path to import the module of the archive.
+        """
+        target = Path(self.path, self.archive_hash(archive_path))
+        with self._lock:
+            if not Path(target, COMPLETE_MARKER).is_file():
+                self._extract(archive_path, module_name, target)
+            import_root = Path(target, COMPLETE_MARKER).read_text().strip()
+        return str(Path(target, import_root))
+
+    def link(self, libpath: str, module_name: str, archive_path: str):
+        """
+        Points a venv at the cached package, returns whether the link changed.
+        """
+        import_root = self.extract(archive_path, module_name)
+        pth_path = Path(libpath, f"{PTH_PREFIX}{module_name}.pth")
+        try:
+            if pth_path.read_text().strip() == import_root:
+                return False
+        except OSError:
+            pass
+        Path(libpath).mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(libpath, f"{pth_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(f"{import_root}\n")
+        os.replace(tmp_path, pth_path)
+        return True
+
+    def _extract(self, archive_path: str, module_name: str, target: Path):
+        tmp_path = Path(self.path, f".{target.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        with zipfile.ZipFile(archive_path) as archive:
+            class_path = anyinzip(archive, get_class_path_candidates(module_name))
+            if class_path is None:
+                raise ValueError(f"No module {module_name} in {archive_path}!")
+            # A module at the root of the archive gets its own directory
+            prefix = Path(module_name) if class_path == "__init__.py" else Path()
+            archive.extractall(Path(tmp_path, prefix))
+        import_root = Path(prefix, class_path).parent.parent
+
+        # Compiled as if in place, so that tracebacks point into the cache
+        compileall.compile_dir(str(tmp_path), ddir=str(target), quiet=1)
+        Path(tmp_path, COMPLETE_MARKER).write_text(f"{import_root}\n")
+        try:
+            os.replace(tmp_path, target)
+        except OSError:
+            # Extracted meanwhile by another process
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not Path(target, COMPLETE_MARKER).is_file():
+                raise
+        logger.info(f"Cached {archive_path} in {target}.")
+
+
+def get_package_cache(path: str):
+    # Shared per path, so that archive hashes are computed once per process
+    if str(path) not in PACKAGE_CACHES:
+        PACKAGE_CACHES[str(path)] = PackageCache(path)
+    return PACKAGE_CACHES[str(path)]
@@ -0,0 +1,197 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import networkx as nx
+from lunarbase.components.subworkflow import Subworkflow
+from lunarbase.modeling.data_models import (
+    ComponentDependency,
+    ComponentModel,
+    WorkflowModel,
+)
+from lunarbase.orchestration.scheduler import topological_order
+
+LABEL_SEPARATOR = "/"
+# Input key of the edge from the component providing a subworkflow output to the subworkflow node
+SUBWORKFLOW_OUTPUT_KEY = "workflow"
+
+SUBWORKFLOW_PLAN_CACHE_SIZE = 128
+SUBWORKFLOW_PLANS: "OrderedDict[str, WorkflowPlan]" = OrderedDict()
+SUBWORKFLOW_PLANS_LOCK = threading.Lock()
+
+
+class WorkflowPlan:
+    """
+    A workflow with its subworkflows inlined. Inlined components are labelled `<subworkflow>/<label>`,
+    edges into a subworkflow are rewired to the inner inputs they feed and the subworkflow node itself
+    only takes the output of its inner terminal component.
+    """
+
+    def __init__(self, workflow: WorkflowModel):
+        self.workflow = workflow
+        # Subworkflow label -> label of the inlined component providing its output
+        self.subworkflows: Dict[str, str] = dict()
+        # Subworkflow label -> labels of all of its inlined components
+        self.members: Dict[str, List[str]] = dict()
+        # (subworkflow label, input key) -> inlined (label, input key) fed by that input
+        self.inputs: Dict[Tuple[str, str], List[Tuple[str, str]]] = dict()
+        # Inlined (label, input key) pairs fed by the subworkflow itself, for the parent plan
+        self.entry: Dict[str, List[Tuple[str, str]]] = dict()
+        self.output: Optional[str] = None
+
+    @property
+    def inner_labels(self):
+        return {label for members in self.members.values() for label in members}
+
+    def resolve_input(self, label: str, input_key: str, template_key: Optional[str]):
+        targets = self.inputs.get((label, input_key))
+        if targets is None:
+            return [(label, input_key, template_key)]
+
+        resolved = []
+        for target_label, target_key in targets:
+            target_template = template_key
+            if template_key is not None:
+                template_factors = template_key.split(".", maxsplit=1)
+                if len(template_factors) == 2:
+                    target_template = f"{target_key}.{template_factors[1]}"
+            resolved.extend(self.resolve_input(target_label, target_key, target_template))
+        return resolved
+
+
+def prune_to_targets(workflow: WorkflowModel, targets: Optional[List[str]] = None):
+    """
+    Keeps only the target components and the components they depend on.
+    """
+    if not targets:
+        return workflow
+    dag = workflow.get_dag()
+    unknown = [target for target in targets if target not in dag]
+    if len(unknown) > 0:
+        raise ValueError(f"Target components {unknown} not found in workflow {workflow.name}!")
+
+    needed = set(targets)
+    for target in targets:
+        needed.update(nx.ancestors(dag, target))
+    return workflow.model_copy(
+        update={
+            "components": [comp for comp in workflow.components if comp.label in needed],
+            "dependencies": [
+                dep
+                for dep in workflow.dependencies
+                if dep.source_label in needed and dep.target_label in needed
+            ],
+        }
+    )
+
+
+def subworkflow_plan_key(component: ComponentModel, label: str):
+    payload = f"{label}\n{component.model_dump_json(exclude={'position'})}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def plan_subworkflow(component: ComponentModel, label: str):
+    key = subworkflow_plan_key(component, label)
+    with SUBWORKFLOW_PLANS_LOCK:
+        plan = SUBWORKFLOW_PLANS.get(key)
+        if plan is not None:
+            SUBWORKFLOW_PLANS.move_to_end(key)
+    if plan is None:
+        inner_workflow = Subworkflow.subworkflow_validation(component)
+        prefix = f"{label}{LABEL_SEPARATOR}"
+        plan = plan_workflow(inner_workflow, prefix=prefix)
+
+        for subworkflow_input in component.inputs:
+            if subworkflow_input.key.lower() == SUBWORKFLOW_OUTPUT_KEY:
+                continue
+            plan.entry[subworkflow_input.key] = [
+                (f"{prefix}{inner.label}", inner_input.key)
+                for inner in inner_workflow.components
+                for inner_input in inner.inputs
+                if inner_input.id == subworkflow_input.id
+            ]
+
+        inner_dag = inner_workflow.get_dag()
+        terminals = [
+            inner_label
+            for inner_label in topological_order(inner_dag)
+            if inner_dag.out_degree(inner_label) == 0
+        ]
+        plan.output = f"{prefix}{terminals[0]}"
+
+        with SUBWORKFLOW_PLANS_LOCK:
+            SUBWORKFLOW_PLANS[key] = plan
+            while len(SUBWORKFLOW_PLANS) > SUBWORKFLOW_PLAN_CACHE_SIZE:
+                SUBWORKFLOW_PLANS.popitem(last=False)
+    # Plans are mutated while running, so every run gets its own copy
+    return copy.deepcopy(plan)
+
+
+def plan_workflow(workflow: WorkflowModel, prefix: str = ""):
+    """
+    Inlines every subworkflow whose workflow is known before running, recursively. Subworkflows taking
+    their workflow from an upstream component are kept as they are.
+    """
+    dynamic = {
+        dep.target_label
+        for dep in workflow.dependencies
+        if dep.component_input_key.lower() == SUBWORKFLOW_OUTPUT_KEY
+    }
+    plan = WorkflowPlan(workflow)
+    components, dependencies = [], []
+    for component in workflow.components:
+        label = f"{prefix}{component.label}"
+        inner = None
+        if component.class_name == Subworkflow.__name__ and component.label not in dynamic:
+            try:
+                inner = plan_subworkflow(component, label)
+            except Exception:
+                # Left to run as a component, which reports the validation error
+                inner = None
+        if inner is not None:
+            components.extend(inner.workflow.components)
+            dependencies.extend(inner.workflow.dependencies)
+            plan.subworkflows.update(inner.subworkflows)
+            plan.members.update(inner.members)
+            plan.inputs.update(inner.inputs)
+
+            plan.subworkflows[label] = inner.output
+            plan.members[label] = [inner_component.label for inner_component in inner.workflow.components]
+            plan.inputs.update(
+                {(label, input_key): targets for input_key, targets in inner.entry.items()}
+            )
+            dependencies.append(
+                ComponentDependency(
+                    component_input_key=SUBWORKFLOW_OUTPUT_KEY,
+                    source_label=inner.output,
+                    target_label=label,
+                )
+            )
+        components.append(
+            component if len(prefix) == 0 else component.model_copy(update={"label": label})
+        )
+
+    for dep in workflow.dependencies:
+        for target_label, input_key, template_key in plan.resolve_input(
+            f"{prefix}{dep.target_label}", dep.component_input_key, dep.template_variable_key
+        ):
+            dependencies.append(
+                ComponentDependency(
+                    component_input_key=input_key,
+                    source_label=f"{prefix}{dep.source_label}",
+                    target_label=target_label,
+                    template_variable_key=template_key,
+                )
+            )
+
+    if len(plan.subworkflows) > 0 or len(prefix) > 0:
+        plan.workflow = workflow.model_copy(
+            update={"components": components, "dependencies": dependencies}
+        )
+    return plan
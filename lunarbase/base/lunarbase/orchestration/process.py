@@ -2,13 +2,17 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import asyncio
 import contextlib
+import json
 import os
+import shutil
 import subprocess
 import sys
+import time
 import warnings
+from datetime import datetime, timezone
 from functools import lru_cache
-from io import StringIO
 from pathlib import Path
 from typing import Any, ClassVar, Dict, List, Optional
 from venv import EnvBuilder
@@ -21,10 +25,23 @@ from prefect.utilities.processutils import run_process
 from pydantic.v1 import Field, root_validator, validator
 from requirements.parser import parse
 
+from lunarbase import LUNAR_CONTEXT
+from lunarbase.orchestration.package_cache import component_archive, get_package_cache
+from lunarbase.orchestration.venv_cache import VenvCache
+from lunarbase.orchestration.wheelhouse import Wheelhouse, get_install_semaphore
+from lunarbase.orchestration.worker_pool import discard_worker_pool
 from lunarbase.registry import CORE_COMPONENT_PATH
 from lunarbase.utils import setup_logger
 
 
+VENV_LOCKS: Dict[str, asyncio.Lock] = dict()
+
+
+def get_venv_lock(venv_path: str):
+    # Shared venvs must not be provisioned or installed into by two runs at once
+    return VENV_LOCKS.setdefault(str(Path(venv_path).absolute()), asyncio.Lock())
+
+
 def create_venv_builder():
     # need system_site_packages=True inside docker
     system_site_packages = Path("/app/in_docker").exists()
@@ -38,6 +55,64 @@ def create_venv_builder():
     #     system_site_packages=False, symlinks=True, with_pip=True, upgrade_deps=False
     # )
 
+VENV_MANIFEST_NAME = "lunar_venv.json"
+# Install batches kept in the venv manifest
+INSTALL_BATCH_HISTORY = 20
+
+
+def read_venv_manifest(venv_path: str):
+    try:
+        with open(str(Path(venv_path, VENV_MANIFEST_NAME)), "r") as manifest_file:
+            return json.load(manifest_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_venv_manifest(venv_path: str, manifest: Dict):
+    with open(str(Path(venv_path, VENV_MANIFEST_NAME)), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+
+def provision_venv(venv_path: str, refresh: bool = False):
+    """
+    Creates and bootstraps (pip upgrade) the venv at venv_path once. Provisioned venvs carry a manifest
+    and are returned as they are unless a refresh is explicitly requested, which recreates the venv.
+    """
+    manifest = read_venv_manifest(venv_path)
+    if manifest is not None and not refresh:
+        return manifest
+
+    builder = PythonProcess.VENV_BUILDER
+    path = Path(venv_path)
+    if refresh and path.is_dir():
+        # Workers would keep running on the packages of the removed venv
+        discard_worker_pool(str(path))
+        shutil.rmtree(path)
+        manifest = None
+    if not path.is_dir() or not len(list(path.iterdir())):
+        builder.create(str(path))
+    context = builder.ensure_directories(str(path))
+
+    cmd = [context.env_exe, "-Im", "pip", "install", "--upgrade", "pip"]
+    subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+    pip_version = subprocess.check_output(
+        [context.env_exe, "-Im", "pip", "--version"], text=True
+    ).split()[1]
+
+    now = datetime.now(timezone.utc).isoformat()
+    return write_venv_manifest(
+        str(path),
+        {
+            **(manifest or dict()),
+            "created": (manifest or dict()).get("created", now),
+            "provisioned": now,
+            "pip_version": pip_version,
+            "python_version": "%d.%d.%d" % sys.version_info[:3],
+        },
+    )
+
+
 def get_root_pkg_path():
     return str(Path(__file__).parent.parent.parent.parent)
 
@@ -50,18 +125,6 @@ def create_base_command():
     ]
 
 
-class OutputCatcher(list):
-    def __enter__(self):
-        self._stdout = sys.stdout
-        sys.stdout = self._stringio = StringIO()
-        return self
-
-    def __exit__(self, *args):
-        self.extend(self._stringio.getvalue().splitlines())
-        del self._stringio  # free up some memory
-        sys.stdout = self._stdout
-
-
 class PythonProcess(Process):
     CACHE_PATH: ClassVar[str] = "packages.pip"
     VENV_BUILDER: ClassVar[EnvBuilder] = create_venv_builder()
@@ -70,6 +133,7 @@ class PythonProcess(Process):
     command: List[str] = Field(default_factory=create_base_command)
     working_dir: Optional[str] = Field(default=None)
     venv_context: dict = Field(default=None, exclude=True)
+    installed_packages: List[str] = Field(default_factory=list, exclude=True)
 
     class Config:
         arbitrary_types_allowed = False
@@ -88,15 +152,20 @@ class PythonProcess(Process):
     ):
         command = command or create_base_command()
         expected_packages = expected_packages or list()
-        self = cls(
-            venv_path=venv_path,
-            command=command,
-            working_dir=working_dir,
-            **additional_kwargs,
-        )
+        async with get_venv_lock(venv_path):
+            # Validation provisions the venv, which blocks
+            self = await asyncio.to_thread(
+                cls,
+                venv_path=venv_path,
+                command=command,
+                working_dir=working_dir,
+                **additional_kwargs,
+            )
 
-        if len(expected_packages) > 0:
-            await self.install_packages(expected_packages, disable_cache=False)
+            if len(expected_packages) > 0:
+                self.installed_packages = await self.install_packages(
+                    expected_packages, disable_cache=False
+                )
 
         return self
 
@@ -104,11 +173,7 @@ class PythonProcess(Process):
     @classmethod
     def validate_venv_path(cls, value):
         value = Path(value)
-        if not value.is_dir() or not len(list(value.iterdir())):
-            cls.VENV_BUILDER.create(str(value))
-        else:
-            cls.VENV_BUILDER.ensure_directories(str(value))
-
+        provision_venv(str(value))
         return value
 
     @root_validator(pre=False)
@@ -131,8 +196,6 @@ class PythonProcess(Process):
         context.libpath = libpath
 
         values["venv_context"] = vars(context)
-        cmd = [context.env_exe, "-Im", "pip", "install", "--upgrade", "pip"]
-        subprocess.check_output(cmd, stderr=subprocess.STDOUT)
 
         if not values.get("command", [""])[0].startswith(context.bin_path):
             values["command"][0] = str(
@@ -195,7 +258,7 @@ class PythonProcess(Process):
             "requirements": requirement_names,
         }
 
-    def check_installed(self, packages: List[str]):
+    def check_installed(self, packages: List[str], record: bool = True):
         full_cache_path = str(Path(self.venv_path, self.__class__.CACHE_PATH))
         try:
             new_packages = list(parse(os.linesep.join(packages)))
@@ -234,7 +297,7 @@ class PythonProcess(Process):
             to_install.add(req.line.strip())
             existing_packages[req.name] = req
 
-        if len(to_install) > 0:
+        if len(to_install) > 0 and record:
             existing_packages = [req.line.strip() for req in existing_packages.values()]
             with open(full_cache_path, "w") as reqs:
                 for spec in existing_packages:
@@ -242,47 +305,34 @@ class PythonProcess(Process):
                     reqs.write(os.linesep)
         return list(to_install)
 
-    async def install_packages(self, packages: List[str], disable_cache: bool = False):
-        if not disable_cache:
-            packages = self.check_installed(packages)
-        if len(packages) == 0:
-            return
-
-        # _use_threaded_child_watcher()
-
-        # Open a subprocess to execute the flow run
-        self.logger.info(f"Setting up package installation...")
-        working_dir_ctx = contextlib.nullcontext(self.working_dir)
-        packages_set = set(packages) - sys.stdlib_module_names
-        packages = list(packages_set)
-        with working_dir_ctx as working_dir:
-            cmd = [
-                self.venv_context["env_exe"],
-                "-m",
-                "pip",
-                "install",
-                "--no-cache-dir",
-                "--require-virtualenv",
-                "--isolated",
-                "--timeout=180",
-                "--disable-pip-version-check",
-                "--no-input",
-            ]
-            cmd = cmd + packages
-            self.logger.debug(f"Installing packages {packages} ...")
-
-            kwargs: Dict[str, object] = {}
-            if sys.platform == "win32":
-                kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
-
-            process = await run_process(
-                cmd,
-                stream_output=self.stream_output,
-                task_status=None,
-                task_status_handler=None,
-                cwd=working_dir,
-                **kwargs,
-            )
+    async def run_pip(self, arguments: List[str], description: str):
+        cmd = [
+            self.venv_context["env_exe"],
+            "-m",
+            "pip",
+            *arguments,
+            "--require-virtualenv",
+            "--isolated",
+            "--timeout=180",
+            "--disable-pip-version-check",
+            "--no-input",
+        ]
+
+        kwargs: Dict[str, object] = {}
+        if sys.platform == "win32":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+
+        config = LUNAR_CONTEXT.lunar_config
+        async with get_install_semaphore(config.INSTALL_CONCURRENCY):
+            with contextlib.nullcontext(self.working_dir) as working_dir:
+                process = await run_process(
+                    cmd,
+                    stream_output=self.stream_output,
+                    task_status=None,
+                    task_status_handler=None,
+                    cwd=working_dir,
+                    **kwargs,
+                )
 
         if process.returncode:
             help_message = None
@@ -314,8 +364,155 @@ class PythonProcess(Process):
                 )
 
             self.logger.error(
-                f"Package installation process exited with status code: {process.returncode}"
+                f"{description} process exited with status code: {process.returncode}"
                 + (f"; {help_message}" if help_message else "")
             )
-        else:
+        return process.returncode
+
+    async def build_wheel(self, wheelhouse: Wheelhouse, requirement: str):
+        async with wheelhouse.get_lock(requirement):
+            if wheelhouse.lookup(requirement) is not None:
+                return {"cached": True, "wheel_seconds": 0.0}
+
+            start = time.perf_counter()
+            returncode = await self.run_pip(
+                [
+                    "wheel",
+                    "--wheel-dir",
+                    wheelhouse.path,
+                    "--find-links",
+                    wheelhouse.path,
+                    requirement,
+                ],
+                f"Wheel build for {requirement}",
+            )
+            seconds = time.perf_counter() - start
+            if returncode:
+                return {"cached": False, "wheel_seconds": round(seconds, 3), "failed": True}
+
+            wheelhouse.record(requirement, seconds)
+            return {"cached": False, "wheel_seconds": round(seconds, 3)}
+
+    async def link_component_packages(self, packages: List[str]):
+        """
+        Links component archives from the package cache instead of pip-installing them.
+        Returns the packages left to install and the component packages whose link changed.
+        """
+        package_cache = get_package_cache(LUNAR_CONTEXT.lunar_config.PACKAGE_CACHE_PATH)
+        libpath = self.venv_context["libpath"]
+        remaining, linked = [], []
+        for package in packages:
+            archive = component_archive(package)
+            if archive is None:
+                remaining.append(package)
+                continue
+            module_name, archive_path = archive
+            try:
+                changed = await asyncio.to_thread(
+                    package_cache.link, libpath, module_name, archive_path
+                )
+            except Exception as e:
+                self.logger.warning(
+                    f"Failed to link {module_name} from the package cache: {str(e)}. Installing it instead."
+                )
+                remaining.append(package)
+                continue
+            if not changed:
+                continue
+            # A copy installed before the package cache would shadow the link
+            if any(Path(libpath).glob(f"{module_name.replace('-', '_')}-*.dist-info")):
+                await self.run_pip(["uninstall", "-y", module_name], f"Removal of installed {module_name}")
+            linked.append(package)
+        return remaining, linked
+
+    async def install_batch(self, packages: List[str], arguments: List[str], source: str):
+        start = time.perf_counter()
+        returncode = await self.run_pip(["install"] + arguments + packages, "Package installation")
+        return {
+            "packages": packages,
+            "source": source,
+            "seconds": round(time.perf_counter() - start, 3),
+            "failed": bool(returncode),
+        }
+
+    async def install_packages(self, packages: List[str], disable_cache: bool = False):
+        linked = []
+        if LUNAR_CONTEXT.lunar_config.PACKAGE_CACHE_ENABLED:
+            packages, linked = await self.link_component_packages(packages)
+        # Shared venvs are sealed once their dependency set is installed
+        shared = VenvCache(LUNAR_CONTEXT.lunar_config).is_shared(str(self.venv_path))
+        sealed = shared and (read_venv_manifest(str(self.venv_path)) or dict()).get("sealed")
+        record = not disable_cache and not sealed
+        if not disable_cache or sealed:
+            # Recorded only once installed, a failed install is retried by the next run
+            packages = self.check_installed(packages, record=False)
+        if len(packages) > 0 and sealed:
+            raise ValueError(
+                f"Virtual environment {self.venv_path} is shared and read-only. "
+                f"Packages {packages} are not part of its dependency set."
+            )
+        if len(packages) == 0:
+            return linked
+
+        self.logger.info(f"Setting up package installation...")
+        packages = list(set(packages) - sys.stdlib_module_names)
+        self.logger.debug(f"Installing packages {packages} ...")
+
+        config = LUNAR_CONTEXT.lunar_config
+        # Per package: wheel build timings. Installs run in batches and are timed per batch.
+        timings = {package: dict() for package in packages}
+        batches = []
+        index_packages = packages
+        if config.WHEELHOUSE_ENABLED:
+            wheelhouse = Wheelhouse(
+                config.WHEELHOUSE_PATH, unpinned_ttl=config.WHEELHOUSE_UNPINNED_TTL
+            )
+            builds = await asyncio.gather(
+                *[self.build_wheel(wheelhouse, package) for package in packages]
+            )
+            timings = dict(zip(packages, builds))
+            index_packages = [
+                package for package in packages if timings[package].get("failed")
+            ]
+            wheel_packages = [
+                package for package in packages if not timings[package].get("failed")
+            ]
+
+            if len(wheel_packages) > 0:
+                batches.append(
+                    await self.install_batch(
+                        wheel_packages,
+                        ["--no-index", "--find-links", wheelhouse.path],
+                        source="wheelhouse",
+                    )
+                )
+
+        if len(index_packages) > 0:
+            # Packages that could not be built into the wheelhouse are installed straight from the index
+            batches.append(
+                await self.install_batch(index_packages, ["--no-cache-dir"], source="index")
+            )
+
+        # pip installs a batch all or nothing
+        for batch in batches:
+            for package in batch["packages"]:
+                timings[package]["failed"] = batch["failed"]
+        failed = [package for package, timing in timings.items() if timing.get("failed")]
+        if len(failed) == 0:
             self.logger.info(f"Packages {packages} installed successfully.")
+        installed = [package for package in packages if package not in failed]
+        if record and len(installed) > 0:
+            self.check_installed(installed, record=True)
+
+        manifest = read_venv_manifest(str(self.venv_path)) or dict()
+        manifest["install_timings"] = {
+            **manifest.get("install_timings", dict()),
+            **timings,
+        }
+        manifest["install_batches"] = (manifest.get("install_batches", []) + batches)[
+            -INSTALL_BATCH_HISTORY:
+        ]
+        if shared and len(failed) == 0:
+            manifest["sealed"] = datetime.now(timezone.utc).isoformat()
+        write_venv_manifest(str(self.venv_path), manifest)
+        return linked + packages
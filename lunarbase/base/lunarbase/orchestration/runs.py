@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import contextlib
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+ACTIVE_MARKER = "active"
+
+
+def new_run_id():
+    # Sorts by start time
+    return f"{time.time_ns()}-{uuid4().hex[:8]}"
+
+
+class RunDirectory:
+    """
+    Scratch directory of a single run, holding its workflow/component json, its result file and its
+    log, so that runs of the same workflow never share files.
+    """
+
+    LOG_NAME = "run.log"
+    RESULT_NAME = "result.lunar"
+
+    def __init__(self, root: str, run_id: Optional[str] = None):
+        self.run_id = run_id or new_run_id()
+        self.path = Path(root, self.run_id)
+        self._lock = threading.Lock()
+
+    @property
+    def result_path(self):
+        return str(Path(self.path, self.RESULT_NAME))
+
+    def open(self):
+        self.path.mkdir(parents=True, exist_ok=False)
+        Path(self.path, ACTIVE_MARKER).write_text(str(os.getpid()))
+        self.log(f"Run {self.run_id} started")
+
+    def close(self):
+        Path(self.path, ACTIVE_MARKER).unlink(missing_ok=True)
+
+    def log(self, message: str):
+        timestamp = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        with self._lock:
+            with open(Path(self.path, self.LOG_NAME), "a") as log_file:
+                log_file.write(f"{timestamp} {message}\n")
+
+
+def is_active(run_path: Path):
+    try:
+        pid = int(Path(run_path, ACTIVE_MARKER).read_text())
+    except (OSError, ValueError):
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        # Left behind by a process that died mid-run
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect_run_garbage(root: str, retention: int):
+    """
+    Keeps the directories of the last `retention` runs, and of any run still going on.
+    """
+    if retention <= 0 or not Path(root).is_dir():
+        return
+    runs = sorted(
+        (run for run in Path(root).iterdir() if run.is_dir()),
+        key=lambda run: run.name,
+        reverse=True,
+    )
+    for run in runs[retention:]:
+        if not is_active(run):
+            shutil.rmtree(run, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def run_directory(root: str, retention: int):
+    run = RunDirectory(root)
+    run.open()
+    try:
+        yield run
+    except Exception as e:
+        run.log(f"Run failed: {str(e)}")
+        raise
+    else:
+        run.log("Run finished")
+    finally:
+        run.close()
+        collect_run_garbage(root, retention)
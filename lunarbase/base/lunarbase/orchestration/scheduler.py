@@ -0,0 +1,46 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from collections import deque
+from typing import Iterable, List, Optional
+
+import networkx as nx
+
+from lunarbase.components.errors import ComponentError
+
+
+def topological_order(dag: nx.MultiDiGraph, known: Optional[Iterable[str]] = None):
+    """
+    Orders the DAG nodes so that every node comes right after all of its predecessors (Kahn's algorithm).
+    Ties keep the node insertion order. Cycles and edges to unknown nodes are reported up front.
+    """
+    if known is not None:
+        known = set(known)
+        unknown = [node for node in dag.nodes if node not in known]
+        if len(unknown) > 0:
+            raise ComponentError(
+                f"Dependencies reference unknown components: {', '.join(map(str, unknown))}!"
+            )
+
+    in_degree = {node: dag.in_degree(node) for node in dag.nodes}
+    ready = deque([node for node, degree in in_degree.items() if degree == 0])
+    order: List[str] = []
+    while len(ready) > 0:
+        node = ready.popleft()
+        order.append(node)
+        for successor in dag.successors(node):
+            # MultiDiGraph successors are unique, but in_degree counts every parallel edge
+            in_degree[successor] -= dag.number_of_edges(node, successor)
+            if in_degree[successor] == 0:
+                ready.append(successor)
+
+    if len(order) < dag.number_of_nodes():
+        try:
+            cycle = [edge[0] for edge in nx.find_cycle(dag)]
+        except nx.NetworkXNoCycle:
+            cycle = [node for node in dag.nodes if in_degree[node] > 0]
+        raise ComponentError(
+            f"Workflow dependencies contain a cycle: {' -> '.join(map(str, cycle + cycle[:1]))}!"
+        )
+    return order
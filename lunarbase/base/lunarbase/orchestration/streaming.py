@@ -0,0 +1,113 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import queue
+import threading
+from typing import Callable, Dict, Iterable, List
+
+STREAM_END = object()
+PUBLISH_TIMEOUT = 0.1
+
+
+class StreamFailure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class StreamSubscription:
+    """
+    One consumer's view of a stream. Items are pulled from a bounded queue, so a slow consumer
+    holds the producer back instead of letting items pile up in memory.
+    """
+
+    def __init__(self, channel: "StreamChannel", maxsize: int):
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=max(1, maxsize))
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        self.channel.start()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is STREAM_END:
+                    return
+                if isinstance(item, StreamFailure):
+                    raise item.error
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        # Closed subscriptions are skipped by the producer, so an abandoned consumer never blocks it
+        self.closed.set()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+class StreamChannel:
+    """
+    Runs a producer on its own thread and fans every item out to all subscriptions (tee).
+    Production starts once the expected number of consumers have subscribed, so none of them misses items.
+    """
+
+    def __init__(self, source: Callable[[], Iterable], expected: int = 1, maxsize: int = 16):
+        self.source = source
+        self.expected = max(1, expected)
+        self.maxsize = maxsize
+        self.subscriptions: List[StreamSubscription] = []
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def subscribe(self):
+        with self._condition:
+            subscription = StreamSubscription(self, self.maxsize)
+            self.subscriptions.append(subscription)
+            self._condition.notify_all()
+        return subscription
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._produce, name="lunar-stream-producer", daemon=True
+            )
+        self._thread.start()
+
+    def _produce(self):
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.subscriptions) >= self.expected)
+        try:
+            for item in self.source():
+                if all(subscription.closed.is_set() for subscription in self.subscriptions):
+                    return
+                self._publish(item)
+        except Exception as e:
+            self._publish(StreamFailure(e))
+            return
+        self._publish(STREAM_END)
+
+    def _publish(self, item):
+        for subscription in self.subscriptions:
+            while not subscription.closed.is_set():
+                try:
+                    subscription.queue.put(item, timeout=PUBLISH_TIMEOUT)
+                    break
+                except queue.Full:
+                    continue
+
+
+def tee(source: Callable[[], Iterable], n: int, maxsize: int = 16):
+    channel = StreamChannel(source, expected=n, maxsize=maxsize)
+    return [channel.subscribe() for _ in range(n)]
+
+
+def close_subscriptions(promises: Dict):
+    for subscription in promises.values():
+        if isinstance(subscription, StreamSubscription):
+            subscription.close()
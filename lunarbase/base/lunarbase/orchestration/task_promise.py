@@ -2,19 +2,44 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import time
 import types
-from typing import Any
+from typing import Any, Callable, Optional
 
 
+from lunarbase.components.artifacts import resolve_artifact
 from lunarbase.components.component_wrapper import ComponentWrapper
 from lunarbase.components.errors import ComponentError
+from lunarbase.modeling.data_models import ComponentModel
+from lunarbase.orchestration.streaming import StreamChannel
 
 
 class TaskPromise:
-    def __init__(self, component: ComponentWrapper):
+    """
+    A STREAM producer. Its items are produced once, on a separate thread, and tee'd to every
+    consumer through its own bounded queue (see `subscribe`).
+    """
+
+    def __init__(
+        self,
+        component: ComponentWrapper,
+        on_item: Optional[Callable[[int, float, ComponentModel], Any]] = None,
+        consumers: int = 1,
+        maxsize: int = 16,
+        prepare: Optional[Callable[[], Any]] = None,
+    ):
         self.component = component
+        self.on_item = on_item
+        # Called on the producer thread before the component runs, e.g. to wire upstream inputs
+        self.prepare = prepare
+        self.channel = StreamChannel(self.run, expected=consumers, maxsize=maxsize)
+
+    def subscribe(self):
+        return self.channel.subscribe()
 
     def run(self, **inputs: Any):
+        if self.prepare is not None:
+            self.prepare()
         model_inputs = {inp.key: inp for inp in self.component.component_model.inputs}
         for in_name, in_value in inputs.items():
             try:
@@ -24,15 +49,22 @@ class TaskPromise:
                     f"No such input named {in_name} for component {self.component.component_model.label}!"
                 )
 
-        run_inputs = {key: value.value for key, value in model_inputs.items()}
+        run_inputs = {key: resolve_artifact(value.value) for key, value in model_inputs.items()}
         self.component.set_inputs(**run_inputs)
 
-        run_output = self.component.run(**run_inputs)
+        start = time.perf_counter()
+        try:
+            run_output = self.component.run(**run_inputs)
 
-        if not isinstance(run_output, types.GeneratorType):
-            self.component.set_output(run_output)
-            yield self.component.component_model
-        else:
-            for result in run_output:
+            if not isinstance(run_output, types.GeneratorType):
+                run_output = [run_output]
+            for index, result in enumerate(run_output):
                 self.component.set_output(result)
-                yield self.component.component_model
+                # Consumers read items after the producer has moved on, so each one gets its own output
+                item = self.component.component_model.model_copy()
+                item.output = self.component.component_model.output.model_copy()
+                if self.on_item is not None:
+                    self.on_item(index, time.perf_counter() - start, item)
+                yield item
+        finally:
+            self.component.release_instance()
@@ -0,0 +1,213 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from lunarbase.config import LunarConfig
+from lunarbase.orchestration.worker_pool import discard_worker_pool
+from lunarbase.utils import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = setup_logger("venv-cache")
+
+
+def _is_alive(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class VenvCache:
+    """
+    Virtual environments keyed by the hash of their resolved dependency set.
+    A venv is built once and then shared by every workflow (owner) resolving to the same dependencies.
+    Unreferenced venvs are garbage collected in least recently used order. Refreshing moves to a
+    new generation of the venv, used by later acquires of the same dependency set.
+    """
+
+    INDEX_NAME = "index.json"
+    LOCK_NAME = "index.lock"
+
+    def __init__(self, config: Union[str, Dict, LunarConfig]):
+        self._config = config
+        if isinstance(self._config, str):
+            self._config = LunarConfig.get_config(settings_file_path=config)
+        elif isinstance(self._config, dict):
+            self._config = LunarConfig.parse_obj(config)
+        self._root = self._config.VENV_CACHE_PATH
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def dependency_hash(dependencies: List[str]):
+        normalized = sorted({str(dep).strip() for dep in dependencies if str(dep).strip()})
+        return hashlib.sha256("\n".join(normalized).encode("utf-8")).hexdigest()[:32]
+
+    def get_venv_path(self, digest: str):
+        return str(Path(self._root, digest))
+
+    @staticmethod
+    def _venv_key(index: Dict, digest: str):
+        generation = index["generations"].get(digest, 0)
+        return digest if generation == 0 else f"{digest}-{generation}"
+
+    def acquire(
+        self, dependencies: List[str], owner: Optional[str] = None, run: Optional[str] = None
+    ):
+        """
+        Returns the venv of the dependencies, referenced by the owner (a workflow) and, until
+        release_run, by the run using it.
+        """
+        with self._locked():
+            index = self._read_index()
+            digest = self._venv_key(index, self.dependency_hash(dependencies))
+            previous = index["owners"].get(owner) if owner is not None else None
+            if owner is not None:
+                index["owners"][owner] = digest
+            if run is not None:
+                index["runs"][run] = {"venv": digest, "pid": os.getpid()}
+            index["last_used"][digest] = time.time()
+            self._write_index(index)
+
+        if previous is not None and previous != digest:
+            self.collect_garbage()
+        return self.get_venv_path(digest)
+
+    def release(self, owner: str):
+        with self._locked():
+            index = self._read_index()
+            released = index["owners"].pop(owner, None)
+            self._write_index(index)
+        if released is not None:
+            self.collect_garbage()
+        return released
+
+    def refresh(self, owner: str):
+        """
+        Moves the owner to a new generation of its venv. The previous one is left to garbage collection,
+        runs still using it are not disturbed.
+        """
+        with self._locked():
+            index = self._read_index()
+            previous = index["owners"].get(owner)
+            if previous is None:
+                return None
+            digest = previous.split("-", maxsplit=1)[0]
+            index["generations"][digest] = index["generations"].get(digest, 0) + 1
+            key = self._venv_key(index, digest)
+            index["owners"][owner] = key
+            index["last_used"][key] = time.time()
+            self._write_index(index)
+
+        self.collect_garbage()
+        return self.get_venv_path(key)
+
+    def release_run(self, run: str):
+        with self._locked():
+            index = self._read_index()
+            released = index["runs"].pop(run, None)
+            self._write_index(index)
+        if released is not None:
+            self.collect_garbage()
+        return released
+
+    def owned_venv(self, owner: str):
+        digest = self._read_index()["owners"].get(owner)
+        if digest is None:
+            return None
+        return self.get_venv_path(digest)
+
+    @staticmethod
+    def _count_references(index: Dict):
+        references = Counter(index["owners"].values())
+        # Runs of processes that died without releasing their venv do not hold it
+        references.update(
+            reference["venv"] for reference in index["runs"].values() if _is_alive(reference["pid"])
+        )
+        return references
+
+    def references(self):
+        return self._count_references(self._read_index())
+
+    def collect_garbage(self):
+        with self._locked():
+            index = self._read_index()
+            index["runs"] = {
+                run: reference
+                for run, reference in index["runs"].items()
+                if _is_alive(reference["pid"])
+            }
+            references = self._count_references(index)
+            unused = sorted(
+                [
+                    digest
+                    for digest in index["last_used"]
+                    if references.get(digest, 0) == 0
+                ],
+                key=lambda digest: index["last_used"][digest],
+                reverse=True,
+            )
+            removed = unused[self._config.VENV_CACHE_MAX_UNUSED:]
+            for digest in removed:
+                index["last_used"].pop(digest, None)
+            self._write_index(index)
+
+        for digest in removed:
+            venv_path = self.get_venv_path(digest)
+            discard_worker_pool(venv_path)
+            shutil.rmtree(venv_path, ignore_errors=True)
+            logger.info(f"Removed unused virtual environment {venv_path}.")
+        return removed
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # The index is shared with CLI runs and the other server processes, not only with this one's threads
+        Path(self._root).mkdir(parents=True, exist_ok=True)
+        with self._lock, open(str(Path(self._root, self.LOCK_NAME)), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def is_shared(self, venv_path: str):
+        return Path(venv_path).parent == Path(self._root)
+
+    def _read_index(self):
+        try:
+            with open(str(Path(self._root, self.INDEX_NAME)), "r") as index_file:
+                index = json.load(index_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = dict()
+        index.setdefault("owners", dict())
+        index.setdefault("last_used", dict())
+        index.setdefault("runs", dict())
+        index.setdefault("generations", dict())
+        return index
+
+    def _write_index(self, index: Dict):
+        Path(self._root).mkdir(parents=True, exist_ok=True)
+        index_path = Path(self._root, self.INDEX_NAME)
+        tmp_path = Path(self._root, f"{self.INDEX_NAME}.{os.getpid()}.tmp")
+        with open(str(tmp_path), "w") as index_file:
+            json.dump(index, index_file, indent=2)
+        os.replace(str(tmp_path), str(index_path))
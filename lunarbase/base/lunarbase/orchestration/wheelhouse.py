@@ -0,0 +1,105 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from requirements.parser import parse
+
+WHEELHOUSE_LOCKS: Dict[str, asyncio.Lock] = dict()
+INSTALL_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[int, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_install_semaphore(size: int):
+    """
+    Bounds the number of pip processes (wheel builds and installs) running at once. Semaphores are bound
+    to an event loop, so there is one per loop, replaced when the configured size changes.
+    """
+    loop = asyncio.get_running_loop()
+    size = max(1, size)
+    current = INSTALL_SEMAPHORES.get(loop)
+    if current is None or current[0] != size:
+        current = (size, asyncio.Semaphore(size))
+        INSTALL_SEMAPHORES[loop] = current
+    return current[1]
+
+
+def pinned_requirement(requirement: str) -> Optional[str]:
+    """
+    The normalized `name==version` of a requirement pinned to a single version, None otherwise.
+    """
+    try:
+        (parsed,) = list(parse(requirement))
+    except Exception:
+        return None
+    if parsed.name is None or len(parsed.specs or []) != 1 or parsed.extras:
+        return None
+    operator, version = parsed.specs[0]
+    if operator not in ["==", "==="] or "*" in version:
+        return None
+    return f"{parsed.name.lower().replace('_', '-')}=={version}"
+
+
+class Wheelhouse:
+    """
+    Local directory of wheels built or downloaded once and installed with
+    `--no-index --find-links` into any venv afterwards.
+    Builds are keyed by `name==version` for pinned requirements and reused for good. Any other
+    requirement may resolve to a newer release over time, so its build is only reused for `unpinned_ttl`
+    seconds and then rebuilt, picking up newer releases from the index.
+    """
+
+    INDEX_NAME = "wheelhouse.json"
+
+    def __init__(self, path: str, unpinned_ttl: int = 0):
+        self.path = str(path)
+        self.unpinned_ttl = unpinned_ttl
+        self._index_lock = threading.Lock()
+        Path(self.path).mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(requirement: str):
+        return pinned_requirement(requirement) or requirement.strip()
+
+    def get_lock(self, requirement: str):
+        return WHEELHOUSE_LOCKS.setdefault(
+            f"{self.path}::{self.key(requirement)}", asyncio.Lock()
+        )
+
+    def lookup(self, requirement: str):
+        entry = self._read_index().get(self.key(requirement))
+        if entry is None or pinned_requirement(requirement) is not None:
+            return entry
+        if time.time() - entry.get("timestamp", 0) > self.unpinned_ttl:
+            return None
+        return entry
+
+    def record(self, requirement: str, seconds: float):
+        with self._index_lock:
+            index = self._read_index()
+            index[self.key(requirement)] = {
+                "built": datetime.now(timezone.utc).isoformat(),
+                "timestamp": time.time(),
+                "seconds": round(seconds, 3),
+            }
+            tmp_path = Path(self.path, f"{self.INDEX_NAME}.{os.getpid()}.tmp")
+            with open(str(tmp_path), "w") as index_file:
+                json.dump(index, index_file, indent=2)
+            os.replace(str(tmp_path), str(Path(self.path, self.INDEX_NAME)))
+
+    def _read_index(self):
+        try:
+            with open(str(Path(self.path, self.INDEX_NAME)), "r") as index_file:
+                return json.load(index_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict()
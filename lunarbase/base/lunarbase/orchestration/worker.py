@@ -0,0 +1,103 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import contextlib
+import importlib
+import os
+import sys
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional
+
+from lunarbase.orchestration.channel import read_frame, write_frame
+
+
+@contextlib.contextmanager
+def run_environment(environment: Dict):
+    previous = {key: os.environ.get(key) for key in environment}
+    os.environ.update(
+        {key: str(value) for key, value in environment.items() if value is not None}
+    )
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def registry_mtime(registry_path: str) -> Optional[float]:
+    try:
+        return Path(registry_path).stat().st_mtime
+    except OSError:
+        return None
+
+
+def serve(requests: BinaryIO, responses: BinaryIO):
+    # Imported here so that anything printed at import time ends up on stderr
+    from lunarbase import LUNAR_CONTEXT
+    from lunarbase.orchestration.engine import (
+        flush_component_results,
+        result_sink,
+        run_component_as_prefect_flow,
+        run_workflow_as_prefect_flow,
+    )
+    from lunarbase.utils import setup_logger
+
+    logger = setup_logger("workflow-worker")
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    registry = LUNAR_CONTEXT.lunar_registry
+    loaded_registry = registry_mtime(registry.config.REGISTRY_CACHE)
+    logger.info(f"Worker {os.getpid()} ready with {len(registry.components)} components.")
+
+    while True:
+        request = read_frame(requests)
+        if request is None:
+            break
+
+        current_registry = registry_mtime(registry.config.REGISTRY_CACHE)
+        if current_registry != loaded_registry:
+            registry.components = []
+            registry.load_cached_components()
+            loaded_registry = current_registry
+        importlib.invalidate_caches()
+
+        with run_environment(request.get("env") or dict()):
+            try:
+                with result_sink(request.get("result_path")):
+                    if request.get("component", False):
+                        result = loop.run_until_complete(
+                            run_component_as_prefect_flow(request["json_path"])
+                        )
+                    else:
+                        result = loop.run_until_complete(
+                            run_workflow_as_prefect_flow(
+                                request["json_path"],
+                                executor=request.get("executor"),
+                                artifact_path=request.get("artifact_path"),
+                                targets=request.get("targets"),
+                            )
+                        )
+                    flush_component_results(result)
+                response = {"event": "done"}
+            except Exception as e:
+                logger.error(f"Failed to run {request.get('json_path')}: {str(e)}", exc_info=True)
+                response = {"event": "error", "message": str(e)}
+
+        write_frame(responses, response)
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    # Responses go through the original stdout, everything else printed goes to stderr
+    response_stream = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    serve(sys.stdin.buffer, response_stream)
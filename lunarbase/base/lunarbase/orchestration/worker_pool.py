@@ -0,0 +1,287 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import os
+import signal
+import time
+from typing import Dict, List, Optional, Set
+
+from lunarbase.components.errors import ComponentError
+from lunarbase.orchestration.channel import encode_frame, read_frame_async
+from lunarbase.utils import setup_logger
+
+from lunarbase import LUNAR_CONTEXT
+
+WORKER_MODULE = "lunarbase.orchestration.worker"
+WORKER_STOP_TIMEOUT = 10
+
+logger = setup_logger("worker-pool")
+
+
+def create_worker_command(python_executable: str):
+    return [python_executable, "-m", WORKER_MODULE]
+
+
+class PoolWorker:
+    def __init__(self, process: asyncio.subprocess.Process, generation: int):
+        self.process = process
+        self.generation = generation
+        self.runs = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def alive(self):
+        return self.process.returncode is None
+
+    async def request(self, payload: Dict):
+        self.process.stdin.write(encode_frame(payload))
+        await self.process.stdin.drain()
+        response = await read_frame_async(self.process.stdout)
+        if response is None:
+            raise ComponentError(
+                f"Worker {self.process.pid} exited unexpectedly with code {self.process.returncode}!"
+            )
+        self.runs += 1
+        self.last_used = time.monotonic()
+        return response
+
+    def kill(self):
+        # For workers whose event loop is gone, so that they can no longer be awaited
+        try:
+            os.kill(self.process.pid, signal.SIGKILL)
+            os.waitpid(self.process.pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+    async def stop(self):
+        if not self.alive:
+            return
+        self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=WORKER_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+
+
+class WorkerPool:
+    """
+    Long-lived workflow workers bound to one virtual environment.
+    Workers import the engine and load the registry once, then execute the
+    workflow/component JSON files they receive over their stdin.
+    """
+
+    def __init__(
+        self,
+        command: List[str],
+        env: Dict[str, str],
+        working_dir: Optional[str] = None,
+        size: int = 2,
+        idle_timeout: int = 600,
+        max_runs: int = 100,
+    ):
+        self.command = command
+        self.env = env
+        self.working_dir = working_dir
+        self.size = max(1, size)
+        self.idle_timeout = idle_timeout
+        self.max_runs = max_runs
+
+        self.loop = asyncio.get_running_loop()
+        self._idle: List[PoolWorker] = []
+        self._busy: Set[PoolWorker] = set()
+        self._condition = asyncio.Condition()
+        self._generation = 0
+        # Workers being started, which count against the size while the lock is not held
+        self._spawning = 0
+        self._closed = False
+        self._reaper = self.loop.create_task(self._reap())
+
+    async def run(self, payload: Dict):
+        worker = await self._acquire()
+        try:
+            response = await worker.request(payload)
+        except BaseException:
+            # The request/response protocol is out of sync, so the worker cannot be reused
+            await self._discard(worker)
+            raise
+        await self._release(worker)
+        return response
+
+    async def recycle(self):
+        async with self._condition:
+            self._generation += 1
+            retired, self._idle = self._idle, []
+        for worker in retired:
+            await worker.stop()
+
+    async def evict_idle(self):
+        now = time.monotonic()
+        async with self._condition:
+            expired = [
+                worker
+                for worker in self._idle
+                if now - worker.last_used > self.idle_timeout
+            ]
+            self._idle = [worker for worker in self._idle if worker not in expired]
+        for worker in expired:
+            await worker.stop()
+
+    async def shutdown(self):
+        self._closed = True
+        self._reaper.cancel()
+        async with self._condition:
+            workers = self._idle + list(self._busy)
+            self._idle, self._busy = [], set()
+            self._condition.notify_all()
+        for worker in workers:
+            await worker.stop()
+
+    def kill(self):
+        """
+        Shuts the pool down from outside its event loop, e.g. once that loop is closed.
+        """
+        self._closed = True
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._reaper.cancel)
+        workers = self._idle + list(self._busy)
+        self._idle, self._busy = [], set()
+        for worker in workers:
+            worker.kill()
+
+    async def _acquire(self):
+        async with self._condition:
+            while True:
+                if self._closed:
+                    raise ComponentError("Worker pool is shut down!")
+                while len(self._idle) > 0:
+                    worker = self._idle.pop()
+                    if worker.alive:
+                        self._busy.add(worker)
+                        return worker
+                if len(self._busy) + self._spawning < self.size:
+                    self._spawning += 1
+                    break
+                await self._condition.wait()
+
+        # Started outside the lock, so that workers are spawned concurrently
+        try:
+            worker = await self._spawn()
+        except BaseException:
+            async with self._condition:
+                self._spawning -= 1
+                self._condition.notify()
+            raise
+        async with self._condition:
+            self._spawning -= 1
+            self._busy.add(worker)
+        return worker
+
+    async def _release(self, worker: PoolWorker):
+        retire = False
+        async with self._condition:
+            self._busy.discard(worker)
+            if (
+                self._closed
+                or not worker.alive
+                or worker.runs >= self.max_runs
+                or worker.generation != self._generation
+            ):
+                retire = True
+            else:
+                self._idle.append(worker)
+            self._condition.notify()
+        if retire:
+            await worker.stop()
+
+    async def _discard(self, worker: PoolWorker):
+        async with self._condition:
+            self._busy.discard(worker)
+            self._condition.notify()
+        if worker.alive:
+            worker.process.kill()
+            await worker.process.wait()
+
+    async def _spawn(self):
+        process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=self.env,
+            cwd=self.working_dir,
+        )
+        logger.info(f"Started workflow worker {process.pid} ({' '.join(self.command)}).")
+        return PoolWorker(process, generation=self._generation)
+
+    async def _reap(self):
+        while not self._closed:
+            await asyncio.sleep(max(1, self.idle_timeout // 2))
+            await self.evict_idle()
+
+
+WORKER_POOLS: Dict[str, WorkerPool] = dict()
+
+
+def get_worker_pool(
+    venv_path: str,
+    python_executable: str,
+    env: Optional[Dict] = None,
+    working_dir: Optional[str] = None,
+):
+    pool = WORKER_POOLS.get(str(venv_path))
+    if pool is not None and pool.loop is asyncio.get_running_loop():
+        return pool
+    if pool is not None:
+        # Left behind by another event loop, e.g. a previous asyncio.run of the CLI
+        retire_worker_pool(pool)
+
+    config = LUNAR_CONTEXT.lunar_config
+    pool_env = {**os.environ, **(env or dict())}
+    WORKER_POOLS[str(venv_path)] = WorkerPool(
+        command=create_worker_command(python_executable),
+        env={key: str(value) for key, value in pool_env.items() if value is not None},
+        working_dir=working_dir,
+        size=config.WORKER_POOL_SIZE,
+        idle_timeout=config.WORKER_POOL_IDLE_TIMEOUT,
+        max_runs=config.WORKER_POOL_MAX_RUNS,
+    )
+    return WORKER_POOLS[str(venv_path)]
+
+
+async def recycle_worker_pool(venv_path: str):
+    pool = WORKER_POOLS.get(str(venv_path))
+    if pool is not None:
+        await pool.recycle()
+
+
+def recycle_worker_pools():
+    """
+    Retires the workers of every pool from any thread, e.g. after component packages changed.
+    Busy workers are retired once their run is over.
+    """
+    for pool in list(WORKER_POOLS.values()):
+        if not pool.loop.is_closed():
+            asyncio.run_coroutine_threadsafe(pool.recycle(), pool.loop)
+
+
+def retire_worker_pool(pool: WorkerPool):
+    # A running loop shuts its pool down gracefully, the workers of any other loop are killed
+    if pool.loop.is_running() and not pool.loop.is_closed():
+        asyncio.run_coroutine_threadsafe(pool.shutdown(), pool.loop)
+    else:
+        pool.kill()
+
+
+def discard_worker_pool(venv_path: str):
+    pool = WORKER_POOLS.pop(str(venv_path), None)
+    if pool is not None:
+        retire_worker_pool(pool)
+
+
+async def shutdown_worker_pools():
+    pools = list(WORKER_POOLS.values())
+    WORKER_POOLS.clear()
+    for pool in pools:
+        await pool.shutdown()
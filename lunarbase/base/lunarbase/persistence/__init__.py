@@ -39,6 +39,8 @@ class PersistenceLayer:
 
         Path(self._config.USER_DATA_PATH).mkdir(parents=True, exist_ok=True)
         Path(self._config.BASE_VENV_PATH).mkdir(parents=True, exist_ok=True)
+        Path(self._config.VENV_CACHE_PATH).mkdir(parents=True, exist_ok=True)
+        Path(self._config.WHEELHOUSE_PATH).mkdir(parents=True, exist_ok=True)
         Path(self._config.INDEX_DIR_PATH).mkdir(parents=True, exist_ok=True)
         Path(self._config.INDEX_DIR_PATH, self._config.COMPONENT_INDEX_NAME).mkdir(
             parents=True, exist_ok=True
@@ -53,6 +55,9 @@ class PersistenceLayer:
     def get_user_tmp(self, user_id: str):
         return str(Path(self._config.USER_DATA_PATH, user_id, self._config.TMP_PATH))
 
+    def get_user_runs_path(self, user_id: str):
+        return str(Path(self.get_user_tmp(user_id), self._config.RUNS_PATH))
+
     def get_user_workflow_root(self, user_id: str):
         return str(
             Path(self._config.USER_DATA_PATH, user_id, self._config.USER_WORKFLOW_ROOT)
@@ -170,6 +175,15 @@ class PersistenceLayer:
             )
         )
 
+    def get_user_workflow_artifact_path(self, user_id: str, workflow_id: str):
+        return str(
+            Path(
+                self.get_user_workflow_root(user_id),
+                workflow_id,
+                self._config.ARTIFACT_PATH,
+            )
+        )
+
     def init_workflow_dirs(self, user_id: str, workflow_id: str):
         if self._config.LUNAR_STORAGE_TYPE != Storage.LOCAL:
             raise NotImplementedError("Only local storage is supported!")
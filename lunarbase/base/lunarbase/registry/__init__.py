@@ -7,19 +7,30 @@ import os
 import shutil
 import subprocess
 import sys
-import traceback
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 import warnings
 from pathlib import Path
-from typing import ClassVar, Dict, List, Optional, Union
+from typing import Callable, ClassVar, Dict, List, Optional, Tuple, Union
 
 from lunarbase.config import LunarConfig
 from lunarbase.controllers.datasource_controller import DatasourceController
 from lunarbase.controllers.llm_controller import LLMController
+from lunarbase.modeling.data_models import ComponentModel
 from lunarbase.registry.registry_models import RegisteredComponentModel, WorkflowRuntime
+from lunarbase.registry.snapshot import RegistrySnapshot
 from lunarbase.persistence import PersistenceLayer
 from lunarbase.utils import setup_logger
-from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    PrivateAttr,
+    field_validator,
+    model_validator,
+)
 from requirements.requirement import Requirement
 
 import json
@@ -27,6 +38,31 @@ import json
 REGISTRY_LOGGER = setup_logger("lunarbase-registry")
 
 CORE_COMPONENT_PATH = str(Path(Path(__file__).parent.parent.resolve(), "components"))
+# make_archive may change the working directory while archiving
+ARCHIVE_LOCK = threading.Lock()
+# Serializes in-place package updates, e.g. from the registry watcher
+PACKAGE_UPDATE_LOCK = threading.RLock()
+
+
+def timed(function: Callable, *args):
+    """
+    Returns the result of the call, or None and the error, and how long it took in seconds.
+    """
+    started = time.perf_counter()
+    try:
+        result, error = function(*args), None
+    except Exception as e:
+        result, error = None, str(e)
+    return result, error, round(time.perf_counter() - started, 3)
+
+
+def parse_package(zip_path: str, module_name: str):
+    registered_component = RegisteredComponentModel(
+        package_path=zip_path, module_name=module_name
+    )
+    # Cache the component_model
+    _ = registered_component.component_model
+    return registered_component
 
 
 class LunarRegistry(BaseModel):
@@ -57,6 +93,14 @@ class LunarRegistry(BaseModel):
     datasource_controller: Optional[DatasourceController] = None
     llm_controller: Optional[LLMController] = None
 
+    _snapshot: Optional[RegistrySnapshot] = PrivateAttr(default=None)
+    # Lookup indexes, kept up to date under PACKAGE_UPDATE_LOCK by the methods changing the component list
+    _by_class_name: Dict[str, RegisteredComponentModel] = PrivateAttr(default_factory=dict)
+    _by_module_name: Dict[str, RegisteredComponentModel] = PrivateAttr(default_factory=dict)
+    _by_component_id: Dict[str, RegisteredComponentModel] = PrivateAttr(default_factory=dict)
+    _sorted_models: Optional[List[ComponentModel]] = PrivateAttr(default=None)
+    _serialized_models: Optional[List[Dict]] = PrivateAttr(default=None)
+
     def get_workflow_runtime(self, workflow_id: str):
         for workflow in self.workflow_runtime:
             if workflow.workflow_id == workflow_id:
@@ -93,11 +137,93 @@ class LunarRegistry(BaseModel):
                 )
                 return
 
+    def reindex(self):
+        # Built aside and swapped in, so that concurrent lookups never see a half-filled index
+        with PACKAGE_UPDATE_LOCK:
+            indexes = (dict(), dict(), dict())
+            for registered_component in self.components:
+                self._index(registered_component, indexes)
+            self._by_class_name, self._by_module_name, self._by_component_id = indexes
+            self._sorted_models, self._serialized_models = None, None
+
+    def set_components(self, components: List[RegisteredComponentModel]):
+        # Assigning `components` directly would leave the indexes stale
+        with PACKAGE_UPDATE_LOCK:
+            self.components = components
+            self.reindex()
+
+    def _index(
+        self,
+        registered_component: RegisteredComponentModel,
+        indexes: Optional[Tuple[Dict, Dict, Dict]] = None,
+    ):
+        # The first registered component wins, as with the former linear scans
+        by_class_name, by_module_name, by_component_id = indexes or (
+            self._by_class_name,
+            self._by_module_name,
+            self._by_component_id,
+        )
+        component_model = registered_component.component_model
+        by_class_name.setdefault(component_model.class_name, registered_component)
+        by_module_name.setdefault(registered_component.module_name, registered_component)
+        by_component_id.setdefault(component_model.id, registered_component)
+
+    def add_component(self, registered_component: RegisteredComponentModel):
+        with PACKAGE_UPDATE_LOCK:
+            self.components.append(registered_component)
+            self._index(registered_component)
+            self._sorted_models, self._serialized_models = None, None
+
+    def unregister(self, module_name: str):
+        """
+        Removes the components of a package and returns them.
+        """
+        with PACKAGE_UPDATE_LOCK:
+            removed = [
+                registered_component
+                for registered_component in self.components
+                if registered_component.module_name == module_name
+            ]
+            if len(removed) > 0:
+                self.set_components(
+                    [
+                        registered_component
+                        for registered_component in self.components
+                        if registered_component.module_name != module_name
+                    ]
+                )
+        return removed
+
     def get_by_class_name(self, class_name: str):
-        for reg_comp in self.components:
-            if reg_comp.component_model.class_name == class_name:
-                return reg_comp
-        return None
+        return self._by_class_name.get(class_name)
+
+    def get_by_module_name(self, module_name: str):
+        return self._by_module_name.get(module_name)
+
+    def get_by_component_id(self, component_id: str):
+        return self._by_component_id.get(component_id)
+
+    def sorted_component_models(self):
+        """
+        Component models sorted by name, shared between calls: copy before changing the list.
+        """
+        if self._sorted_models is None:
+            self._sorted_models = sorted(
+                (registered_component.component_model for registered_component in self.components),
+                key=lambda component_model: component_model.name,
+            )
+        return self._sorted_models
+
+    def serialized_component_models(self):
+        """
+        JSON ready form of sorted_component_models, as returned by the API.
+        """
+        if self._serialized_models is None:
+            self._serialized_models = [
+                component_model.model_dump(mode="json", by_alias=True)
+                for component_model in self.sorted_component_models()
+            ]
+        return self._serialized_models
 
     @field_validator("config")
     @classmethod
@@ -120,46 +246,120 @@ class LunarRegistry(BaseModel):
         self.llm_controller = LLMController(
             config=self.config, persistence_layer=self.persistence_layer
         )
+        # Components given to the constructor
+        self.reindex()
         self.load_cached_components()
         return self
 
+    @property
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = RegistrySnapshot(self.config.REGISTRY_SNAPSHOT).load()
+        return self._snapshot
+
     def load_cached_components(self):
         if self.config is not None and len(self.components) == 0:
             REGISTRY_LOGGER.info(
                 f"Trying to load cached registry from {self.config.REGISTRY_CACHE} ..."
             )
+            started = time.perf_counter()
             try:
                 with open(self.config.REGISTRY_CACHE, "r") as fd:
                     persisted_model = json.load(fd)
 
-                self.components = []
+                self.set_components([])
+                parsed = 0
                 for persisted_component in persisted_model.get("components", []):
                     try:
-                        registered_component = RegisteredComponentModel.model_validate(
-                            persisted_component
+                        # Unchanged packages come parsed from the snapshot
+                        registered_component = self.snapshot.get(
+                            persisted_component.get("package_path"),
+                            persisted_component.get("module_name"),
                         )
-                        # Cache the component_model
-                        _ = registered_component.component_model
-                        self.components.append(registered_component)
+                        if registered_component is None:
+                            registered_component = RegisteredComponentModel.model_validate(
+                                persisted_component
+                            )
+                            # Cache the component_model
+                            _ = registered_component.component_model
+                            parsed += 1
+                        self.add_component(registered_component)
 
                     except ValueError as e:
                         REGISTRY_LOGGER.warn(
                             f"Failed to parse component {persisted_component}: {str(e)}! Skipping ..."
                         )
-                REGISTRY_LOGGER.info(f"Loaded {len(self.components)} components.")
+                REGISTRY_LOGGER.info(
+                    f"Loaded {len(self.components)} components ({parsed} parsed) "
+                    f"in {time.perf_counter() - started:.3f}s."
+                )
+                if parsed > 0:
+                    self.snapshot.save(self.components)
             except Exception as e:
                 REGISTRY_LOGGER.warn(
                     f"Failed to load registry components from persistence layer: {str(e)}!"
                 )
-                self.components = []
+                self.set_components([])
 
-    def register(self):
+    def download_package(self, component_line: str, component_req: Requirement):
+        """
+        Downloads or copies a package into the component library and returns the path of its zip.
+        """
         _root = self.config.COMPONENT_LIBRARY_PATH
-        if not Path(_root).is_dir():
-            raise ValueError(f"Component root: {_root} not found!")
-        REGISTRY_LOGGER.info(f"Running lunarverse registry ...")
+        REGISTRY_LOGGER.info(
+            f"Downloading component {component_req.name} @ {component_req.uri}"
+        )
+        if component_req.local_file:
+            register_command = self.__class__.REGISTER_COPY_COMMAND + [
+                component_req.path,
+                f"{_root}/{component_req.name}",
+            ]
+        else:
+            register_command = self.__class__.REGISTER_DOWNLOAD_COMMAND + [_root, component_line]
+
+        REGISTRY_LOGGER.debug(f"Calling {' '.join(register_command)} ...")
+        try:
+            _ = subprocess.run(
+                register_command,
+                capture_output=True,
+                text=True,
+                universal_newlines=True,
+                check=True,
+                timeout=self.config.REGISTRY_DOWNLOAD_TIMEOUT,
+            )
+        except subprocess.CalledProcessError as e:
+            raise ValueError(f"Download failed: {e.stderr} ({e.returncode})")
+        except subprocess.TimeoutExpired:
+            raise ValueError("Timeout expired")
+
+        if component_req.local_file:
+            with ARCHIVE_LOCK:
+                shutil.make_archive(f"{_root}/{component_req.name}", "zip", component_req.path)
+            shutil.rmtree(f"{_root}/{component_req.name}", ignore_errors=True)
+
+        # Only this package's archives, not those of packages sharing its name as a prefix
+        component_zip = [
+            zip_name
+            for zip_name in glob.glob(f"{component_req.name}*.zip", root_dir=_root)
+            if Path(zip_name).stem == component_req.name
+            or Path(zip_name).stem.startswith(f"{component_req.name}-")
+        ]
+        if len(component_zip) == 0:
+            raise ValueError("Unexpected package name")
 
-        registered_components = [component.module_name for component in self.components]
+        if len(component_zip) > 1:
+            warnings.warn(
+                f"Multiple version of component {component_req.name} detected: {component_zip}."
+                f"Only the most recent will be registered!"
+            )
+            component_zip.sort(key=lambda zip_name: os.path.getmtime(Path(_root, zip_name)), reverse=True)
+        return str(Path(_root, component_zip[0]))
+
+    def read_registry_file(self):
+        """
+        Parsed lines of the registry file, one per package name.
+        """
+        requirements = []
         with open(self.config.REGISTRY_FILE, "r") as fd:
             for component_line in fd:
                 component_line = component_line.strip()
@@ -169,7 +369,7 @@ class LunarRegistry(BaseModel):
                         component_req.path = urlparse(component_req.uri).path
                         if Path(component_req.path).exists():
                             component_req.name = Path(component_req.path).name
-                    if component_req.name in registered_components:
+                    if any(component_req.name == req.name for _, req in requirements):
                         continue
 
                 except ValueError:
@@ -178,86 +378,153 @@ class LunarRegistry(BaseModel):
                         f"Component will not be registered!"
                     )
                     continue
+                requirements.append((component_line, component_req))
+        return requirements
 
-                REGISTRY_LOGGER.info(
-                    f"Downloading component {component_req.name} @ {component_req.uri}"
-                )
-
-                try:
-                    if component_req.local_file:
-                        register_command = self.__class__.REGISTER_COPY_COMMAND + [
-                            component_req.path,
-                            f"{_root}/{component_req.name}",
-                        ]
-                    else:
-                        register_command = self.__class__.REGISTER_DOWNLOAD_COMMAND + [_root, component_line]
-
-                    REGISTRY_LOGGER.debug(f"Calling {' '.join(register_command)} ...")
-
-                    _ = subprocess.run(
-                        register_command,
-                        capture_output=True,
-                        text=True,
-                        universal_newlines=True,
-                        check=True,
-                    )
+    def is_library_package(self, registered_component: RegisteredComponentModel):
+        return Path(registered_component.package_path).parent == Path(
+            self.config.COMPONENT_LIBRARY_PATH
+        )
 
-                except subprocess.CalledProcessError as e:
-                    warnings.warn(
-                        f"Failed to download component {component_req.name} from {component_req.uri}: {e.stderr} ({e.returncode})."
-                        f"Component will not be registered!"
-                    )
-                    continue
-                except subprocess.TimeoutExpired:
-                    warnings.warn(
-                        f"Failed to download component {component_req.name} from {component_req.uri}: Timeout expired."
-                        f"Component will not be registered!"
-                    )
+    def reload_package(self, module_name: str):
+        """
+        Parses a registered package again, e.g. after its archive was replaced, and swaps its components
+        in place. Packages that are gone are unregistered, packages that fail to parse are kept as they
+        were. Returns the removed and the added components.
+        """
+        with PACKAGE_UPDATE_LOCK:
+            registered_component = self.get_by_module_name(module_name)
+            if registered_component is None:
+                return [], []
+            package_path = registered_component.package_path
+            if not Path(package_path).exists():
+                REGISTRY_LOGGER.info(f"Package {package_path} is gone, unregistering {module_name}.")
+                return self.unregister(module_name), []
+
+            reloaded, error, elapsed = timed(parse_package, package_path, module_name)
+            if reloaded is None:
+                REGISTRY_LOGGER.warn(
+                    f"Failed to reload component {module_name}: {error}. Keeping the registered version."
+                )
+                return [], []
+            removed = self.unregister(module_name)
+            self.add_component(reloaded)
+            self.snapshot.put(reloaded)
+            REGISTRY_LOGGER.info(f"Reloaded component {module_name} from {package_path} in {elapsed}s.")
+            return removed, [reloaded]
+
+    def sync_registry_file(self):
+        """
+        Registers the packages added to the registry file and unregisters the library packages removed
+        from it. Returns the removed and the added components.
+        """
+        with PACKAGE_UPDATE_LOCK:
+            requirements = self.read_registry_file()
+            listed = {component_req.name for _, component_req in requirements}
+            removed, added = [], []
+            for module_name in sorted(
+                {
+                    registered_component.module_name
+                    for registered_component in self.components
+                    if self.is_library_package(registered_component)
+                }
+                - listed
+            ):
+                REGISTRY_LOGGER.info(f"Component {module_name} left the registry file, unregistering it.")
+                removed.extend(self.unregister(module_name))
+
+            for component_line, component_req in requirements:
+                if self.get_by_module_name(component_req.name) is not None:
                     continue
+                zip_path, error, _ = timed(self.download_package, component_line, component_req)
+                if zip_path is not None:
+                    registered_component, error, _ = timed(parse_package, zip_path, component_req.name)
+                    if registered_component is not None:
+                        self.add_component(registered_component)
+                        self.snapshot.put(registered_component)
+                        added.append(registered_component)
+                        continue
+                    Path(zip_path).unlink(missing_ok=True)
+                warnings.warn(
+                    f"Failed to register component {component_req.name}: {error}."
+                    f"Component will not be registered!"
+                )
+            return removed, added
 
-                if component_req.local_file:
-                    shutil.make_archive(f"{_root}/{component_req.name}", "zip", component_req.path)
-                    shutil.rmtree(f"{_root}/{component_req.name}", ignore_errors=True)
-
-                component_zip = glob.glob(f"{component_req.name}*.zip", root_dir=_root)
-                if not component_zip or len(component_zip) == 0:
-                    warnings.warn(
-                        f"Failed to download component {component_req.name} from {component_req.uri}: Unexpected package name."
-                        f"Component will not be registered!"
-                    )
-                    continue
+    def register(self):
+        """
+        Downloads and parses the packages listed in the registry file concurrently. Components keep the
+        order of the file, so the persisted registry does not depend on which package finished first.
+        Returns the timings and errors of every package.
+        """
+        _root = self.config.COMPONENT_LIBRARY_PATH
+        if not Path(_root).is_dir():
+            raise ValueError(f"Component root: {_root} not found!")
+        REGISTRY_LOGGER.info(f"Running lunarverse registry ...")
 
-                if len(component_zip) > 1:
-                    warnings.warn(
-                        f"Multiple version of component {component_req.name} detected: {component_zip}."
-                        f"Only the most recent will be registered!"
-                    )
-                    component_zip.sort(key=os.path.getmtime, reverse=True)
-                component_zip = component_zip[0]
-                zip_path = str(Path(_root, component_zip))
+        registered_components = [component.module_name for component in self.components]
+        pending = [
+            (component_line, component_req)
+            for component_line, component_req in self.read_registry_file()
+            if component_req.name not in registered_components
+        ]
 
+        report = [
+            {"name": component_req.name, "download": None, "parse": None, "error": None}
+            for _, component_req in pending
+        ]
+        parsed: List[Optional[RegisteredComponentModel]] = [None] * len(pending)
+        with ThreadPoolExecutor(
+            max_workers=max(1, self.config.REGISTRY_DOWNLOAD_WORKERS),
+            thread_name_prefix="lunar-registry-download",
+        ) as download_pool, ThreadPoolExecutor(
+            max_workers=max(1, self.config.REGISTRY_PARSE_WORKERS),
+            thread_name_prefix="lunar-registry-parse",
+        ) as parse_pool:
+            downloads = {
+                download_pool.submit(
+                    timed, self.download_package, component_line, component_req
+                ): index
+                for index, (component_line, component_req) in enumerate(pending)
+            }
+            # Packages are parsed as soon as they are downloaded, while others are still downloading
+            parses = dict()
+            for future in as_completed(downloads):
+                index = downloads[future]
+                zip_path, report[index]["error"], report[index]["download"] = future.result()
+                if zip_path is None:
+                    continue
                 REGISTRY_LOGGER.info(
-                    f"Registering component {component_req.name} from {zip_path}"
+                    f"Registering component {report[index]['name']} from {zip_path}"
+                )
+                parses[parse_pool.submit(timed, parse_package, zip_path, pending[index][1].name)] = (
+                    index,
+                    zip_path,
                 )
-                try:
-                    registered_component = RegisteredComponentModel(
-                        package_path=zip_path, module_name=component_req.name
-                    )
-                    # Cache the component_model
-                    _ = registered_component.component_model
-                    self.components.append(registered_component)
 
-                except ValueError:
-                    warnings.warn(
-                        f"Failed to register external component in package {zip_path}! Details: {str(traceback.format_exc())}."
-                        f"Component will not be registered!"
-                    )
+            for future in as_completed(parses):
+                index, zip_path = parses[future]
+                parsed[index], report[index]["error"], report[index]["parse"] = future.result()
+                if parsed[index] is None:
                     Path(zip_path).unlink(missing_ok=True)
-                    continue
+
+        for package_report, registered_component in zip(report, parsed):
+            if registered_component is not None:
+                self.add_component(registered_component)
+            elif package_report["error"] is not None:
+                warnings.warn(
+                    f"Failed to register component {package_report['name']}: {package_report['error']}."
+                    f"Component will not be registered!"
+                )
+            REGISTRY_LOGGER.info(
+                f"Component {package_report['name']}: download {package_report['download']}s, "
+                f"parse {package_report['parse']}s"
+                + ("" if package_report["error"] is None else f", failed: {package_report['error']}")
+            )
 
         REGISTRY_LOGGER.info(f"Registered {len(self.components)} external components.")
 
-        for pkg in os.listdir(CORE_COMPONENT_PATH):
+        for pkg in sorted(os.listdir(CORE_COMPONENT_PATH)):
             pkg_path = Path(CORE_COMPONENT_PATH, pkg)
             if not pkg_path.is_dir():
                 continue
@@ -268,10 +535,11 @@ class LunarRegistry(BaseModel):
             if pkg in registered_components:
                 continue
 
-            self.components.append(
+            self.add_component(
                 RegisteredComponentModel(package_path=str(pkg_path), module_name=pkg)
             )
         self.save()
+        return report
 
     def save(self):
         _model = self.model_dump(
@@ -280,6 +548,7 @@ class LunarRegistry(BaseModel):
         saved_to = self.persistence_layer.save_to_storage_as_json(
             path=self.config.REGISTRY_CACHE, data=_model
         )
+        self.snapshot.save(self.components)
         return saved_to
 
     def get_component_names(self):
@@ -32,6 +32,16 @@ REQ_FILE_NAME = "requirements.txt"
 logger = setup_logger("registry")
 
 
+def get_class_path_candidates(module_name: str):
+    # Places of the component class in a package, in order of precedence
+    return [
+        str(Path(module_name, "src", module_name, "__init__.py")),
+        str(Path("src", module_name, "__init__.py")),
+        str(Path(module_name, "__init__.py")),
+        "__init__.py",
+    ]
+
+
 class RegisteredComponentModel(BaseModel):
     class Config:
         alias_generator = to_camel
@@ -61,12 +71,7 @@ class RegisteredComponentModel(BaseModel):
     def validate_module_name(cls, value, info: ValidationInfo):
         _package_path = info.data.get("package_path")
 
-        class_path_candidates = [
-            str(Path(value, "src", value, "__init__.py")),
-            str(Path("src", value, "__init__.py")),
-            str(Path(value, "__init__.py")),
-            "__init__.py",
-        ]
+        class_path_candidates = get_class_path_candidates(value)
 
         if zipfile.is_zipfile(_package_path):
             class_path = anyinzip(_package_path, class_path_candidates)
@@ -153,16 +158,11 @@ class RegisteredComponentModel(BaseModel):
     @computed_field(return_type=ComponentModel)
     @cached_property
     def component_model(self):
-        class_path_candidates = [
-            str(Path(self.module_name, "src", self.module_name, "__init__.py")),
-            str(Path("src", self.module_name, "__init__.py")),
-            str(Path(self.module_name, "__init__.py")),
-            "__init__.py",
-        ]
+        class_path_candidates = get_class_path_candidates(self.module_name)
         example_path = None
         if self.is_zip_package:
-            class_path = anyinzip(self.package_path, class_path_candidates)
             with zipfile.ZipFile(self.package_path) as z:
+                class_path = anyinzip(z, class_path_candidates)
                 source_code = z.read(class_path).decode("utf-8")
                 example = max(
                     (x for x in z.namelist() if x.endswith("example.json")),
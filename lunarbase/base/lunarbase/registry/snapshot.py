@@ -0,0 +1,138 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from lunarbase.modeling.data_models import ComponentModel, ComponentView
+from lunarbase.registry.registry_models import RegisteredComponentModel
+from lunarbase.utils import setup_logger
+
+logger = setup_logger("registry-snapshot")
+
+SNAPSHOT_VERSION = 1
+DIGEST_CHUNK_SIZE = 1 << 20
+
+
+def package_signature(package_path: str):
+    """
+    Size, modification time and content digest of a package archive or directory. The digest catches
+    changes that keep the modification time, e.g. `cp -a`.
+    """
+    path = Path(package_path)
+    digest = hashlib.blake2b(digest_size=16)
+    if path.is_dir():
+        files = sorted(
+            file
+            for file in path.rglob("*")
+            if file.is_file() and "__pycache__" not in file.parts
+        )
+    else:
+        files = [path]
+
+    size, mtime_ns = 0, 0
+    for file in files:
+        stat = file.stat()
+        size += stat.st_size
+        mtime_ns = max(mtime_ns, stat.st_mtime_ns)
+        digest.update(str(file.relative_to(path) if path.is_dir() else file.name).encode("utf-8"))
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    return {"size": size, "mtime_ns": mtime_ns, "digest": digest.hexdigest()}
+
+
+def snapshot_entry(registered_component: RegisteredComponentModel):
+    """
+    Parses the package, if not done yet, into a JSON serializable entry.
+    """
+    return {
+        "module_name": registered_component.module_name,
+        "signature": package_signature(registered_component.package_path),
+        "component_requirements": list(registered_component.component_requirements),
+        "component_model": json.loads(
+            registered_component.component_model.model_dump_json(by_alias=True)
+        ),
+        "view": json.loads(registered_component.view.model_dump_json(by_alias=True)),
+    }
+
+
+def component_from_entry(package_path: str, entry: Dict):
+    registered_component = RegisteredComponentModel.model_construct(
+        package_path=package_path,
+        module_name=entry["module_name"],
+        component_requirements=entry["component_requirements"],
+    )
+    # Fills the cached properties so that the package is never parsed again
+    registered_component.__dict__["component_model"] = ComponentModel.model_validate(
+        entry["component_model"]
+    )
+    registered_component.__dict__["view"] = ComponentView.model_validate(entry["view"])
+    return registered_component
+
+
+class RegistrySnapshot:
+    """
+    Parsed component models, views and requirements of the registered packages, keyed by package path
+    and valid for as long as the package signature does not change. Unchanged packages are loaded from
+    here without opening archives or parsing sources.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = dict()
+        # Packages whose entry was checked or written in this process
+        self.verified: Set[str] = set()
+
+    def load(self):
+        self.entries = dict()
+        if not self.path.is_file():
+            return self
+        try:
+            with open(self.path, "r") as fd:
+                snapshot = json.load(fd)
+            if snapshot.get("version") == SNAPSHOT_VERSION:
+                self.entries = snapshot.get("packages", dict())
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable registry snapshot {self.path}: {str(e)}")
+        return self
+
+    def get(self, package_path: str, module_name: str) -> Optional[RegisteredComponentModel]:
+        entry = self.entries.get(package_path)
+        if entry is None or entry.get("module_name") != module_name:
+            return None
+        try:
+            if package_signature(package_path) != entry["signature"]:
+                return None
+            registered_component = component_from_entry(package_path, entry)
+        except Exception as e:
+            logger.debug(f"Stale snapshot entry for {package_path}: {str(e)}")
+            return None
+        self.verified.add(package_path)
+        return registered_component
+
+    def put(self, registered_component: RegisteredComponentModel):
+        try:
+            self.entries[registered_component.package_path] = snapshot_entry(registered_component)
+            self.verified.add(registered_component.package_path)
+        except Exception as e:
+            logger.warning(
+                f"Component {registered_component.module_name} left out of the registry snapshot: {str(e)}"
+            )
+
+    def save(self, registered_components: List[RegisteredComponentModel]):
+        paths = {component.package_path for component in registered_components}
+        self.entries = {path: entry for path, entry in self.entries.items() if path in paths}
+        for registered_component in registered_components:
+            if registered_component.package_path not in self.verified:
+                self.put(registered_component)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as fd:
+            json.dump({"version": SNAPSHOT_VERSION, "packages": self.entries}, fd)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,128 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lunarbase.registry.registry_models import RegisteredComponentModel
+from lunarbase.utils import setup_logger
+
+logger = setup_logger("registry-watcher")
+
+
+def path_stat(path: str) -> Optional[Tuple]:
+    """
+    Size and modification time of a file, or of the files of a directory. None if the path is gone.
+    """
+    path = Path(path)
+    try:
+        if path.is_dir():
+            stats = [
+                file.stat()
+                for file in path.rglob("*")
+                if file.is_file() and "__pycache__" not in file.parts
+            ]
+            return (
+                len(stats),
+                sum(stat.st_size for stat in stats),
+                max((stat.st_mtime_ns for stat in stats), default=0),
+            )
+        stat = path.stat()
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return None
+
+
+class RegistryWatcher:
+    """
+    Polls the registry file and the packages of the component library, and registers, updates or
+    unregisters the packages that changed in place, without restarting the server. `on_change` gets the
+    removed and the added components once the registry is saved.
+    """
+
+    def __init__(
+        self,
+        registry,
+        interval: float,
+        on_change: Optional[
+            Callable[[List[RegisteredComponentModel], List[RegisteredComponentModel]], Any]
+        ] = None,
+    ):
+        self.registry = registry
+        self.interval = interval
+        self.on_change = on_change
+        self._stats = self.scan()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def scan(self) -> Dict[str, Optional[Tuple]]:
+        stats = {self.registry.config.REGISTRY_FILE: path_stat(self.registry.config.REGISTRY_FILE)}
+        for registered_component in self.registry.components:
+            if self.registry.is_library_package(registered_component):
+                stats[registered_component.package_path] = path_stat(
+                    registered_component.package_path
+                )
+        return stats
+
+    def poll(self):
+        """
+        Applies the changes made since the previous poll and returns the removed and added components.
+        """
+        stats = self.scan()
+        removed, added = [], []
+        changed_modules = sorted(
+            {
+                registered_component.module_name
+                for registered_component in self.registry.components
+                if registered_component.package_path in self._stats
+                and stats.get(registered_component.package_path)
+                != self._stats[registered_component.package_path]
+            }
+        )
+        for module_name in changed_modules:
+            package_removed, package_added = self.registry.reload_package(module_name)
+            removed.extend(package_removed)
+            added.extend(package_added)
+
+        registry_file = self.registry.config.REGISTRY_FILE
+        if stats[registry_file] != self._stats.get(registry_file):
+            package_removed, package_added = self.registry.sync_registry_file()
+            removed.extend(package_removed)
+            added.extend(package_added)
+
+        # Stats taken before the changes were applied, so that files written meanwhile are seen next time
+        self._stats = {**self.scan(), **stats}
+
+        if len(removed) > 0 or len(added) > 0:
+            self.registry.save()
+            logger.info(
+                f"Registry updated: {len(removed)} component(s) removed, {len(added)} added."
+            )
+            if self.on_change is not None:
+                self.on_change(removed, added)
+        return removed, added
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return self
+        self._thread = threading.Thread(
+            target=self._run, name="lunar-registry-watcher", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Watching component packages every {self.interval}s.")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Failed to update the registry: {str(e)}", exc_info=True)
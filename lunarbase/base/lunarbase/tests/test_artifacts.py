@@ -0,0 +1,102 @@
+import asyncio
+import copy
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lunarbase.components.artifacts import (
+    ArtifactHandle,
+    ArtifactStore,
+    artifact_available,
+    artifact_store,
+    get_artifact_store,
+    resolve_artifact,
+)
+from lunarbase.orchestration.channel import ResultReader, ResultWriter
+from lunarbase.orchestration.engine import resolve_result_artifacts
+from lunarbase.orchestration.executor import LocalExecutor
+
+
+def test_large_outputs_are_stored_once_and_mapped_back(tmp_path):
+    store = ArtifactStore(str(tmp_path), min_size=1024, retention=2)
+    small, large = np.arange(10), np.arange(100_000, dtype=np.float64)
+
+    assert store.externalize("small", small) is small
+    handle = store.externalize("large", large)
+    assert isinstance(handle, ArtifactHandle)
+
+    # Handles travel without their data
+    assert len(pickle.dumps(handle)) < 1024
+    restored = resolve_artifact(copy.deepcopy(handle))
+    assert isinstance(restored, np.memmap)
+    assert np.array_equal(restored, large)
+
+
+def test_equal_outputs_share_a_digest(tmp_path):
+    value = np.ones(10_000)
+    first = ArtifactStore(str(tmp_path), min_size=0, retention=0).externalize("a", value)
+    second = ArtifactStore(str(tmp_path), min_size=0, retention=0).externalize("b", value)
+    assert first.path != second.path
+    assert first.describe() == second.describe()
+
+
+def test_old_runs_are_collected(tmp_path):
+    for _ in range(4):
+        with artifact_store(str(tmp_path), min_size=0, retention=2) as store:
+            store.externalize("output", np.zeros(16))
+    assert len([run for run in Path(tmp_path).iterdir() if run.is_dir()]) == 2
+
+
+def test_artifacts_of_earlier_runs_are_adopted(tmp_path):
+    handle = ArtifactStore(str(tmp_path), min_size=0, retention=0).externalize("a", np.ones(16))
+    store = ArtifactStore(str(tmp_path), min_size=0, retention=0)
+    adopted = store.adopt("b", handle)
+    assert Path(adopted.path).parent == store.run_path
+    assert adopted.describe() == handle.describe()
+
+    Path(handle.path).unlink()
+    assert not artifact_available(handle)
+    assert artifact_available(adopted)
+    assert np.array_equal(resolve_artifact(adopted), np.ones(16))
+
+
+def test_loaded_arrays_are_copy_on_write(tmp_path):
+    handle = ArtifactStore(str(tmp_path), min_size=0, retention=0).externalize("a", np.zeros(16))
+    value = resolve_artifact(handle)
+    value[0] = 1.0
+    assert value[0] == 1.0
+    assert np.array_equal(np.load(handle.path), np.zeros(16))
+
+
+@pytest.mark.parametrize("encoding", ["json", "pickle"])
+def test_results_cross_the_channel_as_handles(tmp_path, encoding):
+    handle = ArtifactStore(str(tmp_path), min_size=0, retention=0).externalize("a", np.arange(4))
+    result_path = str(Path(tmp_path, "result.lunar"))
+    writer = ResultWriter(result_path, encoding=encoding)
+    writer.emit("a", {"label": "a", "output": {"data_type": "ANY", "value": handle}})
+    writer.close()
+
+    (frame,) = ResultReader(result_path).read_available()
+    received = frame["result"]["output"]["value"]
+    assert isinstance(received, ArtifactHandle)
+    assert received.path == handle.path and received.describe() == handle.describe()
+    value = resolve_result_artifacts(frame["result"])["output"]["value"]
+    assert list(value) == [0, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_keep_their_own_store(tmp_path):
+    executor = LocalExecutor(kind="thread", max_workers=2)
+    both_started = asyncio.Barrier(2)
+
+    async def run(name: str):
+        with artifact_store(str(Path(tmp_path, name)), min_size=0, retention=1) as store:
+            await both_started.wait()
+            assert await executor._run_in_pool(executor.pool, get_artifact_store) is store
+            assert await asyncio.to_thread(get_artifact_store) is store
+            assert get_artifact_store() is store
+
+    await asyncio.gather(run("first"), run("second"))
+    assert get_artifact_store() is None
@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from lunarbase.components.async_runtime import resolve_run_result
+from lunarbase.components.mapping import run_mapped
+
+
+class AsyncEcho:
+    max_concurrency = 5
+    running = 0
+    peak = 0
+
+    async def run(self, value):
+        AsyncEcho.running += 1
+        AsyncEcho.peak = max(AsyncEcho.peak, AsyncEcho.running)
+        await asyncio.sleep(0.05)
+        AsyncEcho.running -= 1
+        if value < 0:
+            raise ValueError("negative")
+        return value * 2
+
+
+def test_async_run_is_awaited():
+    component = AsyncEcho()
+    assert resolve_run_result(component, component.run(value=2)) == 4
+
+
+def test_async_mapped_runs_share_the_loop_within_the_class_limit():
+    AsyncEcho.peak = 0
+    items = [{"value": v} for v in range(20)]
+    start = time.perf_counter()
+    results, errors = run_mapped(AsyncEcho(), {}, items)
+    elapsed = time.perf_counter() - start
+
+    assert errors == []
+    assert results == [v * 2 for v in range(20)]
+    assert AsyncEcho.peak == AsyncEcho.max_concurrency
+    # 20 runs of 50ms, 5 at a time, instead of one after the other
+    assert elapsed < 0.5
+
+
+def test_async_mapped_errors_are_captured():
+    results, errors = run_mapped(AsyncEcho(), {}, [{"value": 1}, {"value": -1}])
+    assert results == [2, None]
+    assert errors[0]["error"] == "ValueError: negative"
@@ -0,0 +1,19 @@
+from lunarbase.components.component_wrapper import ComponentWrapper
+from lunarbase.modeling.data_models import ComponentInput, ComponentModel, ComponentOutput
+
+
+def test_wrapped_models_are_validated_as_a_whole():
+    component = ComponentModel(
+        name="TextInput",
+        class_name="TextInput",
+        description="TextInput",
+        group="IO",
+        inputs=ComponentInput(key="input", data_type="TEMPLATE", value="lunar"),
+        output=ComponentOutput(data_type="TEXT", value=None),
+    )
+    component.configuration["unset"] = "None"
+
+    component_model = ComponentWrapper(component).component_model
+    assert component_model.configuration["unset"] is None
+    assert all(inp.component_id == component.id for inp in component_model.inputs)
+    assert component_model.output.component_id == component.id
@@ -0,0 +1,45 @@
+# SPDX-FileCopyrightText: Copyright © 2024 Lunarbase (https://lunarbase.ai/) <contact@lunarbase.ai>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from lunarbase.orchestration import executor as executor_module
+from lunarbase.orchestration.executor import (
+    EXECUTOR_KINDS,
+    get_local_pool,
+    validate_executor,
+)
+
+
+@pytest.fixture
+def local_pools(monkeypatch):
+    pools = dict()
+    monkeypatch.setattr(executor_module, "LOCAL_POOLS", pools)
+    yield pools
+    for pool in pools.values():
+        pool.shutdown(wait=True)
+
+
+def test_validate_executor():
+    for kind in EXECUTOR_KINDS + [None]:
+        assert validate_executor(kind) == kind
+    with pytest.raises(ValueError):
+        validate_executor("gpu")
+
+
+def test_local_pools_by_kind_and_size(local_pools):
+    small = get_local_pool("thread", 2)
+    assert isinstance(small, ThreadPoolExecutor)
+    assert get_local_pool("thread", 2) is small
+
+    large = get_local_pool("thread", 4)
+    assert large is not small
+    assert large._max_workers == 4
+
+    processes = get_local_pool("process", 2)
+    assert isinstance(processes, ProcessPoolExecutor)
+    assert processes is not small
+    assert len(local_pools) == 3
@@ -0,0 +1,111 @@
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+from lunarbase.components.artifacts import ArtifactHandle, ArtifactStore
+from lunarbase.modeling.data_models import (
+    ComponentModel,
+    ComponentInput,
+    ComponentOutput,
+    WorkflowModel,
+    ComponentDependency,
+)
+from lunarbase.orchestration.incremental import (
+    RunState,
+    inline_reused,
+    workflow_fingerprints,
+)
+
+
+def text_input(wid, label, value=None):
+    return ComponentModel(
+        workflow_id=wid,
+        label=label,
+        name="TextInput",
+        class_name="TextInput",
+        description="TextInput",
+        group="IO",
+        inputs=ComponentInput(key="input", data_type="TEMPLATE", value=value),
+        output=ComponentOutput(data_type="TEXT", value=None),
+    )
+
+
+def chain_workflow(first_value="lunar"):
+    wid = str(uuid4())
+    components = [
+        text_input(wid, "first", first_value),
+        text_input(wid, "second"),
+        text_input(wid, "other", "other"),
+    ]
+    return WorkflowModel(
+        id=wid,
+        name="Chain",
+        description="Chain",
+        components=components,
+        dependencies=[
+            ComponentDependency(
+                component_input_key="input",
+                source_label=components[0].label,
+                target_label=components[1].label,
+            ),
+        ],
+    )
+
+
+def test_changes_propagate_to_descendants():
+    workflow = chain_workflow()
+    first, second, other = [c.label for c in workflow.components]
+    fingerprints = workflow_fingerprints(workflow)
+
+    edited = workflow.model_copy(deep=True)
+    edited.components[0].inputs[0].value = "base"
+    edited_fingerprints = workflow_fingerprints(edited)
+
+    assert edited_fingerprints[first] != fingerprints[first]
+    assert edited_fingerprints[second] != fingerprints[second]
+    assert edited_fingerprints[other] == fingerprints[other]
+
+
+def test_unchanged_components_are_reused(tmp_path):
+    workflow = chain_workflow()
+    first, second, other = [c.label for c in workflow.components]
+    fingerprints = workflow_fingerprints(workflow)
+
+    results = dict()
+    for component in workflow.components:
+        result = component.model_copy(deep=True)
+        result.output.value = f"{component.label} output"
+        results[component.label] = result
+    results[other] = "Something went wrong"
+    run_state = RunState(str(tmp_path))
+    run_state.save(workflow, fingerprints, results)
+
+    edited = workflow.model_copy(deep=True)
+    edited.components[1].configuration["seed"] = 1
+    reused = run_state.reusable(edited, workflow_fingerprints(edited))
+    # Failed components are never reused
+    assert list(reused.keys()) == [first]
+
+    pruned = inline_reused(edited, reused)
+    assert [c.label for c in pruned.components] == [second, other]
+    assert len(pruned.dependencies) == 0
+    assert pruned.components[0].inputs[0].value == f"{first} output"
+
+
+def test_artifacts_are_kept_as_handles(tmp_path):
+    workflow = chain_workflow()
+    first = workflow.components[0].label
+    fingerprints = workflow_fingerprints(workflow)
+    handle = ArtifactStore(str(tmp_path), min_size=0, retention=0).externalize(
+        first, np.zeros(100_000)
+    )
+    result = workflow.components[0].model_copy(deep=True)
+    result.output = ComponentOutput(data_type="ANY", value=handle)
+    run_state = RunState(str(tmp_path))
+    # As received from a run in a separate process
+    run_state.save(workflow, fingerprints, {first: result.model_dump(by_alias=True)})
+
+    assert Path(run_state.path).stat().st_size < 100_000
+    reused = run_state.reusable(workflow, fingerprints)
+    assert isinstance(reused[first].output.value, ArtifactHandle)
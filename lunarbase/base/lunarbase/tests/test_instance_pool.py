@@ -0,0 +1,95 @@
+import time
+
+from lunarbase.components import component_wrapper
+from lunarbase.components.component_wrapper import ComponentWrapper
+from lunarbase.components.instance_pool import InstancePool
+from lunarbase.modeling.data_models import ComponentInput, ComponentModel, ComponentOutput
+
+
+class Counter:
+    built = 0
+
+    def __init__(self, **configuration):
+        Counter.built += 1
+        self.configuration = configuration
+
+
+class StatefulCounter(Counter):
+    stateful = True
+
+
+def build(instance_class, configuration):
+    return lambda: instance_class(**configuration)
+
+
+def test_released_instances_are_reused_per_configuration():
+    pool = InstancePool(max_size=4, ttl=0)
+    Counter.built = 0
+
+    first, reused = pool.acquire(Counter, {"a": 1}, build(Counter, {"a": 1}))
+    assert not reused
+    pool.release(first, {"a": 1})
+
+    second, reused = pool.acquire(Counter, {"a": 1}, build(Counter, {"a": 1}))
+    assert reused and second is first
+
+    # Lent out instances are not shared, other configurations get their own
+    third, reused = pool.acquire(Counter, {"a": 1}, build(Counter, {"a": 1}))
+    assert not reused and third is not first
+    _, reused = pool.acquire(Counter, {"a": 2}, build(Counter, {"a": 2}))
+    assert not reused
+    assert Counter.built == 3
+
+    metrics = pool.metrics()["components"]["Counter"]
+    assert metrics["hits"] == 1 and metrics["misses"] == 3
+
+
+def test_stateful_components_are_not_pooled():
+    pool = InstancePool(max_size=4, ttl=0)
+    instance, _ = pool.acquire(StatefulCounter, {}, build(StatefulCounter, {}))
+    pool.release(instance, {})
+    _, reused = pool.acquire(StatefulCounter, {}, build(StatefulCounter, {}))
+    assert not reused
+    assert pool.metrics()["idle"] == 0
+
+
+def test_idle_instances_expire_and_are_bounded():
+    pool = InstancePool(max_size=2, ttl=1)
+    instances = [Counter() for _ in range(3)]
+    for instance in instances:
+        pool.release(instance, {})
+    assert pool.metrics()["idle"] == 2
+
+    time.sleep(1.1)
+    _, reused = pool.acquire(Counter, {}, build(Counter, {}))
+    assert not reused
+
+
+def test_updated_packages_are_invalidated():
+    pool = InstancePool(max_size=4, ttl=0)
+    pool.release(Counter(), {})
+    assert pool.invalidate({"some_other_package"}) == 0
+    assert pool.invalidate({Counter.__module__.split(".")[0]}) == 1
+    _, reused = pool.acquire(Counter, {}, build(Counter, {}))
+    assert not reused
+
+
+def test_wrapped_runs_borrow_instances_only_while_running(monkeypatch):
+    pool = InstancePool(max_size=4, ttl=0)
+    monkeypatch.setattr(component_wrapper, "get_instance_pool", lambda: pool)
+    component = ComponentModel(
+        name="TextInput",
+        class_name="TextInput",
+        description="TextInput",
+        group="IO",
+        inputs=ComponentInput(key="input", data_type="TEMPLATE", value="lunar"),
+        output=ComponentOutput(data_type="TEXT", value=None),
+    )
+
+    wrappers = [ComponentWrapper(component), ComponentWrapper(component)]
+    assert pool.metrics()["components"] == {}
+
+    for wrapper in wrappers:
+        assert wrapper.run_in_workflow().output.value == "lunar"
+        assert pool.metrics()["idle"] == 1
+    assert [wrapper.instance_status for wrapper in wrappers] == ["miss", "hit"]
@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+from lunarbase.components.errors import ComponentError
+from lunarbase.components.mapping import run_mapped
+from lunarcore.component.data_types import DataType
+from lunarcore.component.lunar_component import LunarComponent
+
+
+class Inverse:
+    def run(self, value, delay=0.0):
+        time.sleep(delay)
+        return 1 / value
+
+
+@pytest.mark.parametrize("workers,chunk_size", [(1, 0), (4, 0), (4, 3)])
+def test_run_mapped_keeps_item_order(workers, chunk_size):
+    items = [{"value": v, "delay": 0.001 * (10 - v)} for v in range(1, 11)]
+    results, errors = run_mapped(
+        Inverse(), {}, items, executor="thread", workers=workers, chunk_size=chunk_size
+    )
+    assert errors == []
+    assert results == [1 / v for v in range(1, 11)]
+
+
+def test_run_mapped_captures_item_errors():
+    items = [{"value": v} for v in [1, 0, 2]]
+    results, errors = run_mapped(Inverse(), {}, items, workers=2)
+    assert results == [1.0, None, 0.5]
+    assert [error["index"] for error in errors] == [1]
+    assert errors[0]["error"].startswith("ZeroDivisionError")
+
+
+def test_run_mapped_rejects_unknown_executor():
+    with pytest.raises(ComponentError):
+        run_mapped(Inverse(), {}, [{"value": 1}], executor="gpu")
+
+
+class BatchedInverse(Inverse):
+    batches = 0
+
+    def run_batch(self, value, delay=None):
+        BatchedInverse.batches += 1
+        return [1 / v for v in value]
+
+    @classmethod
+    def supports_batch(cls):
+        return True
+
+
+def test_run_mapped_uses_run_batch():
+    BatchedInverse.batches = 0
+    items = [{"value": v} for v in range(1, 11)]
+    results, errors = run_mapped(BatchedInverse(), {}, items, batch_size=4)
+    assert errors == []
+    assert results == [1 / v for v in range(1, 11)]
+    assert BatchedInverse.batches == 3
+
+
+class RetriedBatchedInverse(BatchedInverse):
+    retry_batch_items = True
+
+
+def test_failed_batch_fails_its_items():
+    BatchedInverse.batches = 0
+    items = [{"value": v} for v in [1, 0, 2, 4]]
+    results, errors = run_mapped(BatchedInverse(), {}, items, batch_size=2)
+    assert results == [None, None, 0.5, 0.25]
+    assert [error["index"] for error in errors] == [0, 1]
+    assert all(error["error"].startswith("ZeroDivisionError") for error in errors)
+    assert BatchedInverse.batches == 2
+
+
+def test_failed_batch_falls_back_to_items_on_request():
+    items = [{"value": v} for v in [1, 0, 2]]
+    results, errors = run_mapped(RetriedBatchedInverse(), {}, items, batch_size=4)
+    assert results == [1.0, None, 0.5]
+    assert [error["index"] for error in errors] == [1]
+
+
+class Exclusive:
+    """
+    Fails when one of its instances is run by two threads at once.
+    """
+
+    instances = set()
+
+    def __init__(self):
+        self._busy = threading.Lock()
+        Exclusive.instances.add(id(self))
+
+    def run(self, value):
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("instance shared between threads")
+        try:
+            time.sleep(0.005)
+            return value
+        finally:
+            self._busy.release()
+
+
+class ThreadSafe(Exclusive):
+    thread_safe = True
+
+    def run(self, value):
+        return value
+
+
+def test_thread_workers_get_their_own_instance():
+    Exclusive.instances = set()
+    component_instance = Exclusive()
+    items = [{"value": v} for v in range(16)]
+    results, errors = run_mapped(component_instance, {}, items, workers=4, chunk_size=2)
+    assert errors == []
+    assert results == list(range(16))
+    assert id(component_instance) in Exclusive.instances and len(Exclusive.instances) > 1
+
+
+def test_thread_safe_components_share_their_instance():
+    Exclusive.instances = set()
+    items = [{"value": v} for v in range(8)]
+    results, errors = run_mapped(ThreadSafe(), {}, items, workers=4, chunk_size=2)
+    assert errors == [] and results == list(range(8))
+    assert len(Exclusive.instances) == 1
+
+
+class Upper(
+    LunarComponent,
+    component_name="Upper",
+    input_types={"text": DataType.TEXT},
+    output_type=DataType.TEXT,
+):
+    def run(self, text: str):
+        return text.upper()
+
+
+class BatchedUpper(
+    Upper,
+    component_name="BatchedUpper",
+    input_types={"text": DataType.TEXT},
+    output_type=DataType.TEXT,
+):
+    def run_batch(self, text):
+        return [value.upper() for value in text]
+
+
+def test_run_batch_defaults_to_run():
+    assert not Upper.supports_batch()
+    assert BatchedUpper.supports_batch()
+    assert Upper().run_batch(text=["a", "b"]) == ["A", "B"]
+
+    items = [{"text": value} for value in "abc"]
+    results, errors = run_mapped(Upper(), {}, items, batch_size=2)
+    assert errors == [] and results == ["A", "B", "C"]
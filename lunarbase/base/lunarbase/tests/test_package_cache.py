@@ -0,0 +1,42 @@
+import zipfile
+from pathlib import Path
+
+from lunarbase.orchestration.package_cache import PackageCache, component_archive
+
+
+def write_package(path: Path, member: str, source: str):
+    with zipfile.ZipFile(path, "w") as package:
+        package.writestr(member, source)
+        package.writestr("requirements.txt", "")
+
+
+def test_archives_are_extracted_once_and_linked(tmp_path):
+    archive_path = Path(tmp_path, "cached_package.zip")
+    write_package(archive_path, "src/cached_package/__init__.py", "VALUE = 1\n")
+    assert component_archive(f"cached_package @ file://{archive_path}") == (
+        "cached_package",
+        str(archive_path),
+    )
+    assert component_archive("requests>=2") is None
+
+    cache = PackageCache(str(Path(tmp_path, "cache")))
+    import_root = cache.extract(str(archive_path), "cached_package")
+    assert Path(import_root, "cached_package", "__init__.py").is_file()
+    assert any(Path(import_root, "cached_package", "__pycache__").glob("*.pyc"))
+    assert cache.extract(str(archive_path), "cached_package") == import_root
+
+    libpath = str(Path(tmp_path, "site-packages"))
+    assert cache.link(libpath, "cached_package", str(archive_path))
+    assert not cache.link(libpath, "cached_package", str(archive_path))
+
+    # A new version of the archive gets its own directory and moves the link
+    write_package(archive_path, "src/cached_package/__init__.py", "VALUE = 20\n")
+    assert cache.extract(str(archive_path), "cached_package") != import_root
+    assert cache.link(libpath, "cached_package", str(archive_path))
+
+
+def test_modules_at_the_archive_root_get_their_own_directory(tmp_path):
+    archive_path = Path(tmp_path, "root_package.zip")
+    write_package(archive_path, "__init__.py", "VALUE = 1\n")
+    import_root = PackageCache(str(Path(tmp_path, "cache"))).extract(str(archive_path), "root_package")
+    assert Path(import_root, "root_package", "__init__.py").is_file()
@@ -0,0 +1,131 @@
+from uuid import uuid4
+
+import pytest
+
+from lunarbase.modeling.data_models import (
+    ComponentModel,
+    ComponentInput,
+    ComponentOutput,
+    WorkflowModel,
+    ComponentDependency,
+)
+from lunarbase.orchestration.planner import SUBWORKFLOW_PLANS, plan_workflow, prune_to_targets
+
+
+def text_input(wid, label, value=None):
+    return ComponentModel(
+        workflow_id=wid,
+        label=label,
+        name="TextInput",
+        class_name="TextInput",
+        description="TextInput",
+        group="IO",
+        inputs=ComponentInput(key="input", data_type="TEMPLATE", value=value),
+        output=ComponentOutput(data_type="TEXT", value=None),
+    )
+
+
+def nested_workflow():
+    swid = str(uuid4())
+    inner = [text_input(swid, "first"), text_input(swid, "second")]
+    subworkflow = WorkflowModel(
+        id=swid,
+        name="Inner",
+        description="Inner",
+        components=inner,
+        dependencies=[
+            ComponentDependency(
+                component_input_key="input",
+                source_label=inner[0].label,
+                target_label=inner[1].label,
+            ),
+        ],
+    )
+
+    wid = str(uuid4())
+    source, sink = text_input(wid, "source", "lunar"), text_input(wid, "sink")
+    subworkflow_component = ComponentModel(
+        workflow_id=wid,
+        label="subworkflow",
+        name="Subworkflow",
+        class_name="Subworkflow",
+        description="Subworkflow",
+        group="LUNAR",
+        inputs=[
+            ComponentInput(key="workflow", data_type="WORKFLOW", value=subworkflow.dict()),
+            # Subworkflow inputs feed the inner inputs sharing their id
+            ComponentInput(id=inner[0].inputs[0].id, key="input", data_type="TEMPLATE", value=None),
+        ],
+        output=ComponentOutput(data_type="ANY", value=None),
+    )
+    workflow = WorkflowModel(
+        id=wid,
+        name="Outer",
+        description="Outer",
+        components=[source, subworkflow_component, sink],
+        dependencies=[
+            ComponentDependency(
+                component_input_key="input",
+                source_label=source.label,
+                target_label=subworkflow_component.label,
+            ),
+            ComponentDependency(
+                component_input_key="input",
+                source_label=subworkflow_component.label,
+                target_label=sink.label,
+            ),
+        ],
+    )
+    return workflow, subworkflow_component.label, inner
+
+
+def test_subworkflows_are_inlined():
+    workflow, subworkflow_label, inner = nested_workflow()
+    plan = plan_workflow(workflow)
+
+    first, second = [f"{subworkflow_label}/{component.label}" for component in inner]
+    assert plan.subworkflows == {subworkflow_label: second}
+    assert plan.inner_labels == {first, second}
+
+    edges = {
+        (dep.source_label, dep.target_label, dep.component_input_key)
+        for dep in plan.workflow.dependencies
+    }
+    source, sink = workflow.components[0].label, workflow.components[2].label
+    assert (source, first, "input") in edges
+    assert (first, second, "input") in edges
+    assert (second, subworkflow_label, "workflow") in edges
+    assert (subworkflow_label, sink, "input") in edges
+    assert len(edges) == 4
+
+
+def test_subworkflow_plans_are_cached():
+    SUBWORKFLOW_PLANS.clear()
+    workflow, _, _ = nested_workflow()
+    first_plan = plan_workflow(workflow)
+    second_plan = plan_workflow(workflow)
+    assert len(SUBWORKFLOW_PLANS) == 1
+    assert [c.label for c in first_plan.workflow.components] == [
+        c.label for c in second_plan.workflow.components
+    ]
+
+
+def test_prune_to_targets_keeps_ancestors():
+    workflow, subworkflow_label, _ = nested_workflow()
+    source, sink = workflow.components[0].label, workflow.components[2].label
+
+    pruned = prune_to_targets(workflow, [subworkflow_label])
+    assert [c.label for c in pruned.components] == [source, subworkflow_label]
+    assert [(d.source_label, d.target_label) for d in pruned.dependencies] == [
+        (source, subworkflow_label)
+    ]
+    assert len(prune_to_targets(workflow, [sink]).components) == 3
+    assert prune_to_targets(workflow, None) is workflow
+
+
+def test_prune_to_unknown_targets_fails():
+    workflow, subworkflow_label, _ = nested_workflow()
+    with pytest.raises(ValueError):
+        prune_to_targets(workflow, ["unknown"])
+    with pytest.raises(ValueError):
+        prune_to_targets(workflow, [subworkflow_label, "unknown"])
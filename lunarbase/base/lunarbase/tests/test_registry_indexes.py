@@ -0,0 +1,50 @@
+from lunarbase import LUNAR_CONTEXT
+
+
+def test_lookups_match_component_list():
+    registry = LUNAR_CONTEXT.lunar_registry
+    for registered_component in registry.components:
+        component_model = registered_component.component_model
+        assert registry.get_by_class_name(component_model.class_name).component_model.class_name == (
+            component_model.class_name
+        )
+        assert registry.get_by_module_name(registered_component.module_name) is not None
+        assert registry.get_by_component_id(component_model.id) is not None
+    assert registry.get_by_class_name("NoSuchComponent") is None
+
+
+def test_unregister_updates_indexes():
+    registry = LUNAR_CONTEXT.lunar_registry
+    if len(registry.components) == 0:
+        return
+    registered_component = registry.components[-1]
+    class_name = registered_component.component_model.class_name
+    sorted_models = registry.sorted_component_models()
+
+    removed = registry.unregister(registered_component.module_name)
+    try:
+        assert registry.get_by_module_name(registered_component.module_name) is None
+        assert registry.get_by_class_name(class_name) is None or any(
+            component.component_model.class_name == class_name for component in registry.components
+        )
+        assert len(registry.sorted_component_models()) == len(sorted_models) - len(removed)
+    finally:
+        for component in removed:
+            registry.add_component(component)
+    assert len(registry.serialized_component_models()) == len(sorted_models)
+
+
+def test_replaced_components_are_indexed():
+    registry = LUNAR_CONTEXT.lunar_registry
+    if len(registry.components) == 0:
+        return
+    components = list(registry.components)
+    replacement = components[-1].model_copy()
+
+    # Same list length, only the entry changed
+    registry.set_components(components[:-1] + [replacement])
+    try:
+        assert registry.get_by_module_name(replacement.module_name) is replacement
+    finally:
+        registry.set_components(components)
+    assert registry.get_by_module_name(replacement.module_name) is components[-1]
@@ -0,0 +1,61 @@
+import os
+import zipfile
+from pathlib import Path
+
+from lunarbase.registry.registry_models import RegisteredComponentModel
+from lunarbase.registry.snapshot import RegistrySnapshot
+
+COMPONENT_SOURCE = """
+from lunarcore.component.component_group import ComponentGroup
+from lunarcore.component.data_types import DataType
+from lunarcore.component.lunar_component import LunarComponent
+
+
+class {class_name}(
+    LunarComponent,
+    component_name="{class_name}",
+    component_description="Snapshot test component.",
+    input_types={{"text": DataType.TEXT}},
+    output_type=DataType.TEXT,
+    component_group=ComponentGroup.DATA_TRANSFORMATION,
+):
+    def run(self, text: str):
+        return text
+"""
+
+
+def write_package(path: Path, class_name: str):
+    with zipfile.ZipFile(path, "w") as package:
+        package.writestr("snapshot_test/__init__.py", COMPONENT_SOURCE.format(class_name=class_name))
+
+
+def test_unchanged_packages_load_from_snapshot(tmp_path):
+    package_path = Path(tmp_path, "snapshot_test.zip")
+    write_package(package_path, "SnapshotTest")
+    registered_component = RegisteredComponentModel(
+        package_path=str(package_path), module_name="snapshot_test"
+    )
+    snapshot_path = str(Path(tmp_path, "snapshot.json"))
+    RegistrySnapshot(snapshot_path).save([registered_component])
+
+    loaded = RegistrySnapshot(snapshot_path).load().get(str(package_path), "snapshot_test")
+    assert loaded is not None
+    assert loaded.component_model.class_name == "SnapshotTest"
+    assert loaded.view.name == "SnapshotTest"
+    assert loaded.component_requirements == registered_component.component_requirements
+
+
+def test_changed_packages_are_parsed_again(tmp_path):
+    package_path = Path(tmp_path, "snapshot_test.zip")
+    write_package(package_path, "SnapshotTest")
+    snapshot_path = str(Path(tmp_path, "snapshot.json"))
+    RegistrySnapshot(snapshot_path).save(
+        [RegisteredComponentModel(package_path=str(package_path), module_name="snapshot_test")]
+    )
+
+    # Same modification time, different content
+    stat = package_path.stat()
+    write_package(package_path, "SnapshotEdited")
+    os.utime(package_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert RegistrySnapshot(snapshot_path).load().get(str(package_path), "snapshot_test") is None
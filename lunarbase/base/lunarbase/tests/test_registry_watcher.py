@@ -0,0 +1,54 @@
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+from lunarbase.registry.watcher import RegistryWatcher
+
+
+class FakeRegistry:
+    def __init__(self, root: Path):
+        self.config = SimpleNamespace(
+            REGISTRY_FILE=str(Path(root, "components.txt")), COMPONENT_LIBRARY_PATH=str(root)
+        )
+        Path(self.config.REGISTRY_FILE).write_text("first_package\n")
+        self.components = [
+            SimpleNamespace(package_path=str(Path(root, f"{name}.zip")), module_name=name)
+            for name in ["first_package", "second_package"]
+        ]
+        for component in self.components:
+            Path(component.package_path).write_bytes(b"v1")
+        self.calls = []
+
+    def is_library_package(self, registered_component):
+        return Path(registered_component.package_path).parent == Path(self.config.COMPONENT_LIBRARY_PATH)
+
+    def reload_package(self, module_name):
+        self.calls.append(("reload", module_name))
+        return [module_name], [module_name]
+
+    def sync_registry_file(self):
+        self.calls.append(("sync",))
+        return [], []
+
+    def save(self):
+        self.calls.append(("save",))
+
+
+def test_only_changed_packages_are_reloaded(tmp_path):
+    registry = FakeRegistry(tmp_path)
+    changes = []
+    watcher = RegistryWatcher(registry, interval=0, on_change=lambda *change: changes.append(change))
+    assert watcher.poll() == ([], [])
+    assert registry.calls == []
+
+    Path(registry.components[1].package_path).write_bytes(b"version 2")
+    assert watcher.poll() == (["second_package"], ["second_package"])
+    assert registry.calls == [("reload", "second_package"), ("save",)]
+    assert changes == [(["second_package"], ["second_package"])]
+
+    registry.calls = []
+    stat = Path(registry.config.REGISTRY_FILE).stat()
+    Path(registry.config.REGISTRY_FILE).write_text("first_package\nthird_package\n")
+    os.utime(registry.config.REGISTRY_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    watcher.poll()
+    assert registry.calls == [("sync",)]
@@ -0,0 +1,72 @@
+import pytest
+
+from lunarbase.components import component_wrapper
+from lunarbase.components.component_wrapper import ComponentWrapper
+from lunarbase.components.result_cache import ResultCache
+from lunarbase.modeling.data_models import ComponentInput, ComponentModel, ComponentOutput
+
+
+def test_result_cache_hits_and_evicts(tmp_path):
+    cache = ResultCache(str(tmp_path), max_size=300, ttl=3600)
+    key = cache.make_key("TextInput", "fingerprint", {"x": 1}, {"input": "lunar"})
+
+    assert key == cache.make_key("TextInput", "fingerprint", {"x": 1}, {"input": "lunar"})
+    assert cache.get(key, "TextInput") == (False, None)
+
+    cache.put(key, "TextInput", "lunar")
+    assert cache.get(key, "TextInput") == (True, "lunar")
+
+    for i in range(10):
+        cache.put(cache.make_key("Sleep", "fingerprint", {}, {"i": i}), "Sleep", "z" * 60)
+
+    metrics = cache.metrics()
+    assert metrics["size"] <= 300
+    assert metrics["components"]["TextInput"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+    assert cache.make_key("TextInput", "fingerprint", {}, {"input": object()}) is None
+
+
+def text_input(value, **configuration):
+    return ComponentModel(
+        name="TextInput",
+        class_name="TextInput",
+        description="TextInput",
+        group="IO",
+        inputs=ComponentInput(key="input", data_type="TEMPLATE", value=value),
+        output=ComponentOutput(data_type="TEXT", value=None),
+        configuration=configuration,
+    )
+
+
+def run_text_input(value, **configuration):
+    wrapper = ComponentWrapper(text_input(value, **configuration))
+    result = wrapper.run_in_workflow()
+    return wrapper.cache_status, result.output.value
+
+
+@pytest.fixture
+def wrapper_cache(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), max_size=0, ttl=3600)
+    monkeypatch.setattr(component_wrapper, "get_result_cache", lambda: cache)
+    monkeypatch.setenv("LUNAR_USERID", "cache-user")
+    return cache
+
+
+def test_wrapped_runs_hit_across_runs_and_users(wrapper_cache, monkeypatch):
+    instance_class = ComponentWrapper(text_input("lunar")).instance_class
+    monkeypatch.setattr(instance_class, "cacheable", True, raising=False)
+
+    assert run_text_input("lunar") == ("miss", "lunar")
+    assert run_text_input("lunar") == ("hit", "lunar")
+    assert run_text_input("lunar", force_run=True) == ("bypass", "lunar")
+
+    # Results of one user are not served to another
+    monkeypatch.setenv("LUNAR_USERID", "other-user")
+    assert run_text_input("lunar") == ("miss", "lunar")
+
+
+def test_wrapped_runs_are_not_cached_without_opting_in(wrapper_cache):
+    assert not ComponentWrapper(text_input("lunar")).instance_class.cacheable
+
+    assert run_text_input("lunar") == (None, "lunar")
+    assert run_text_input("lunar") == (None, "lunar")
+    assert wrapper_cache.metrics()["entries"] == 0
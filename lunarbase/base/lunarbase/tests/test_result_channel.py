@@ -0,0 +1,71 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from lunarbase.components.errors import ComponentError
+from lunarbase.orchestration.channel import ResultReader, ResultWriter, encode_result_frame
+from lunarbase.orchestration.engine import (
+    collect_component_results,
+    emit_component_result,
+    flush_component_results,
+    result_sink,
+)
+
+
+@pytest.mark.parametrize("encoding", ["json", "pickle"])
+def test_frames_are_read_once_complete(tmp_path, encoding):
+    result_path = str(Path(tmp_path, "result.lunar"))
+    writer = ResultWriter(result_path, encoding=encoding)
+    reader = ResultReader(result_path)
+    writer.emit("first", [1, 2, 3])
+    writer.emit("first", "emitted once only")
+    assert reader.read_available() == [
+        {"event": "component", "label": "first", "status": "completed", "result": [1, 2, 3]}
+    ]
+
+    # Half a frame waits until the rest of it is written
+    frame = encode_result_frame({"event": "done"}, encoding)
+    with open(result_path, "ab") as stream:
+        stream.write(frame[: len(frame) // 2])
+    assert reader.read_available() == []
+    with open(result_path, "ab") as stream:
+        stream.write(frame[len(frame) // 2:])
+    assert reader.read_available() == [{"event": "done"}]
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_results_are_streamed_while_the_run_goes_on(tmp_path):
+    result_path = str(Path(tmp_path, "result.lunar"))
+    first_seen = asyncio.Event()
+    events = []
+
+    def on_event(frame):
+        events.append(frame["label"])
+        first_seen.set()
+
+    async def run():
+        with result_sink(result_path, encoding="json"):
+            emit_component_result("first", "one")
+            # Printed output cannot get mixed up with the results
+            print("<OUTPUT RESULT>not a result<OUTPUT RESULT END>")
+            await asyncio.wait_for(first_seen.wait(), timeout=10)
+            flush_component_results({"first": "ignored, already emitted", "second": "two"})
+
+    results = await collect_component_results(result_path, run(), on_event)
+    assert results == {"first": "one", "second": "two"}
+    assert events == ["first", "second"]
+    assert not Path(result_path).exists()
+
+
+@pytest.mark.asyncio
+async def test_runs_without_a_done_frame_fail(tmp_path):
+    result_path = str(Path(tmp_path, "result.lunar"))
+
+    async def run():
+        with result_sink(result_path, encoding="json"):
+            emit_component_result("first", "one")
+
+    with pytest.raises(ComponentError):
+        await collect_component_results(result_path, run())
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import pytest
+
+from lunarbase.orchestration.runs import ACTIVE_MARKER, RunDirectory, run_directory
+
+
+def test_runs_get_their_own_directory(tmp_path):
+    with run_directory(str(tmp_path), retention=10) as first:
+        with run_directory(str(tmp_path), retention=10) as second:
+            assert first.run_id != second.run_id
+            assert first.path != second.path
+            assert Path(first.path, ACTIVE_MARKER).is_file()
+    assert not Path(first.path, ACTIVE_MARKER).exists()
+    assert "Run finished" in Path(first.path, RunDirectory.LOG_NAME).read_text()
+
+
+def test_failed_runs_are_logged(tmp_path):
+    with pytest.raises(ValueError):
+        with run_directory(str(tmp_path), retention=10) as run:
+            raise ValueError("boom")
+    assert "Run failed: boom" in Path(run.path, RunDirectory.LOG_NAME).read_text()
+
+
+def test_old_runs_are_collected(tmp_path):
+    active = RunDirectory(str(tmp_path))
+    active.open()
+    for _ in range(3):
+        with run_directory(str(tmp_path), retention=2):
+            pass
+    runs = sorted(run.name for run in tmp_path.iterdir())
+    # The oldest run is still going on, so it is kept next to the last two
+    assert len(runs) == 3
+    assert active.run_id in runs
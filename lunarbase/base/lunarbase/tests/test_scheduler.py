@@ -0,0 +1,33 @@
+import networkx as nx
+import pytest
+
+from lunarbase.components.errors import ComponentError
+from lunarbase.orchestration.scheduler import topological_order
+
+
+def test_topological_order():
+    dag = nx.MultiDiGraph()
+    dag.add_nodes_from(["C", "B", "A", "D"])
+    dag.add_edge("A", "B", data=("input", None))
+    dag.add_edge("A", "B", data=("other", None))
+    dag.add_edge("B", "C", data=("input", None))
+    dag.add_edge("A", "C", data=("input", None))
+
+    order = topological_order(dag, known=["A", "B", "C", "D"])
+
+    assert sorted(order) == ["A", "B", "C", "D"]
+    for source, target in dag.edges():
+        assert order.index(source) < order.index(target)
+
+
+def test_topological_order_rejects_cycles_and_unknown_components():
+    dag = nx.MultiDiGraph()
+    dag.add_edge("A", "B", data=("input", None))
+    dag.add_edge("B", "A", data=("input", None))
+    with pytest.raises(ComponentError):
+        topological_order(dag)
+
+    dag = nx.MultiDiGraph()
+    dag.add_edge("A", "MISSING", data=("input", None))
+    with pytest.raises(ComponentError):
+        topological_order(dag, known=["A"])
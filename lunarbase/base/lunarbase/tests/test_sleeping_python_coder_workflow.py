@@ -13,7 +13,8 @@ from lunarbase.tests.conftest import workflow_controller
 
 
 @pytest.mark.asyncio
-async def test_sleeping_python_coder(workflow_controller):
+@pytest.mark.parametrize("executor", ["prefect", "thread", "process"])
+async def test_sleeping_python_coder(workflow_controller, executor):
     wid = str(uuid4())
     components = [
         ComponentModel(
@@ -85,7 +86,11 @@ result = ss""",
     )
 
     try:
-        result = await workflow_controller.run(workflow, user_id=workflow_controller.config.DEFAULT_USER_PROFILE)
+        result = await workflow_controller.run(
+            workflow,
+            user_id=workflow_controller.config.DEFAULT_USER_PROFILE,
+            executor=executor,
+        )
     finally:
         workflow_controller.delete(
             workflow.id, workflow_controller.config.DEFAULT_USER_PROFILE
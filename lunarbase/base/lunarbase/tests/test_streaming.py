@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from lunarbase.components.errors import ComponentError
+from lunarbase.modeling.data_models import ComponentInput, ComponentModel, ComponentOutput
+from lunarbase.orchestration.engine import wire_resolved_inputs
+from lunarbase.orchestration.streaming import StreamChannel, tee
+from lunarbase.orchestration.task_promise import TaskPromise
+
+
+def count(n):
+    def source():
+        for i in range(n):
+            yield i
+
+    return source
+
+
+def test_tee_delivers_every_item_to_every_consumer():
+    subscriptions = tee(count(100), 3, maxsize=4)
+    results = [None] * 3
+
+    def consume(index):
+        results[index] = list(subscriptions[index])
+
+    threads = [threading.Thread(target=consume, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert results == [list(range(100))] * 3
+
+
+def test_producer_is_bounded_by_queue_size():
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    (subscription,) = tee(source, 1, maxsize=2)
+    stream = iter(subscription)
+    assert next(stream) == 0
+    time.sleep(0.2)
+    # One item consumed, two queued and one blocked in put
+    assert len(produced) <= 4
+    assert list(stream) == list(range(1, 100))
+
+
+def test_producer_errors_reach_consumers():
+    def source():
+        yield 1
+        raise ValueError("broken stream")
+
+    (subscription,) = tee(source, 1)
+    with pytest.raises(ValueError, match="broken stream"):
+        list(subscription)
+
+
+def test_closed_consumer_does_not_block_the_others():
+    channel = StreamChannel(count(50), expected=2, maxsize=1)
+    first, second = channel.subscribe(), channel.subscribe()
+    second.close()
+    assert sum(first) == sum(range(50))
+
+
+class Repeater:
+    """
+    Streams its input a number of times, standing in for a wrapped STREAM producer.
+    """
+
+    def __init__(self):
+        self.component_model = ComponentModel(
+            label="repeater",
+            name="Repeater",
+            class_name="Repeater",
+            description="Repeater",
+            group="IO",
+            inputs=ComponentInput(key="input", data_type="TEXT", value=None),
+            output=ComponentOutput(data_type="ANY", value=None),
+        )
+
+    def set_inputs(self, **inputs):
+        pass
+
+    def set_output(self, result):
+        self.component_model.output.value = result
+
+    def release_instance(self):
+        pass
+
+    def run(self, input):
+        for _ in range(3):
+            yield input
+
+
+def test_producers_wire_their_inputs_on_their_own_thread():
+    producer = Repeater()
+    threads = []
+
+    def prepare():
+        threads.append(threading.current_thread())
+        producer.component_model.inputs[0].value = "lunar"
+
+    promise = TaskPromise(producer, prepare=prepare)
+    assert threads == []
+    items = list(promise.subscribe())
+    assert [item.output.value for item in items] == ["lunar"] * 3
+    assert threads[0] is not threading.current_thread()
+
+
+def test_producers_with_failed_upstream_fail_their_consumers():
+    producer = Repeater()
+    upstream = {"source": ComponentError("source failed")}
+    promise = TaskPromise(
+        producer,
+        prepare=lambda: wire_resolved_inputs(producer, upstream, [("source", "input", None)]),
+    )
+    with pytest.raises(ComponentError):
+        list(promise.subscribe())
@@ -0,0 +1,134 @@
+import multiprocessing
+from pathlib import Path
+from venv import EnvBuilder
+
+import pytest
+
+from lunarbase import LUNAR_CONTEXT
+from lunarbase.orchestration import process
+from lunarbase.orchestration.process import PythonProcess, read_venv_manifest, write_venv_manifest
+from lunarbase.orchestration.venv_cache import VenvCache
+
+
+def create_cache(tmp_path: Path, max_unused: int = 0):
+    return VenvCache(
+        LUNAR_CONTEXT.lunar_config.model_copy(
+            update={"VENV_CACHE_PATH": str(tmp_path), "VENV_CACHE_MAX_UNUSED": max_unused}
+        )
+    )
+
+
+def test_venvs_are_shared_by_dependency_set(tmp_path):
+    cache = create_cache(tmp_path)
+    first = cache.acquire(["numpy", "requests>=2"], owner="first")
+    assert cache.acquire(["requests>=2", "numpy"], owner="second") == first
+    assert cache.is_shared(first)
+    assert cache.references()[Path(first).name] == 2
+
+    Path(first).mkdir()
+    cache.release("first")
+    assert Path(first).is_dir()
+    cache.release("second")
+    # Unused and beyond VENV_CACHE_MAX_UNUSED
+    assert not Path(first).exists()
+
+
+def acquire_from_process(config, owner: str):
+    VenvCache(config).acquire([owner], owner=owner)
+
+
+def test_index_updates_from_other_processes_are_kept(tmp_path):
+    cache = create_cache(tmp_path, max_unused=100)
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=acquire_from_process, args=(cache._config, f"owner-{index}"))
+        for index in range(8)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(cache._read_index()["owners"]) == 8
+
+
+@pytest.mark.asyncio
+async def test_sealed_venvs_refuse_new_packages(tmp_path, monkeypatch):
+    monkeypatch.setattr(PythonProcess, "VENV_BUILDER", EnvBuilder(with_pip=False, symlinks=True))
+    monkeypatch.setattr(
+        process.subprocess, "check_output", lambda *args, **kwargs: "pip 24.0 from /venv"
+    )
+    monkeypatch.setattr(LUNAR_CONTEXT.lunar_config, "VENV_CACHE_PATH", str(tmp_path))
+
+    venv_path = create_cache(tmp_path).acquire(["requests"])
+    python_process = PythonProcess(venv_path=venv_path)
+    write_venv_manifest(venv_path, {**read_venv_manifest(venv_path), "sealed": "now"})
+    with pytest.raises(ValueError):
+        await python_process.install_packages(["requests"])
+
+
+@pytest.mark.asyncio
+async def test_failed_installs_into_shared_venvs_are_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(PythonProcess, "VENV_BUILDER", EnvBuilder(with_pip=False, symlinks=True))
+    monkeypatch.setattr(
+        process.subprocess, "check_output", lambda *args, **kwargs: "pip 24.0 from /venv"
+    )
+    monkeypatch.setattr(LUNAR_CONTEXT.lunar_config, "VENV_CACHE_PATH", str(tmp_path))
+    monkeypatch.setattr(LUNAR_CONTEXT.lunar_config, "WHEELHOUSE_ENABLED", False)
+    monkeypatch.setattr(LUNAR_CONTEXT.lunar_config, "PACKAGE_CACHE_ENABLED", False)
+    returncodes = [1, 0]
+
+    async def run_pip(self, arguments, description):
+        return returncodes.pop(0)
+
+    monkeypatch.setattr(PythonProcess, "run_pip", run_pip)
+    venv_path = create_cache(tmp_path).acquire(["requests"])
+    python_process = PythonProcess(venv_path=venv_path)
+
+    await python_process.install_packages(["requests"])
+    assert not Path(venv_path, PythonProcess.CACHE_PATH).exists()
+    assert not read_venv_manifest(venv_path).get("sealed")
+
+    assert await python_process.install_packages(["requests"]) == ["requests"]
+    assert Path(venv_path, PythonProcess.CACHE_PATH).read_text().split() == ["requests"]
+    assert read_venv_manifest(venv_path).get("sealed")
+
+
+def test_refresh_moves_the_owner_to_a_new_venv(tmp_path):
+    cache = create_cache(tmp_path, max_unused=1)
+    shared = cache.acquire(["numpy"], owner="first")
+    assert cache.acquire(["numpy"], owner="second") == shared
+    Path(shared).mkdir()
+
+    refreshed = cache.refresh("first")
+    assert refreshed != shared and cache.is_shared(refreshed)
+    assert cache.owned_venv("first") == refreshed
+    # Still in use by the other owner
+    assert Path(shared).is_dir()
+    assert cache.acquire(["numpy"], owner="third") == refreshed
+    assert cache.refresh("unknown") is None
+
+
+def test_runs_hold_their_venv_until_released(tmp_path):
+    cache = create_cache(tmp_path)
+    venv_path = cache.acquire(["numpy"], run="run")
+    Path(venv_path).mkdir()
+    cache.collect_garbage()
+    assert Path(venv_path).is_dir()
+
+    cache.release_run("run")
+    assert not Path(venv_path).exists()
+
+
+def test_runs_of_dead_processes_do_not_hold_venvs(tmp_path):
+    cache = create_cache(tmp_path)
+    context = multiprocessing.get_context("fork")
+    worker = context.Process(target=cache.acquire, args=(["numpy"],), kwargs={"run": "run"})
+    worker.start()
+    worker.join()
+
+    venv_path = cache.get_venv_path(cache.dependency_hash(["numpy"]))
+    Path(venv_path).mkdir()
+    assert cache.references()[Path(venv_path).name] == 0
+    cache.collect_garbage()
+    assert not Path(venv_path).exists()
+    assert cache._read_index()["runs"] == dict()
@@ -0,0 +1,58 @@
+import subprocess
+from pathlib import Path
+from venv import EnvBuilder
+
+import pytest
+
+from lunarbase.orchestration import process
+from lunarbase.orchestration.process import (
+    PythonProcess,
+    provision_venv,
+    read_venv_manifest,
+)
+
+
+@pytest.fixture
+def pip_calls(monkeypatch):
+    # No network: a venv without pip, and pip calls that only get recorded
+    calls = []
+
+    def check_output(cmd, **kwargs):
+        calls.append(cmd)
+        return "pip 24.0 from /venv (python 3)"
+
+    monkeypatch.setattr(PythonProcess, "VENV_BUILDER", EnvBuilder(with_pip=False, symlinks=True))
+    monkeypatch.setattr(process.subprocess, "check_output", check_output)
+    return calls
+
+
+def test_provisioned_venvs_are_reused(tmp_path, pip_calls):
+    venv_path = str(Path(tmp_path, "venv"))
+    manifest = provision_venv(venv_path)
+    assert manifest["pip_version"] == "24.0"
+    assert read_venv_manifest(venv_path) == manifest
+    assert any("--upgrade" in cmd for cmd in pip_calls)
+
+    pip_calls.clear()
+    assert provision_venv(venv_path) == manifest
+    assert pip_calls == []
+
+
+def test_refresh_recreates_the_venv(tmp_path, pip_calls):
+    venv_path = str(Path(tmp_path, "venv"))
+    provision_venv(venv_path)
+    leftover = Path(venv_path, "leftover.txt")
+    leftover.write_text("installed before the refresh")
+
+    pip_calls.clear()
+    manifest = provision_venv(venv_path, refresh=True)
+    assert not leftover.exists()
+    assert Path(venv_path, "pyvenv.cfg").is_file()
+    assert read_venv_manifest(venv_path) == manifest
+    assert any("--upgrade" in cmd for cmd in pip_calls)
+
+
+@pytest.mark.asyncio
+async def test_refreshing_an_unknown_workflow_venv_fails(workflow_controller):
+    with pytest.raises(FileNotFoundError):
+        await workflow_controller.refresh_venv("no-such-workflow", "no-such-user")
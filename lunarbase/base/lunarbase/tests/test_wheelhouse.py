@@ -0,0 +1,63 @@
+import asyncio
+import time
+from venv import EnvBuilder
+
+import pytest
+
+from lunarbase import LUNAR_CONTEXT
+from lunarbase.orchestration import process
+from lunarbase.orchestration import wheelhouse as wheelhouse_module
+from lunarbase.orchestration.process import PythonProcess, read_venv_manifest
+from lunarbase.orchestration.wheelhouse import Wheelhouse, get_install_semaphore
+
+
+def test_install_semaphores_follow_the_loop_and_size():
+    async def semaphores():
+        return get_install_semaphore(2), get_install_semaphore(2), get_install_semaphore(3)
+
+    first, same, resized = asyncio.run(semaphores())
+    assert first is same
+    assert resized is not first
+    assert asyncio.run(semaphores())[0] is not first
+
+
+@pytest.mark.asyncio
+async def test_installs_are_timed_per_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(PythonProcess, "VENV_BUILDER", EnvBuilder(with_pip=False, symlinks=True))
+    monkeypatch.setattr(
+        process.subprocess, "check_output", lambda *args, **kwargs: "pip 24.0 from /venv"
+    )
+    monkeypatch.setattr(LUNAR_CONTEXT.lunar_config, "WHEELHOUSE_ENABLED", False)
+    pip_calls = []
+
+    async def run_pip(self, arguments, description):
+        pip_calls.append(arguments)
+        return 0
+
+    monkeypatch.setattr(PythonProcess, "run_pip", run_pip)
+    python_process = PythonProcess(venv_path=str(tmp_path))
+    await python_process.install_packages(["first-package", "second-package"], disable_cache=True)
+
+    assert len(pip_calls) == 1
+    manifest = read_venv_manifest(str(tmp_path))
+    (batch,) = manifest["install_batches"]
+    assert sorted(batch["packages"]) == ["first-package", "second-package"]
+    assert batch["source"] == "index" and not batch["failed"]
+    assert all("install_seconds" not in timing for timing in manifest["install_timings"].values())
+
+
+def test_pinned_builds_are_reused_by_name_and_version(tmp_path):
+    wheelhouse = Wheelhouse(str(tmp_path), unpinned_ttl=0)
+    wheelhouse.record("Some_Package == 1.0", 1.0)
+    assert wheelhouse.lookup("some-package==1.0") is not None
+    assert wheelhouse.lookup("some-package==2.0") is None
+
+
+def test_unpinned_builds_expire(tmp_path, monkeypatch):
+    wheelhouse = Wheelhouse(str(tmp_path), unpinned_ttl=60)
+    wheelhouse.record("some-package>=1.0", 1.0)
+    assert wheelhouse.lookup("some-package>=1.0") is not None
+
+    built = time.time()
+    monkeypatch.setattr(wheelhouse_module.time, "time", lambda: built + 61)
+    assert wheelhouse.lookup("some-package>=1.0") is None
@@ -0,0 +1,131 @@
+import asyncio
+import io
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from lunarbase.components.errors import ComponentError
+from lunarbase.orchestration import worker_pool
+from lunarbase.orchestration.channel import encode_frame, read_frame
+from lunarbase.orchestration.worker import serve
+from lunarbase.orchestration.worker_pool import WorkerPool
+
+# Speaks the worker protocol without loading the engine
+FAKE_WORKER = """
+import json, os, struct, sys, time
+
+while True:
+    header = sys.stdin.buffer.read(4)
+    if len(header) < 4:
+        break
+    request = json.loads(sys.stdin.buffer.read(struct.unpack(">I", header)[0]))
+    if request.get("crash"):
+        sys.exit(1)
+    time.sleep(request.get("sleep", 0))
+    body = json.dumps({"event": "done", "pid": os.getpid()}).encode("utf-8")
+    sys.stdout.buffer.write(struct.pack(">I", len(body)) + body)
+    sys.stdout.buffer.flush()
+"""
+
+
+def fake_command(tmp_path: Path):
+    script = Path(tmp_path, "fake_worker.py")
+    script.write_text(FAKE_WORKER)
+    return [sys.executable, str(script)]
+
+
+def create_pool(tmp_path: Path, **kwargs):
+    return WorkerPool(command=fake_command(tmp_path), env=dict(os.environ), **kwargs)
+
+
+def exited(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    return False
+
+
+@pytest.mark.asyncio
+async def test_workers_are_reused_until_max_runs(tmp_path):
+    pool = create_pool(tmp_path, size=1, max_runs=2)
+    try:
+        first = (await pool.run({}))["pid"]
+        assert (await pool.run({}))["pid"] == first
+        # Retired after its second run
+        assert (await pool.run({}))["pid"] != first
+    finally:
+        await pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_recycled_workers_are_replaced(tmp_path):
+    pool = create_pool(tmp_path, size=1)
+    try:
+        first = (await pool.run({}))["pid"]
+        await pool.recycle()
+        assert (await pool.run({}))["pid"] != first
+    finally:
+        await pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_crashed_workers_are_discarded(tmp_path):
+    pool = create_pool(tmp_path, size=1)
+    try:
+        with pytest.raises(ComponentError):
+            await pool.run({"crash": True})
+        assert len(pool._busy) == 0
+        assert (await pool.run({}))["event"] == "done"
+    finally:
+        await pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_workers_are_spawned_concurrently(tmp_path):
+    pool = create_pool(tmp_path, size=2)
+    try:
+        responses = await asyncio.gather(pool.run({"sleep": 0.5}), pool.run({"sleep": 0.5}))
+        assert responses[0]["pid"] != responses[1]["pid"]
+    finally:
+        await pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_shut_down_pools_stop_their_workers(tmp_path):
+    pool = create_pool(tmp_path, size=1)
+    pid = (await pool.run({}))["pid"]
+    await pool.shutdown()
+    assert exited(pid)
+    with pytest.raises(ComponentError):
+        await pool.run({})
+
+
+def test_pools_of_finished_loops_are_killed(tmp_path, monkeypatch):
+    monkeypatch.setattr(worker_pool, "create_worker_command", lambda _: fake_command(tmp_path))
+    monkeypatch.setattr(worker_pool, "WORKER_POOLS", dict())
+
+    async def run():
+        pool = worker_pool.get_worker_pool(str(tmp_path), sys.executable)
+        return (await pool.run({}))["pid"]
+
+    first = asyncio.run(run())
+    assert not exited(first)
+    second = asyncio.run(run())
+    try:
+        assert second != first
+        assert exited(first)
+    finally:
+        worker_pool.discard_worker_pool(str(tmp_path))
+    assert exited(second)
+
+
+def test_worker_answers_every_request():
+    requests = io.BytesIO(encode_frame({"json_path": "/no/such/workflow.json"}))
+    responses = io.BytesIO()
+    serve(requests, responses)
+    responses.seek(0)
+    assert read_frame(responses)["event"] == "error"
+    assert read_frame(responses) is None
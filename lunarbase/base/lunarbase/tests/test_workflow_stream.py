@@ -0,0 +1,82 @@
+from uuid import uuid4
+
+import pytest
+
+from lunarbase.modeling.data_models import (
+    ComponentModel,
+    ComponentInput,
+    ComponentOutput,
+    WorkflowModel,
+    ComponentDependency,
+)
+from lunarbase.tests.conftest import workflow_controller
+
+
+@pytest.mark.asyncio
+async def test_workflow_run_stream(workflow_controller):
+    wid = str(uuid4())
+    components = [
+        ComponentModel(
+            workflow_id=wid,
+            name="TextInput",
+            class_name="TextInput",
+            description="TextInput",
+            group="IO",
+            inputs=ComponentInput(
+                key="input",
+                data_type="TEMPLATE",
+                value="abracadabra",
+            ),
+            output=ComponentOutput(data_type="TEXT", value=None),
+        ),
+        ComponentModel(
+            workflow_id=wid,
+            name="Sleep",
+            class_name="Sleep",
+            description="Sleep",
+            group="Utils",
+            inputs=[
+                ComponentInput(
+                    key="input",
+                    data_type="ANY",
+                    value=None,
+                ),
+                ComponentInput(key="timeout", data_type="INT", value=1),
+            ],
+            output=ComponentOutput(data_type="TEXT", value=None),
+        ),
+    ]
+    workflow = WorkflowModel(
+        id=wid,
+        name="Streamed sleep",
+        description="Streamed sleep",
+        components=components,
+        dependencies=[
+            ComponentDependency(
+                component_input_key="input",
+                source_label=components[0].label,
+                target_label=components[1].label,
+                template_variable_key=None,
+            ),
+        ],
+    )
+
+    events = []
+    try:
+        async for event in workflow_controller.run_stream(
+            workflow, user_id=workflow_controller.config.DEFAULT_USER_PROFILE
+        ):
+            events.append(event)
+    finally:
+        workflow_controller.delete(
+            workflow.id, workflow_controller.config.DEFAULT_USER_PROFILE
+        )
+
+    component_events = [event for event in events if event["event"] == "component"]
+    assert events[-1]["event"] == "done"
+    assert [event["label"] for event in component_events] == [
+        components[0].label,
+        components[1].label,
+    ]
+    assert all(event["status"] == "completed" for event in component_events)
+    assert component_events[-1]["result"]["output"]["value"] == "abracadabra"
@@ -13,7 +13,7 @@ import zipfile
 from functools import lru_cache
 from itertools import islice
 from pathlib import Path
-from typing import Any, List
+from typing import Any, List, Union
 
 from lunarbase.logging import LunarLogFormatter
 
@@ -211,11 +211,16 @@ def isiterable(obj: object):
         return False
 
 
-def anyinzip(zip_path: str, paths: List[str]):
-    with zipfile.ZipFile(zip_path) as z:
-        for path in paths:
-            if path in z.namelist():
-                return path
+def anyinzip(zip_path: Union[str, zipfile.ZipFile], paths: List[str]):
+    # Takes an open archive too, so that callers reading from it do not open it twice
+    if isinstance(zip_path, zipfile.ZipFile):
+        names = set(zip_path.namelist())
+    else:
+        with zipfile.ZipFile(zip_path) as z:
+            names = set(z.namelist())
+    for path in paths:
+        if path in names:
+            return path
     return None
 
 
@@ -4,8 +4,9 @@
 
 from __future__ import annotations
 
+import inspect
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from lunarcore.component.component_group import ComponentGroup
 from lunarcore.component.data_types import DataType
@@ -25,6 +26,18 @@ class LunarComponent(ABC):
     output_type: DataType = None
     component_group: ComponentGroup = ComponentGroup.LUNAR
     default_configuration: Dict = None
+    # Items per run_batch call when the workflow does not set one
+    default_batch_size: int = 64
+    # A failed run_batch is rerun item by item, for components whose runs have no side effects
+    retry_batch_items: bool = False
+    # Concurrent runs of an `async def run` component; None to use the platform default
+    max_concurrency: Optional[int] = None
+    # Instances are reused across runs with the same configuration unless the component keeps per-run state
+    stateful: bool = False
+    # Results are cached by inputs and configuration, for deterministic components without side effects
+    cacheable: bool = False
+    # Mapped inputs run on threads share one instance, instead of one per chunk
+    thread_safe: bool = False
 
     def __init_subclass__(
         cls,
@@ -55,4 +68,31 @@ class LunarComponent(ABC):
         self,
         **inputs: Any,
     ):
+        """
+        May be declared `async def`, in which case runs are awaited on an event loop shared by all async
+        components instead of each holding a thread.
+        """
         pass
+
+    def run_batch(
+        self,
+        **list_inputs: List[Any],
+    ) -> List[Any]:
+        """
+        Optional vectorized version of `run` for mapped inputs. Every input is given as a list, all lists
+        having the same length, and one result per position is expected back. When not overridden,
+        `run` is called once per position.
+        """
+        items = [dict(zip(list_inputs.keys(), values)) for values in zip(*list_inputs.values())]
+        if inspect.iscoroutinefunction(self.run):
+
+            async def run_items():
+                return [await self.run(**item) for item in items]
+
+            return run_items()
+        return [self.run(**item) for item in items]
+
+    @classmethod
+    def supports_batch(cls):
+        # Only an overridden run_batch is worth batching mapped inputs for
+        return cls.run_batch is not LunarComponent.run_batch